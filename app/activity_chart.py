@@ -0,0 +1,128 @@
+# app/activity_chart.py
+"""
+График активности добавления рецептов для GUI.
+Оси, столбцы и подписи создаются один раз; при обновлении у готовых артистов
+меняются только положение, высота и текст, после чего вызывается canvas.draw_idle().
+Если данные не изменились, перерисовки нет совсем.
+
+prepare_activity разбирает даты векторно (NumPy datetime64) и может выполняться в рабочем потоке.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.patches import Rectangle
+from matplotlib.ticker import MaxNLocator
+
+# Ограничиваем количество отображаемых точек (последние 30 дней)
+CHART_DAYS = 30
+BAR_WIDTH = 0.8
+BAR_STYLE = dict(facecolor="#64b5f6", edgecolor="#1976d2", alpha=0.85)
+EMPTY_MESSAGE = "Нет данных для отображения"
+
+
+def prepare_activity(stats: Optional[Dict[str, int]], days: int = CHART_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    {дата: число} -> (datetime64[D], int) по возрастанию даты, только дни с рецептами,
+    последние days дней. Ключи вида 'YYYY-MM-DD' или ISO-время; некорректные пропускаются.
+    """
+    if not stats:
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=int)
+    keys = np.array(list(stats.keys()), dtype="U32")
+    counts = np.fromiter(stats.values(), dtype=np.int64, count=len(stats))
+    keys = np.char.partition(keys, "T")[:, 0]
+    try:
+        dates = keys.astype("datetime64[D]")
+    except ValueError:
+        # редкий путь: в данных есть мусор — разбираем поштучно и отбрасываем негодные
+        dates = np.array([_parse_day(k) for k in keys], dtype="datetime64[D]")
+    mask = (counts > 0) & ~np.isnat(dates)
+    dates, counts = dates[mask], counts[mask]
+    order = np.argsort(dates, kind="stable")[-days:]
+    return dates[order], counts[order].astype(int)
+
+
+def _parse_day(text: str) -> np.datetime64:
+    try:
+        return np.datetime64(text, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+class ActivityChart:
+    """Постоянный столбчатый график на готовой Figure / FigureCanvas."""
+
+    def __init__(self, figure, canvas, max_bars: int = CHART_DAYS):
+        self.figure = figure
+        self.canvas = canvas
+        self.max_bars = max_bars
+        self._shown: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+        ax = self.ax = figure.add_subplot(111)
+        ax.set_title("Активность добавления рецептов", fontsize=12, pad=10, fontweight="bold")
+        ax.set_ylabel("Количество рецептов", fontsize=10)
+        ax.set_xlabel("Дата добавления", fontsize=10)
+        ax.grid(axis="y", linestyle="--", alpha=0.5)
+        self._xlocator = mdates.AutoDateLocator()
+        self._ylocator = MaxNLocator(integer=True)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
+        ax.tick_params(axis="x", labelrotation=45)
+        # поля фиксированы: tight_layout на каждое обновление стоил дороже самой отрисовки
+        figure.subplots_adjust(left=0.1, right=0.98, top=0.85, bottom=0.3)
+
+        self._bars = []
+        self._labels = []
+        for _ in range(max_bars):
+            bar = Rectangle((0, 0), BAR_WIDTH, 0, visible=False, **BAR_STYLE)
+            ax.add_patch(bar)
+            self._bars.append(bar)
+            self._labels.append(ax.text(0, 0, "", ha="center", va="bottom", fontsize=9, visible=False))
+        self._message = ax.text(0.5, 0.5, EMPTY_MESSAGE, transform=ax.transAxes, ha="center", va="center",
+                                fontsize=11, color="gray", visible=False, wrap=True)
+        self.update(*prepare_activity({}))
+
+    def update(self, dates: np.ndarray, counts: np.ndarray) -> None:
+        """Новые данные графика; перерисовка только при изменениях и через draw_idle."""
+        if self._shown is not None and np.array_equal(self._shown[0], dates) \
+                and np.array_equal(self._shown[1], counts):
+            return
+        self._shown = (dates, counts)
+        dates, counts = dates[-self.max_bars:], counts[-self.max_bars:]
+        if len(dates) == 0:
+            self.show_message(EMPTY_MESSAGE)
+            return
+
+        self._message.set_visible(False)
+        x = mdates.date2num(dates)
+        for i, (bar, label) in enumerate(zip(self._bars, self._labels)):
+            visible = i < len(x)
+            bar.set_visible(visible)
+            label.set_visible(visible)
+            if visible:
+                height = float(counts[i])
+                bar.set_x(x[i] - BAR_WIDTH / 2)
+                bar.set_height(height)
+                label.set_position((x[i], height + 0.1))
+                label.set_text(str(int(height)))
+
+        top = int(counts.max())
+        self.ax.xaxis.set_major_locator(self._xlocator)
+        self.ax.yaxis.set_major_locator(self._ylocator)
+        self.ax.set_xlim(x[0] - 1, x[-1] + 1)
+        self.ax.set_ylim(bottom=0, top=top * 1.2 if top > 0 else 5)
+        self.canvas.draw_idle()
+
+    def show_message(self, text: str, color: str = "gray") -> None:
+        """Пустое состояние или ошибка: столбцы скрываются, в центре — текст."""
+        for bar, label in zip(self._bars, self._labels):
+            bar.set_visible(False)
+            label.set_visible(False)
+        self._message.set_text(text)
+        self._message.set_color(color)
+        self._message.set_visible(True)
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+        if color != "gray":
+            self._shown = None  # после ошибки следующие данные отрисуются в любом случае
+        self.canvas.draw_idle()
@@ -0,0 +1,157 @@
+# app/bitmaps.py
+"""
+Битовые множества id рецептов на длинных целых Python.
+Бит с номером n установлен, если рецепт с id=n входит в множество.
+AND / OR / AND NOT над такими множествами выполняются в C по машинным словам,
+поэтому операции над сотнями тысяч рецептов занимают микросекунды.
+
+Для подсчёта «сколько множеств содержит рецепт» используется побитовое
+(bit-sliced) представление счётчика: planes[j] — множество рецептов,
+у которых j-й бит счётчика равен 1.
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# int.bit_count есть с Python 3.10; на старых версиях считаем единицы в двоичной записи
+_popcount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+# размер блока (байт), по которому nth_ids считает единицы, прежде чем разбирать биты
+_RANK_BLOCK = 256
+# номера установленных битов для каждого значения байта
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def bitmap_from_ids(ids: Iterable[int]) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def iter_ids_desc(bitmap: int) -> Iterator[int]:
+    """id из множества по убыванию (сначала новые рецепты)."""
+    while bitmap:
+        top = bitmap.bit_length() - 1
+        yield top
+        bitmap ^= 1 << top
+
+
+def ids_of(bitmap: int) -> List[int]:
+    """Все id из множества по возрастанию."""
+    if not bitmap:
+        return []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "little")
+    result = []
+    # нулевые байты пропускает регулярное выражение (в C), разбираются только непустые
+    for m in _NONZERO_BYTE.finditer(data):
+        byte_index = m.start()
+        byte = data[byte_index]
+        base = byte_index << 3
+        for bit in range(8):
+            if byte >> bit & 1:
+                result.append(base + bit)
+    return result
+
+
+def count(bitmap: int) -> int:
+    return _popcount(bitmap)
+
+
+def add_to_counter(planes: List[int], bitmap: int) -> None:
+    """Прибавляет 1 к счётчику каждого рецепта из bitmap (сумматор с переносом по разрядам)."""
+    carry = bitmap
+    j = 0
+    while carry:
+        if j == len(planes):
+            planes.append(carry)
+            return
+        plane = planes[j]
+        planes[j] = plane ^ carry
+        carry &= plane
+        j += 1
+
+
+def subtract_counters(a: List[int], b: List[int]) -> List[int]:
+    """a - b поразрядно для каждого рецепта (предполагается a >= b)."""
+    width = max(len(a), len(b))
+    result = []
+    borrow = 0
+    for j in range(width):
+        x = a[j] if j < len(a) else 0
+        y = b[j] if j < len(b) else 0
+        result.append(x ^ y ^ borrow)
+        borrow = (~x & (y | borrow)) | (x & y & borrow)
+    return result
+
+
+def counter_equals(planes: List[int], value: int, universe: int) -> int:
+    """Рецепты из universe, у которых счётчик равен value."""
+    result = universe
+    for j in range(max(len(planes), value.bit_length())):
+        plane = planes[j] if j < len(planes) else 0
+        result = result & plane if value >> j & 1 else result & ~plane
+        if not result:
+            break
+    return result
+
+
+def nth_id(bitmap: int, n: int) -> int:
+    """n-й (с нуля) id множества по возрастанию — для равновероятного случайного выбора."""
+    return nth_ids(bitmap, [n])[0]
+
+
+def nth_ids(bitmap: int, ranks: Iterable[int]) -> List[int]:
+    """
+    id с номерами ranks (с нуля, по возрастанию id) за один проход — для равновероятной выборки
+    нескольких рецептов. Результат упорядочен по номерам. Единицы считаются блоками
+    по _RANK_BLOCK байт; байты разбираются только в блоках, где есть нужные номера.
+    """
+    ranks = sorted(ranks)
+    if not ranks:
+        return []
+    if ranks[0] < 0:
+        raise IndexError(ranks[0])
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "little")
+    result: List[int] = []
+    i, last = 0, len(ranks)
+    seen = 0  # единиц до начала текущего блока
+    for start in range(0, len(data), _RANK_BLOCK):
+        block = data[start:start + _RANK_BLOCK]
+        in_block = _popcount(int.from_bytes(block, "little"))
+        if ranks[i] >= seen + in_block:
+            seen += in_block
+            continue
+        pos = seen
+        for offset, byte in enumerate(block, start):
+            bits = _BYTE_BITS[byte]
+            end = pos + len(bits)
+            while ranks[i] < end:
+                result.append((offset << 3) + bits[ranks[i] - pos])
+                i += 1
+                if i == last:
+                    return result
+            pos = end
+        seen += in_block
+    raise IndexError("номер за пределами множества")
+
+
+def top_ids(bitmap: int, limit: Optional[int] = None) -> List[int]:
+    """Не больше limit id множества по убыванию; байты разбираются с конца, без копирования числа на каждом шаге."""
+    if not bitmap:
+        return []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "big")  # старшие байты — первыми
+    last = len(data) - 1
+    result: List[int] = []
+    for m in _NONZERO_BYTE.finditer(data):
+        byte = data[m.start()]
+        base = (last - m.start()) << 3
+        for bit in range(7, -1, -1):
+            if byte >> bit & 1:
+                result.append(base + bit)
+                if limit is not None and len(result) >= limit:
+                    return result
+    return result
@@ -0,0 +1,171 @@
+# app/bulk.py
+"""
+Потоковый импорт и экспорт рецептов (JSONL / CSV).
+- импорт читает файл построчно, проверяет каждую строку и пишет пачками по batch_size
+  в одной транзакции; некорректные строки не прерывают импорт, а попадают в отчёт;
+  файл не в UTF-8 дальше не читается: записанные пачки остаются, отчёт получает aborted;
+- экспорт — генератор строк, память не зависит от размера каталога.
+"""
+
+import csv
+import datetime
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from .models import Recipe, RecipeDB, RecipeError
+
+FORMATS = ("jsonl", "csv")
+FIELDS = ("id", "title", "ingredients", "steps", "tags", "created_at")
+DEFAULT_BATCH_SIZE = 1000
+# сколько отклонённых строк хранить в отчёте (счётчик rejected_count считает все)
+MAX_REPORTED_REJECTS = 1000
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected_count: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (номер строки, причина)
+    batches: int = 0
+    aborted: Optional[str] = None  # причина, по которой импорт остановлен до конца файла
+
+    def reject(self, line_no: int, reason: str) -> None:
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTS:
+            self.rejected.append((line_no, reason))
+
+
+def detect_format(filename: str) -> str:
+    lower = (filename or "").lower()
+    if lower.endswith(".csv"):
+        return "csv"
+    if lower.endswith(".jsonl") or lower.endswith(".ndjson") or lower.endswith(".json"):
+        return "jsonl"
+    raise RecipeError(f"Не удалось определить формат файла {filename!r}, укажите jsonl или csv")
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise RecipeError(f"Неизвестный формат {fmt!r}, ожидается один из: {', '.join(FORMATS)}")
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Построчно выдаёт (номер строки, данные); для битого JSON данные — исключение."""
+    _check_format(fmt)
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, RecipeError(f"некорректный JSON: {e}")
+
+
+def normalize_created_at(value: object) -> str:
+    """
+    created_at в том виде, в каком его пишет приложение: 'ГГГГ-ММ-ДДTЧЧ:ММ:СС' в UTC без смещения.
+    По этой строке сортируется список и считаются дни статистики, поэтому другие записи ISO 8601
+    ('20250106T120000', '2025-01-07', '...+03:00') приводятся к ней, а не сохраняются как есть.
+    """
+    text = str(value or "").strip()
+    if not text:
+        return Recipe.now_iso()
+    try:
+        parsed = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise RecipeError(f"некорректная дата created_at: {text!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec="seconds")
+
+
+def recipe_from_dict(data: object) -> Recipe:
+    """Проверяет одну запись импорта и строит Recipe (id из файла не используется)."""
+    if isinstance(data, Exception):
+        raise data
+    if not isinstance(data, dict):
+        raise RecipeError("ожидается объект с полями рецепта")
+    title = str(data.get("title") or "").strip()
+    if not title:
+        raise RecipeError("пустое название")
+    tags = data.get("tags") or ""
+    if isinstance(tags, (list, tuple)):
+        tags = ",".join(str(t) for t in tags)
+    created_at = normalize_created_at(data.get("created_at"))
+    return Recipe(
+        id=None,
+        title=title,
+        ingredients=str(data.get("ingredients") or ""),
+        steps=str(data.get("steps") or ""),
+        tags=str(tags),
+        created_at=created_at,
+    )
+
+
+def import_recipes(db: RecipeDB, stream: TextIO, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Импортирует рецепты из потока; progress вызывается после каждой записанной пачки."""
+    batch_size = max(1, int(batch_size))
+    report = ImportReport()
+    batch: List[Recipe] = []
+
+    def flush():
+        if not batch:
+            return
+        db.insert_many(batch)
+        report.imported += len(batch)
+        report.batches += 1
+        batch.clear()
+        if progress:
+            progress(report)
+
+    line_no = 0
+    try:
+        for line_no, data in iter_rows(stream, fmt):
+            try:
+                batch.append(recipe_from_dict(data))
+            except RecipeError as e:
+                report.reject(line_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+    except UnicodeDecodeError as e:
+        # поток декодируется блоками, поэтому точная строка неизвестна — только последняя прочитанная
+        report.aborted = f"файл не в кодировке UTF-8 (после строки {line_no}): {e.reason}"
+        report.reject(line_no + 1, report.aborted)
+    flush()
+    return report
+
+
+def _recipe_dict(recipe: Recipe) -> Dict[str, object]:
+    return {name: getattr(recipe, name) for name in FIELDS}
+
+
+def export_recipes(db: RecipeDB, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """Генератор строк экспорта (с переводами строк); для CSV первой идёт строка заголовка."""
+    _check_format(fmt)
+    if fmt == "jsonl":
+        for recipe in db.iter_all(batch_size=batch_size):
+            yield json.dumps(_recipe_dict(recipe), ensure_ascii=False) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def take() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
+
+    writer.writerow(FIELDS)
+    yield take()
+    for recipe in db.iter_all(batch_size=batch_size):
+        writer.writerow([getattr(recipe, name) for name in FIELDS])
+        yield take()
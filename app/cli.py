@@ -0,0 +1,87 @@
+# app/cli.py
+"""
+Служебные команды для обслуживания базы рецептов.
+Запуск: python -m app.cli <команда> [--db recipes.db]
+"""
+
+import argparse
+import sys
+
+from . import bulk
+from .models import RecipeDB, RecipeError
+
+
+def _cmd_rebuild_stats(db: RecipeDB, args) -> int:
+    db.rebuild_daily_activity()
+    print(f"Счётчики по дням пересчитаны: {len(db.count_by_date())} дн.")
+    return 0
+
+
+def _cmd_import(db: RecipeDB, args) -> int:
+    fmt = args.format or bulk.detect_format(args.file)
+
+    def progress(report):
+        print(f"Импортировано {report.imported}, отклонено {report.rejected_count}", file=sys.stderr)
+
+    with open(args.file, encoding="utf-8-sig", newline="") as f:
+        report = bulk.import_recipes(db, f, fmt, batch_size=args.batch_size, progress=progress)
+    for line_no, reason in report.rejected:
+        print(f"строка {line_no}: {reason}", file=sys.stderr)
+    if report.aborted:
+        print(f"Импорт остановлен: {report.aborted}", file=sys.stderr)
+    print(f"Готово: импортировано {report.imported}, отклонено {report.rejected_count}")
+    return 0 if report.rejected_count == 0 else 2
+
+
+def _cmd_export(db: RecipeDB, args) -> int:
+    fmt = args.format or (bulk.detect_format(args.output) if args.output else "jsonl")
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in bulk.export_recipes(db, fmt, batch_size=args.batch_size):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Обслуживание базы рецептов")
+    parser.add_argument("--db", default="recipes.db", help="путь к файлу SQLite (по умолчанию recipes.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-stats", help="пересчитать таблицу daily_activity по рецептам")
+    p.set_defaults(func=_cmd_rebuild_stats)
+
+    p = sub.add_parser("import", help="потоковый импорт рецептов из JSONL или CSV")
+    p.add_argument("file", help="путь к файлу .jsonl / .csv")
+    p.add_argument("--format", choices=bulk.FORMATS, help="формат (по умолчанию — по расширению)")
+    p.add_argument("--batch-size", type=int, default=bulk.DEFAULT_BATCH_SIZE, help="строк на транзакцию")
+    p.set_defaults(func=_cmd_import)
+
+    p = sub.add_parser("export", help="потоковый экспорт рецептов в JSONL или CSV")
+    p.add_argument("-o", "--output", help="файл для записи (по умолчанию stdout)")
+    p.add_argument("--format", choices=bulk.FORMATS, help="формат (по умолчанию — по расширению или jsonl)")
+    p.add_argument("--batch-size", type=int, default=bulk.DEFAULT_BATCH_SIZE, help="строк на чтение из БД")
+    p.set_defaults(func=_cmd_export)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    db = RecipeDB(args.db)
+    try:
+        return args.func(db, args)
+    except RecipeError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        # нет файла для импорта, нельзя записать файл экспорта и т.п.
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
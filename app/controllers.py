@@ -2,21 +2,74 @@
 """
 Контроллер, реализующий бизнес-логику:
 - добавление / удаление / редактирование рецепта
-- генерация случайного рецепта
-- статистика активностид
+- генерация случайного рецепта (в том числе без повторов — колоды app.decks)
+- логические запросы по тегам (битовые множества в памяти, app.tagquery)
+- полнотекстовый поиск
+- подбор рецептов по имеющимся продуктам
+- генерация меню на несколько дней с ограничениями
+- асинхронный фасад для веб-обработчиков
+- статистика активности
+- JSON-представление рецептов для REST API (сериализация в SQLite)
 """
 
-import random
+import asyncio
 import datetime
-from typing import List, Dict, Optional
+import json
+import threading
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Dict, Optional, Sequence, TypeVar, Union
 
-from .models import Recipe, RecipeDB, RecipeError, RecipeNotFoundError
+from .models import (
+    Recipe, RecipeDB, RecipeError, RecipeNotFoundError, RecipePage, RecipeSummary, SearchHit, DataVersion,
+    BatchResult,
+    DEFAULT_PAGE_SIZE, parse_fields,
+)
+from .decks import RandomDecks
+from .menu import Menu, MenuConstraints, MenuPlanner
+from .pantry import IngredientIndex, PantryMatch, parse_pantry
+from .tagquery import TagIndex, TagQueryResult, format_query, parse_tag_query
+from . import stats
+
+T = TypeVar("T")
+
+TEXT_FIELDS = ("title", "ingredients", "steps", "tags")
+
+
+def _text_fields(item: Any) -> Dict[str, str]:
+    """Поля рецепта из элемента пакета: только строки или None (None -> ""), название не пустое."""
+    if not isinstance(item, dict):
+        raise RecipeError("Ожидается объект с полями рецепта")
+    values = {}
+    for name in TEXT_FIELDS:
+        value = item.get(name)
+        if value is not None and not isinstance(value, str):
+            raise RecipeError(f"Поле {name!r} должно быть строкой")
+        values[name] = value or ""
+    values["title"] = values["title"].strip()
+    if not values["title"]:
+        raise RecipeError("Название не может быть пустым")
+    return values
 
 
 class RecipeController:
     def __init__(self, db: RecipeDB, logger=None):
         self.db = db
         self.logger = logger
+        # индексы создаются сразу (строятся они сами при первом запросе, под своими блокировками):
+        # ленивое создание из нескольких потоков пула строило бы несколько копий индекса
+        self.tag_index = TagIndex(db)
+        self._ingredient_index = IngredientIndex(db)
+        self._decks = RandomDecks(db, tags=self.tag_index)
+
+    def transaction(self):
+        """
+        Единица работы поверх нескольких вызовов контроллера:
+            with controller.transaction():
+                controller.add_recipe(...)
+                controller.delete_recipe(...)
+        """
+        return self.db.transaction()
 
     def add_recipe(self, title: str, ingredients: str, steps: str, tags: str) -> int:
         title = (title or "").strip()
@@ -26,47 +79,373 @@ class RecipeController:
         recipe = Recipe(id=None, title=title, ingredients=ingredients or "", steps=steps or "", tags=tags or "", created_at=created_at)
         rid = self.db.add(recipe)
         if self.logger:
-            self.logger.info(f"Добавлен рецепт id={rid} title='{title}'")
+            self.logger.info("Добавлен рецепт id=%s title=%r", rid, title)
         return rid
 
     def edit_recipe(self, recipe_id: int, title: str, ingredients: str, steps: str, tags: str) -> None:
         try:
             self.db.update(recipe_id, title, ingredients, steps, tags)
             if self.logger:
-                self.logger.info(f"Обновлён рецепт id={recipe_id}")
+                self.logger.info("Обновлён рецепт id=%s", recipe_id)
         except RecipeNotFoundError:
             if self.logger:
-                self.logger.warning(f"Попытка редактировать несуществующий рецепт id={recipe_id}")
+                self.logger.warning("Попытка редактировать несуществующий рецепт id=%s", recipe_id)
             raise
 
+    def patch_recipe(self, recipe_id: int, changes: Dict[str, Any]) -> None:
+        """Частичное обновление: не переданные поля остаются прежними (чтение и запись — одна транзакция)."""
+        unknown = set(changes) - {"title", "ingredients", "steps", "tags"}
+        if unknown:
+            raise RecipeError(f"Нельзя изменить поля: {', '.join(sorted(unknown))}")
+        with self.db.transaction():
+            current = self.db.get(recipe_id)
+            title = str(changes.get("title", current.title) or "").strip()
+            if not title:
+                raise RecipeError("Название не может быть пустым")
+            self.edit_recipe(recipe_id, title,
+                             changes.get("ingredients", current.ingredients) or "",
+                             changes.get("steps", current.steps) or "",
+                             changes.get("tags", current.tags) or "")
+
     def delete_recipe(self, recipe_id: int) -> None:
         try:
             self.db.delete(recipe_id)
             if self.logger:
-                self.logger.info(f"Удалён рецепт id={recipe_id}")
+                self.logger.info("Удалён рецепт id=%s", recipe_id)
         except RecipeNotFoundError:
             if self.logger:
-                self.logger.warning(f"Попытка удалить несуществующий рецепт id={recipe_id}")
+                self.logger.warning("Попытка удалить несуществующий рецепт id=%s", recipe_id)
             raise
 
-    def list_recipes(self, limit: Optional[int] = None) -> List[Recipe]:
+    # -----------------------
+    # Пакетные операции: вся пачка — одна транзакция, результат по каждому элементу
+    # -----------------------
+    def add_many(self, items: List[Dict[str, Any]]) -> List[BatchResult]:
+        created_at = Recipe.now_iso()
+
+        def build(item):
+            values = _text_fields(item)
+            return Recipe(id=None, title=values["title"], ingredients=values["ingredients"],
+                          steps=values["steps"], tags=values["tags"], created_at=created_at)
+
+        results = self._batch(items, build, self.db.add_many)
+        self._log_batch("Добавлено", results)
+        return results
+
+    def update_many(self, items: List[Dict[str, Any]]) -> List[BatchResult]:
+        def build(item):
+            values = _text_fields(item)
+            return (int(item["id"]), values["title"], values["ingredients"], values["steps"], values["tags"])
+
+        results = self._batch(items, build, self.db.update_many)
+        self._log_batch("Обновлено", results)
+        return results
+
+    def delete_many(self, recipe_ids: List[int]) -> List[BatchResult]:
+        results = self._batch(recipe_ids, int, self.db.delete_many)
+        self._log_batch("Удалено", results)
+        return results
+
+    @staticmethod
+    def _batch(items: List[Any], build: Callable[[Any], Any], run: Callable[[List[Any]], List[BatchResult]]) -> List[BatchResult]:
+        # некорректные элементы отсекаются до БД, остальные уходят одной пачкой;
+        # индексы результатов соответствуют позициям во входном списке
+        results: List[Optional[BatchResult]] = [None] * len(items)
+        valid, positions = [], []
+        for index, item in enumerate(items):
+            try:
+                valid.append(build(item))
+                positions.append(index)
+            except (RecipeError, KeyError, TypeError, ValueError, AttributeError) as e:
+                results[index] = BatchResult(index=index, ok=False, error=str(e) or type(e).__name__)
+        if valid:
+            for position, result in zip(positions, run(valid)):
+                results[position] = replace(result, index=position)
+        return results
+
+    def _log_batch(self, action: str, results: List[BatchResult]) -> None:
+        if self.logger:
+            ok = sum(1 for r in results if r.ok)
+            self.logger.info("%s пакетом: %d из %d", action, ok, len(results))
+
+    def list_recipes(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                     page_size: Optional[int] = None) -> Union[List[Recipe], RecipePage]:
+        # cursor / page_size включают keyset-пагинацию и возвращают RecipePage
+        if cursor is not None or page_size is not None:
+            return self.db.list_page(cursor=cursor, page_size=page_size or DEFAULT_PAGE_SIZE)
         return self.db.list_all(limit=limit)
 
+    def list_summaries(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                       page_size: Optional[int] = None) -> Union[List[RecipeSummary], RecipePage]:
+        # то же, что list_recipes, но без ingredients/steps — для таблиц и списков
+        if cursor is not None or page_size is not None:
+            return self.db.list_page(cursor=cursor, page_size=page_size or DEFAULT_PAGE_SIZE, summary=True)
+        return self.db.list_summaries(limit=limit)
+
     def get_recipe(self, recipe_id: int) -> Recipe:
         return self.db.get(recipe_id)
 
+    # -----------------------
+    # JSON для REST API: объекты собирает SQLite (json_object), здесь только склейка строк
+    # -----------------------
+    def recipe_json(self, recipe_id: int, fields: Optional[str] = None) -> str:
+        return self.db.get_json(recipe_id, parse_fields(fields))
+
+    def list_recipes_json(self, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                          fields: Optional[str] = None) -> str:
+        """Тело ответа {"items": [...], "next_cursor": ...} одной строкой."""
+        items, next_cursor = self.db.list_page_json(cursor=cursor, page_size=page_size, fields=parse_fields(fields))
+        return '{"items":[' + ",".join(items) + '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+    def iter_recipes_ndjson(self, fields: Optional[str] = None, batch_size: int = 1000) -> Iterator[str]:
+        """Весь каталог в NDJSON: по одному куску текста на пачку строк, память не растёт с каталогом."""
+        # fields разбираются сразу, чтобы ошибка случилась до начала ответа, а не посреди потока
+        batches = self.db.iter_json_batches(parse_fields(fields), batch_size=batch_size)
+        return ("\n".join(batch) + "\n" for batch in batches)
+
+    def get_summaries(self, recipe_ids: List[int]) -> List[RecipeSummary]:
+        # облегчённые строки по id (порядок сохраняется, отсутствующие пропускаются)
+        return self.db.get_summaries(recipe_ids)
+
     def random_recipe(self, tag_filter: Optional[str] = None) -> Recipe:
-        if tag_filter:
-            candidates = self.db.find_by_tag(tag_filter)
+        # фильтр — запрос по тегам («десерт AND NOT орехи»), вычисляется по индексу в памяти
+        if tag_filter and tag_filter.strip():
+            choice = self._random_tagged(parse_tag_query(tag_filter))
         else:
-            candidates = self.db.list_all()
-        if not candidates:
+            choice = self.db.random_recipe()
+        if choice is None:
+            raise RecipeError("Нет подходящих рецептов для генерации")
+        if self.logger:
+            self.logger.info("Сгенерирован случайный рецепт id=%s title=%r", choice.id, choice.title)
+        return choice
+
+    def _random_tagged(self, node) -> Optional[Recipe]:
+        # рецепт мог быть удалён между запросом к индексу и чтением — тогда пробуем ещё раз
+        for _ in range(3):
+            rid = self.tag_index.random_id(node)
+            if rid is None:
+                return None
+            try:
+                return self.db.get(rid)
+            except RecipeNotFoundError:
+                continue
+        return None
+
+    def find_by_tags(self, query: str, limit: int = 50) -> TagQueryResult:
+        """Рецепты по запросу к тегам: число подходящих и первые limit (новые сначала)."""
+        node = parse_tag_query(query)
+        total, ids = self.tag_index.search(node, limit=max(1, min(int(limit), 500)))
+        return TagQueryResult(query=format_query(node), count=total, items=self.db.get_summaries(ids))
+
+    def draw_recipe(self, tag_filter: Optional[str] = None, session: Any = None) -> Recipe:
+        """Как random_recipe, но без повторов, пока не выданы все подходящие рецепты (колода на session и тег)."""
+        choice = self._decks.draw(tag_filter or None, session=session)
+        if choice is None:
             raise RecipeError("Нет подходящих рецептов для генерации")
-        choice = random.choice(candidates)
         if self.logger:
-            self.logger.info(f"Сгенерирован случайный рецепт id={choice.id} title='{choice.title}'")
+            self.logger.info("Из колоды выдан рецепт id=%s title=%r", choice.id, choice.title)
         return choice
 
-    def activity_stats(self) -> Dict[str, int]:
-        # возвращает {date_str: count}
-        return self.db.count_by_date()
+    def search_recipes(self, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+        query = (query or "").strip()
+        if not query:
+            return []
+        limit = max(1, min(int(limit), 100))
+        offset = max(0, int(offset))
+        return self.db.search(query, limit=limit, offset=offset)
+
+    def recipes_makeable_with(self, pantry: Union[str, List[str]], max_missing: int = 0,
+                              limit: int = 20) -> List[PantryMatch]:
+        # pantry — список продуктов или строка через запятую
+        names = parse_pantry(pantry)
+        if not names:
+            return []
+        found = self._ingredient_index.makeable_with(names, max_missing=max_missing, limit=max(1, min(int(limit), 100)))
+        summaries = {s.id: s for s in self.db.get_summaries([rid for rid, _, _ in found])}
+        return [PantryMatch(recipe=summaries[rid], matched=matched, missing=missing)
+                for rid, matched, missing in found if rid in summaries]
+
+    def generate_menu(self, days: int = 7, slots: Optional[Sequence[str]] = None,
+                      constraints: Union[None, MenuConstraints, Dict[str, Any]] = None) -> Menu:
+        """Меню на days дней по приёмам пищи slots; constraints — MenuConstraints или dict из JSON."""
+        if isinstance(constraints, dict):
+            constraints = MenuConstraints.from_dict(constraints)
+        menu = MenuPlanner(self.db, tags=self.tag_index).generate(days, slots, constraints)
+        if self.logger:
+            self.logger.info("Сгенерировано меню: дней %d, приёмов пищи %d, не заполнено %d, seed=%s",
+                             menu.days, len(menu.slots), len(menu.unfilled()), menu.seed)
+        return menu
+
+    def activity_stats(self, start: Optional[str] = None, end: Optional[str] = None,
+                       bucket: str = "day") -> Dict[str, int]:
+        """
+        {начало корзины: число} по порядку за период, пустые корзины — с нулём.
+        Без end период заканчивается последним днём с добавлениями (или сегодня),
+        без start берётся stats.DEFAULT_WINDOW[bucket] корзин.
+        """
+        last = self.db.last_activity_day()
+        default_end = stats.parse_day(last) if last else datetime.datetime.utcnow().date()
+        first, last_day = stats.resolve_range(start, end, bucket, default_end)
+        rows = self.db.activity_range(first.isoformat(), last_day.isoformat(), bucket)
+        return stats.fill_buckets(rows, first, last_day, bucket)
+
+    def data_version(self) -> DataVersion:
+        return self.db.data_version()
+
+
+class QueryTimeoutError(RecipeError):
+    """Выбрасывается, если операция с БД не уложилась в отведённое время."""
+    pass
+
+
+# Размер пула потоков для запросов к БД и таймаут операции по умолчанию (секунды)
+DEFAULT_ASYNC_WORKERS = 8
+DEFAULT_QUERY_TIMEOUT = 10.0
+
+
+class _RunningQuery:
+    """
+    Соединение, на котором выполняется одно задание пула, и флаг «задание ещё идёт».
+    Флаг ставится и снимается внутри задания под блокировкой, поэтому interrupt() не попадёт
+    в чужой запрос, который поток пула начал на том же соединении после этого задания.
+    """
+    __slots__ = ("lock", "conn", "running")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.running = False
+
+    def start(self, conn) -> None:
+        with self.lock:
+            self.conn = conn
+            self.running = True
+
+    def finish(self) -> None:
+        with self.lock:
+            self.running = False
+
+    def interrupt(self) -> None:
+        with self.lock:
+            if not self.running:
+                return
+            try:
+                self.conn.interrupt()
+            except Exception:
+                pass
+
+
+class AsyncRecipeController:
+    """
+    Асинхронный фасад над RecipeController для обработчиков FastAPI.
+    Все вызовы выполняются в ограниченном пуле потоков, поэтому медленный запрос
+    к SQLite не блокирует event loop. Чтение по таймауту или при отмене корутины
+    прерывается через sqlite3.Connection.interrupt(); запись не ограничивается таймаутом
+    и всегда доводится до конца, чтобы не оставлять транзакцию в промежуточном состоянии.
+    """
+
+    def __init__(self, controller: RecipeController, max_workers: int = DEFAULT_ASYNC_WORKERS,
+                 timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT):
+        self.controller = controller
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recipe-db")
+
+    async def call(self, fn: Callable[..., T], *args, timeout: Optional[float] = None,
+                   interruptible: bool = True, **kwargs) -> T:
+        """Выполняет fn(*args, **kwargs) в пуле потоков с таймаутом и поддержкой отмены."""
+        db = self.controller.db
+        running = _RunningQuery()
+
+        def job():
+            if not interruptible:
+                return fn(*args, **kwargs)
+            running.start(db.read_conn)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                running.finish()
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, job)
+        if not interruptible:
+            # запись не прерываем: shield не даёт отмене оборвать транзакцию посередине
+            return await asyncio.shield(future)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            running.interrupt()
+            raise QueryTimeoutError(f"Операция {getattr(fn, '__name__', fn)} не завершилась за {timeout} с")
+        except asyncio.CancelledError:
+            running.interrupt()
+            raise
+
+    async def add_recipe(self, title: str, ingredients: str, steps: str, tags: str) -> int:
+        return await self.call(self.controller.add_recipe, title, ingredients, steps, tags, interruptible=False)
+
+    async def edit_recipe(self, recipe_id: int, title: str, ingredients: str, steps: str, tags: str) -> None:
+        return await self.call(self.controller.edit_recipe, recipe_id, title, ingredients, steps, tags,
+                               interruptible=False)
+
+    async def delete_recipe(self, recipe_id: int) -> None:
+        return await self.call(self.controller.delete_recipe, recipe_id, interruptible=False)
+
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[BatchResult]:
+        return await self.call(self.controller.add_many, items, interruptible=False)
+
+    async def update_many(self, items: List[Dict[str, Any]]) -> List[BatchResult]:
+        return await self.call(self.controller.update_many, items, interruptible=False)
+
+    async def delete_many(self, recipe_ids: List[int]) -> List[BatchResult]:
+        return await self.call(self.controller.delete_many, recipe_ids, interruptible=False)
+
+    async def list_recipes(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                           page_size: Optional[int] = None) -> Union[List[Recipe], RecipePage]:
+        return await self.call(self.controller.list_recipes, limit=limit, cursor=cursor, page_size=page_size)
+
+    async def list_summaries(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                             page_size: Optional[int] = None) -> Union[List[RecipeSummary], RecipePage]:
+        return await self.call(self.controller.list_summaries, limit=limit, cursor=cursor, page_size=page_size)
+
+    async def patch_recipe(self, recipe_id: int, changes: Dict[str, Any]) -> None:
+        return await self.call(self.controller.patch_recipe, recipe_id, changes, interruptible=False)
+
+    async def recipe_json(self, recipe_id: int, fields: Optional[str] = None) -> str:
+        return await self.call(self.controller.recipe_json, recipe_id, fields)
+
+    async def list_recipes_json(self, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                                fields: Optional[str] = None) -> str:
+        return await self.call(self.controller.list_recipes_json, cursor, page_size, fields)
+
+    async def get_recipe(self, recipe_id: int) -> Recipe:
+        return await self.call(self.controller.get_recipe, recipe_id)
+
+    async def random_recipe(self, tag_filter: Optional[str] = None) -> Recipe:
+        return await self.call(self.controller.random_recipe, tag_filter)
+
+    async def find_by_tags(self, query: str, limit: int = 50) -> TagQueryResult:
+        return await self.call(self.controller.find_by_tags, query, limit)
+
+    async def draw_recipe(self, tag_filter: Optional[str] = None, session: Any = None) -> Recipe:
+        return await self.call(self.controller.draw_recipe, tag_filter, session)
+
+    async def search_recipes(self, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+        return await self.call(self.controller.search_recipes, query, limit=limit, offset=offset)
+
+    async def recipes_makeable_with(self, pantry: Union[str, List[str]], max_missing: int = 0,
+                                    limit: int = 20) -> List[PantryMatch]:
+        return await self.call(self.controller.recipes_makeable_with, pantry, max_missing=max_missing, limit=limit)
+
+    async def generate_menu(self, days: int = 7, slots: Optional[Sequence[str]] = None,
+                            constraints: Union[None, MenuConstraints, Dict[str, Any]] = None) -> Menu:
+        return await self.call(self.controller.generate_menu, days, slots, constraints)
+
+    async def activity_stats(self, start: Optional[str] = None, end: Optional[str] = None,
+                             bucket: str = "day") -> Dict[str, int]:
+        return await self.call(self.controller.activity_stats, start, end, bucket)
+
+    async def data_version(self) -> DataVersion:
+        return await self.call(self.controller.data_version)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,170 @@
+# app/decks.py
+"""
+Случайные рецепты без повторов: «колода» id для каждого фильтра по тегам
+(фильтр — логический запрос app.tagquery: «десерт AND NOT орехи»).
+
+Колода — array('q') с id ещё не выданных рецептов. Тасование ленивое (Фишер — Йетс
+по одному шагу): при выдаче случайный элемент меняется местами с последним и снимается
+pop() — O(1) независимо от размера каталога. Повторов нет, пока колода не кончится;
+затем она собирается заново.
+
+Колода догоняет БД по журналу recipe_changes: новые рецепты, подходящие под фильтр,
+добавляются в оставшуюся часть. Удалённые рецепты и рецепты, переставшие подходить под фильтр,
+отбрасываются при выдаче; старые рецепты, ставшие подходящими, попадут в колоду со следующего круга.
+Колоды хранятся по ключу (сессия, запрос), самые давние вытесняются. Колоды без сессии
+(session=None) общие для всех клиентов без cookie — по одной на запрос; они лежат отдельно
+от сессионных (не больше max_shared_decks), чтобы поток анонимных запросов не вытеснял
+колоды посетителей (не больше max_decks).
+"""
+
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from . import bitmaps
+from .models import Recipe, RecipeDB, RecipeNotFoundError
+from .tagquery import Node, TagIndex, format_query, parse_tag_query
+
+# Каждая колода — 8 байт на рецепт; для 1M рецептов это 8 МБ, поэтому число колод ограничено
+DEFAULT_MAX_DECKS = 64
+DEFAULT_MAX_SHARED_DECKS = 16
+
+
+class ShuffledDeck:
+    __slots__ = ("ids", "seq", "high", "last")
+
+    def __init__(self, ids: "array[int]", seq: int):
+        self.ids = ids
+        self.seq = seq
+        # id больше high появились после сборки колоды и ещё не были в ней
+        self.high = max(ids) if ids else 0
+        self.last: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def draw(self, rng: random.Random) -> Optional[int]:
+        ids = self.ids
+        n = len(ids)
+        if not n:
+            return None
+        j = rng.randrange(n)
+        ids[j], ids[n - 1] = ids[n - 1], ids[j]
+        return ids.pop()
+
+
+class RandomDecks:
+    def __init__(self, db: RecipeDB, max_decks: int = DEFAULT_MAX_DECKS, seed=None,
+                 tags: Optional[TagIndex] = None, max_shared_decks: int = DEFAULT_MAX_SHARED_DECKS):
+        self.db = db
+        self.tags = tags or TagIndex(db)
+        self.max_decks = max_decks
+        self.max_shared_decks = max_shared_decks
+        self._rng = random.Random(seed)
+        # сессионные колоды и общие (session=None) вытесняются независимо
+        self._decks: "OrderedDict[Tuple[Hashable, Optional[str]], ShuffledDeck]" = OrderedDict()
+        self._shared: "OrderedDict[Tuple[Hashable, Optional[str]], ShuffledDeck]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self, key) -> Tuple["OrderedDict[Tuple[Hashable, Optional[str]], ShuffledDeck]", int]:
+        if key[0] is None:
+            return self._shared, self.max_shared_decks
+        return self._decks, self.max_decks
+
+    @staticmethod
+    def _filter(tag_filter: Optional[str]) -> Tuple[Optional[str], Optional[Node]]:
+        # ключ колоды — каноническая запись запроса: «A and b» и «a AND b» делят одну колоду
+        if not tag_filter or not tag_filter.strip():
+            return None, None
+        node = parse_tag_query(tag_filter)
+        return format_query(node), node
+
+    def draw(self, tag_filter: Optional[str] = None, session: Hashable = None) -> Optional[Recipe]:
+        """Следующий рецепт из колоды (session, запрос по тегам); None, если подходящих рецептов нет."""
+        query, node = self._filter(tag_filter)
+        key = (session, query)
+        with self._lock:
+            decks, _ = self._pool(key)
+            deck = decks.get(key)
+            if deck is None:
+                deck = self._store(key, self._build(node))
+            else:
+                decks.move_to_end(key)
+                deck = self._catch_up(key, deck, node)
+            rebuilt = False
+            while True:
+                rid = deck.draw(self._rng)
+                if rid is None:
+                    if rebuilt:
+                        return None
+                    last = deck.last
+                    deck = self._store(key, self._build(node))
+                    deck.last = last
+                    rebuilt = True
+                    continue
+                if rid == deck.last and len(deck):
+                    # на стыке кругов не выдаём тот же рецепт дважды подряд
+                    rid, postponed = deck.draw(self._rng), rid
+                    deck.ids.append(postponed)
+                recipe = self._fetch(rid, node)
+                if recipe is not None:
+                    deck.last = rid
+                    return recipe
+
+    def remaining(self, tag_filter: Optional[str] = None, session: Hashable = None) -> Optional[int]:
+        """Сколько рецептов осталось в колоде до повторов (None — колода ещё не собрана)."""
+        key = (session, self._filter(tag_filter)[0])
+        with self._lock:
+            deck = self._pool(key)[0].get(key)
+            return None if deck is None else len(deck)
+
+    def reset(self, session: Hashable = None) -> None:
+        """Сбрасывает колоды сессии (None — общие колоды): следующий draw начнёт новый круг."""
+        with self._lock:
+            decks, _ = self._pool((session, None))
+            for key in [k for k in decks if k[0] == session]:
+                del decks[key]
+
+    def _build(self, node: Optional[Node]) -> ShuffledDeck:
+        # seq читается до данных: изменения между ними применятся повторно — это безопасно
+        seq = self.db.change_seq()
+        if node is None:
+            return ShuffledDeck(self.db.recipe_ids(), seq)
+        return ShuffledDeck(array("q", bitmaps.ids_of(self.tags.query(node))), seq)
+
+    def _store(self, key, deck: ShuffledDeck) -> ShuffledDeck:
+        decks, limit = self._pool(key)
+        decks[key] = deck
+        decks.move_to_end(key)
+        while len(decks) > limit:
+            decks.popitem(last=False)
+        return deck
+
+    def _catch_up(self, key, deck: ShuffledDeck, node: Optional[Node]) -> ShuffledDeck:
+        seq, changed = self.db.changes_since(deck.seq)
+        if changed is None:
+            # журнал обрезан — неизвестно, что поменялось; собираем колоду заново
+            last = deck.last
+            deck = self._store(key, self._build(node))
+            deck.last = last
+            return deck
+        fresh = [rid for rid in changed if rid > deck.high]
+        if fresh:
+            if node is None:
+                added = self.db.filter_ids(fresh)
+            else:
+                added = bitmaps.ids_of(self.tags.query(node) & bitmaps.bitmap_from_ids(fresh))
+            deck.ids.extend(added)
+            deck.high = max(deck.high, max(fresh))
+        deck.seq = seq
+        return deck
+
+    def _fetch(self, rid: int, node: Optional[Node]) -> Optional[Recipe]:
+        if node is not None and not self.tags.contains(node, rid):
+            return None
+        try:
+            return self.db.get(rid)
+        except RecipeNotFoundError:
+            return None
@@ -1,21 +1,21 @@
 ﻿from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
-    QPushButton, QTableWidget, QTableWidgetItem, QTextEdit,
+    QPushButton, QTableView, QTextEdit,
     QLineEdit, QLabel, QMessageBox, QFormLayout, QTextBrowser,
     QStatusBar, QDialog
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 import logging
-import datetime as dt
-import numpy as np
 
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import matplotlib.dates as mdates
 
 from .models import Recipe
-from .logger_config import QTextEditHandler
+from .logger_config import QTextEditHandler, add_sink
+from .table_model import RecipeTableModel
+from .tasks import TaskRunner
+from .activity_chart import ActivityChart, prepare_activity
 
 
 class ModernMainWindow(QMainWindow):
@@ -23,6 +23,8 @@ class ModernMainWindow(QMainWindow):
         super().__init__()
         self.controller = controller
         self.logger = logger or logging.getLogger(__name__)
+        # запросы к БД и подготовка графика выполняются в пуле потоков (см. app/tasks.py)
+        self.tasks = TaskRunner(self)
         self.setWindowTitle("Генератор рецептов")
         self.resize(950, 650)
 
@@ -97,16 +99,22 @@ class ModernMainWindow(QMainWindow):
     def _build_recipes_tab(self):
         layout = QVBoxLayout()
 
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["ID", "Название", "Теги", "Создан"])
-        self.table.setSelectionBehavior(self.table.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(self.table.EditTrigger.NoEditTriggers)
+        # строки подгружаются моделью страницами при прокрутке (canFetchMore / fetchMore)
+        self.table_model = RecipeTableModel(self.controller, parent=self, runner=self.tasks)
+        self.table_model.load_failed.connect(self._on_table_error)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
         self.table.setColumnWidth(1, 280)
         layout.addWidget(self.table)
 
         # График активности
         self.figure = Figure(figsize=(5, 2))
         self.canvas = FigureCanvas(self.figure)
+        self.chart = ActivityChart(self.figure, self.canvas)
         layout.addWidget(QLabel("Активность добавления рецептов"))
         layout.addWidget(self.canvas)
         
@@ -159,7 +167,8 @@ class ModernMainWindow(QMainWindow):
         layout = QVBoxLayout()
 
         self.input_filter_tags = QLineEdit()
-        self.input_filter_tags.setPlaceholderText("Введите тег (например, 'десерт')")
+        self.input_filter_tags.setPlaceholderText("Теги: десерт AND веган AND NOT орехи")
+        self.input_filter_tags.setToolTip("AND / OR / NOT (или И / ИЛИ / НЕ), запятая — AND, скобки группируют")
         self.btn_random = QPushButton("Случайный рецепт")
         self.random_recipe_display = QTextBrowser()
 
@@ -182,109 +191,49 @@ class ModernMainWindow(QMainWindow):
         self.btn_edit.clicked.connect(self.on_edit)
         self.btn_delete.clicked.connect(self.on_delete)
 
+        # журнал получает записи из потока конвейера логирования пачками (см. logger_config)
+        self.log_widget.document().setMaximumBlockCount(5000)
         qhandler = QTextEditHandler(self.log_widget.append)
-        self.logger.handlers.clear()
-        self.logger.addHandler(qhandler)
+        qhandler.setLevel(logging.INFO)
+        add_sink(qhandler)
         self.logger.setLevel(logging.INFO)
 
     # -----------------------------
     # Действия
     # -----------------------------
     def refresh_table(self):
-        try:
-            recipes = self.controller.list_recipes()
-            self.table.setRowCount(len(recipes))
-            for i, recipe in enumerate(recipes):
-                self.table.setItem(i, 0, QTableWidgetItem(str(recipe.id)))
-                self.table.setItem(i, 1, QTableWidgetItem(recipe.title))
-                self.table.setItem(i, 2, QTableWidgetItem(recipe.tags))
-                self.table.setItem(i, 3, QTableWidgetItem(recipe.created_at))
-            self._update_chart()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить рецепты:\n{e}")
-
-    def _update_chart(self):
-        try:
-            stats = self.controller.activity_stats()
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
-
-            if not stats:
-                ax.text(0.5, 0.5, "Нет данных для отображения",
-                        ha="center", va="center", fontsize=11, color="gray")
-                ax.set_xticks([])
-                ax.set_yticks([])
-            else:
-                # Фильтруем и сортируем данные
-                valid_data = {}
-                for date_str, count in stats.items():
-                    if count > 0:  # Показываем только даты с рецептами
-                        try:
-                            # Преобразуем строку в дату
-                            if 'T' in date_str:
-                                date_obj = dt.datetime.fromisoformat(date_str).date()
-                            else:
-                                date_obj = dt.datetime.strptime(date_str, '%Y-%m-%d').date()
-                            valid_data[date_obj] = count
-                        except (ValueError, TypeError) as e:
-                            self.logger.warning(f"Пропущена некорректная дата: {date_str}, ошибка: {e}")
-                            continue
-
-                if not valid_data:
-                    ax.text(0.5, 0.5, "Нет данных для отображения",
-                            ha="center", va="center", fontsize=11, color="gray")
-                    ax.set_xticks([])
-                    ax.set_yticks([])
-                else:
-                    # Сортируем по дате
-                    dates = sorted(valid_data.keys())
-                    counts = [valid_data[d] for d in dates]
-
-                    # Ограничиваем количество отображаемых точек (последние 30 дней)
-                    if len(dates) > 30:
-                        dates = dates[-30:]
-                        counts = counts[-30:]
-
-                    y = np.array(counts, dtype=int)
-
-                    # Столбчатая диаграмма
-                    bars = ax.bar(dates, y, color="#64b5f6", edgecolor="#1976d2", alpha=0.85, width=0.8)
-
-                    # Добавляем подписи над столбцами
-                    for bar in bars:
-                        height = bar.get_height()
-                        if height > 0:
-                            ax.text(bar.get_x() + bar.get_width()/2, height + 0.1,
-                                    str(int(height)), ha='center', va='bottom', fontsize=9)
-
-                    # Стиль графика (без эмодзи)
-                    ax.set_title("Активность добавления рецептов", fontsize=12, pad=10, fontweight="bold")
-                    ax.set_ylabel("Количество рецептов", fontsize=10)
-                    ax.set_xlabel("Дата добавления", fontsize=10)
-                    ax.grid(axis="y", linestyle="--", alpha=0.5)
-
-                    # Форматирование дат
-                    ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
-                    
-                    # Настройка осей
-                    ax.set_ylim(bottom=0, top=max(y) * 1.2 if max(y) > 0 else 5)
-                    
-                    # Автоматическое форматирование дат
-                    self.figure.autofmt_xdate(rotation=45)
-
-            self.figure.tight_layout()
-            self.canvas.draw()
-
-        except Exception as e:
-            self.logger.error(f"Ошибка при построении графика: {e}")
-            # Показываем сообщение об ошибке в графике
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
-            ax.text(0.5, 0.5, f"Ошибка построения графика:\n{e}", 
-                    ha="center", va="center", fontsize=10, color="red", wrap=True)
-            ax.set_xticks([])
-            ax.set_yticks([])
-            self.canvas.draw()
+        # сброс модели дешёвый, страница читается в фоне (незавершённая загрузка отменяется в reload);
+        # склеивается через TaskRunner.schedule только пересчёт графика — см. request_chart_update
+        self.table_model.reload()
+        if self.table_model.canFetchMore():
+            self.table_model.fetchMore()
+        self.request_chart_update()
+
+    def request_chart_update(self):
+        # статистика и подготовка данных — в фоне; новый запрос вытесняет незавершённый
+        self.tasks.schedule("chart", self._load_chart_data,
+                            on_done=self._draw_chart, on_error=self._chart_failed)
+
+    def _load_chart_data(self):
+        """Выполняется в рабочем потоке: статистика и векторный разбор дат, без обращения к figure."""
+        return prepare_activity(self.controller.activity_stats())
+
+    def _draw_chart(self, data):
+        # артисты графика постоянные: меняются высоты и подписи, отрисовка через draw_idle
+        self.chart.update(*data)
+
+    def _chart_failed(self, e):
+        self.logger.error("Ошибка при построении графика: %s", e)
+        # Показываем сообщение об ошибке в графике
+        self.chart.show_message(f"Ошибка построения графика:\n{e}", color="red")
+
+    def _on_table_error(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить рецепты:\n{message}")
+
+    def _add_and_read(self, title, ing, steps, tags):
+        # рабочий поток: запись и облегчённая строка для таблицы одним заходом
+        rid = self.controller.add_recipe(title, ing, steps, tags)
+        return rid, self.controller.get_summaries([rid])
 
     def on_add(self):
         title = self.input_title.text().strip()
@@ -296,15 +245,23 @@ class ModernMainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Введите название рецепта")
             return
 
-        try:
-            self.controller.add_recipe(title, ing, steps, tags)
-            self.logger.info(f"Добавлен рецепт: {title}")
-            self.refresh_table()
+        def done(result):
+            rid, summaries = result
+            self.btn_add.setEnabled(True)
+            self.logger.info("Добавлен рецепт: %s", title)
+            self.table_model.recipe_added(rid, summaries[0] if summaries else None)
+            self.request_chart_update()
             QMessageBox.information(self, "Успех", "Рецепт успешно добавлен!")
             self.on_clear()
-        except Exception as e:
+
+        def failed(e):
+            self.btn_add.setEnabled(True)
             QMessageBox.critical(self, "Ошибка", str(e))
 
+        # кнопка блокируется до ответа, чтобы двойной щелчок не добавил рецепт дважды
+        self.btn_add.setEnabled(False)
+        self.tasks.submit(None, self._add_and_read, title, ing, steps, tags, on_done=done, on_error=failed)
+
     def on_clear(self):
         self.input_title.clear()
         self.input_tags.clear()
@@ -312,51 +269,71 @@ class ModernMainWindow(QMainWindow):
         self.input_steps.clear()
 
     def on_view(self):
-        recipe = self._get_selected_recipe()
-        if recipe:
-            self._show_recipe_dialog(recipe, editable=False)
+        self._with_selected_recipe(lambda recipe: self._show_recipe_dialog(recipe, editable=False))
 
     def on_edit(self):
-        recipe = self._get_selected_recipe()
-        if recipe:
-            self._show_recipe_dialog(recipe, editable=True)
+        self._with_selected_recipe(lambda recipe: self._show_recipe_dialog(recipe, editable=True))
 
     def on_delete(self):
-        recipe = self._get_selected_recipe()
-        if not recipe:
-            return
+        self._with_selected_recipe(self._confirm_delete)
+
+    def _confirm_delete(self, recipe):
         reply = QMessageBox.question(self, "Удаление", f"Удалить рецепт '{recipe.title}'?",
                                      QMessageBox.Yes | QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            self.controller.delete_recipe(recipe.id)
-            self.refresh_table()
+        if reply != QMessageBox.Yes:
+            return
+
+        def done(_):
+            self.table_model.recipe_deleted(recipe.id)
+            self.request_chart_update()
+
+        self.tasks.submit(None, self.controller.delete_recipe, recipe.id, on_done=done,
+                          on_error=lambda e: QMessageBox.critical(self, "Ошибка", str(e)))
 
     def on_random(self):
         tag = self.input_filter_tags.text().strip() or None
-        try:
-            r = self.controller.random_recipe(tag)
+
+        def show(r):
             self.random_recipe_display.setHtml(
                 f"<h2>{r.title}</h2><p><b>Теги:</b> {r.tags}</p>"
                 f"<pre>{r.ingredients}</pre><pre>{r.steps}</pre>"
             )
-        except Exception as e:
-            QMessageBox.information(self, "Нет данных", str(e))
 
-    def _get_selected_recipe(self):
-        selected = self.table.selectedItems()
+        # повторное нажатие до ответа вытесняет предыдущий запрос; колода не повторяет рецепты подряд
+        self.tasks.submit("random", self.controller.draw_recipe, tag, on_done=show,
+                          on_error=lambda e: QMessageBox.information(self, "Нет данных", str(e)))
+
+    def _with_selected_recipe(self, callback):
+        selected = self.table.selectionModel().selectedRows()
         if not selected:
             QMessageBox.information(self, "Выбор", "Выберите рецепт")
-            return None
-        row = selected[0].row()
-        rid = int(self.table.item(row, 0).text())
-        return self.controller.get_recipe(rid)
+            return
+        rid = self.table_model.recipe_id(selected[0].row())
+        self.tasks.submit("selected", self.controller.get_recipe, rid, on_done=callback,
+                          on_error=lambda e: QMessageBox.critical(self, "Ошибка", str(e)))
 
     def _show_recipe_dialog(self, recipe, editable=False):
         dlg = RecipeDialog(self, recipe, editable)
         if dlg.exec() == QDialog.Accepted and editable:
             data = dlg.get_data()
-            self.controller.edit_recipe(recipe.id, **data)
-            self.refresh_table()
+
+            def edit_and_read():
+                self.controller.edit_recipe(recipe.id, **data)
+                return self.controller.get_summaries([recipe.id])
+
+            def done(summaries):
+                if summaries:
+                    self.table_model.recipe_updated(recipe.id, summaries[0])
+                else:
+                    self.table_model.recipe_deleted(recipe.id)
+
+            self.tasks.submit(None, edit_and_read, on_done=done,
+                              on_error=lambda e: QMessageBox.critical(self, "Ошибка", str(e)))
+
+    def closeEvent(self, event):
+        # дожидаемся начатых записей; незапущенные задачи снимаются
+        self.tasks.shutdown()
+        super().closeEvent(event)
 
 
 class RecipeDialog(QDialog):
@@ -1,41 +1,199 @@
 ﻿# app/logger_config.py
 """
-Настройка логера и handler для QTextEdit (GUI).
+Настройка логирования: асинхронный конвейер на очереди и handler для QTextEdit (GUI).
+
+Потоки, которые пишут в лог, только кладут запись в очередь (QueueHandler);
+форматирование и вывод выполняет отдельный поток QueueListener. Поэтому пакетные
+операции не ждут вывода, а запись в лог из рабочих потоков безопасна.
+Приёмники (sinks): консоль, необязательный файл с ротацией, окно журнала GUI.
 """
 
+import atexit
 import logging
-from PySide6.QtCore import QObject, Signal
+import logging.handlers
+import queue
+import threading
+from typing import List, Optional
+
+try:
+    from PySide6.QtCore import QObject, QTimer, Signal
+except ImportError:  # веб-версия и CLI работают без Qt
+    QObject = None
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DEFAULT_LOG_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 3
+# окно журнала обновляется не чаще раза в GUI_FLUSH_MS и хранит не больше GUI_MAX_LINES строк за раз
+GUI_FLUSH_MS = 100
+GUI_MAX_LINES = 500
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматирования в потоке-источнике.
+    Стандартный prepare() подставляет аргументы сразу, чтобы запись можно было передать
+    в другой процесс; у нас очередь внутри процесса, и %-подстановку выполняет слушатель.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogPipeline:
+    """Очередь + поток-слушатель, раздающий записи приёмникам."""
+
+    def __init__(self, level: int = logging.INFO, fmt: Optional[str] = None, console: bool = True,
+                 log_file: Optional[str] = None, max_bytes: int = DEFAULT_LOG_MAX_BYTES,
+                 backup_count: int = DEFAULT_LOG_BACKUPS):
+        self.level = level
+        self.formatter = logging.Formatter(fmt or DEFAULT_FORMAT)
+        self.queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self.queue_handler = _DeferredQueueHandler(self.queue)
+        self._lock = threading.Lock()
+        self._sinks: List[logging.Handler] = []
+        if console:
+            self._sinks.append(self._prepare(logging.StreamHandler()))
+        if log_file:
+            self._sinks.append(self._prepare(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")))
+        self.listener = logging.handlers.QueueListener(self.queue, *self._sinks, respect_handler_level=True)
+        self._running = False
+
+    def _prepare(self, handler: logging.Handler) -> logging.Handler:
+        if handler.formatter is None:
+            handler.setFormatter(self.formatter)
+        return handler
+
+    def start(self, logger: Optional[logging.Logger] = None) -> "LogPipeline":
+        logger = logger or logging.getLogger()
+        logger.setLevel(self.level)
+        logger.addHandler(self.queue_handler)
+        self.listener.start()
+        self._running = True
+        return self
+
+    def add_sink(self, handler: logging.Handler) -> None:
+        """Добавляет приёмник на ходу (слушатель перезапускается, записи в очереди не теряются)."""
+        with self._lock:
+            self._sinks.append(self._prepare(handler))
+            if self._running:
+                self.listener.stop()
+            self.listener.handlers = tuple(self._sinks)
+            if self._running:
+                self.listener.start()
+
+    def stop(self, logger: Optional[logging.Logger] = None) -> None:
+        """Дописывает оставшиеся записи и отключает конвейер."""
+        (logger or logging.getLogger()).removeHandler(self.queue_handler)
+        with self._lock:
+            if self._running:
+                self.listener.stop()
+                self._running = False
+        for sink in self._sinks:
+            sink.flush()
+
+
+_active: Optional[LogPipeline] = None
+
+
+def setup_logging(level=logging.INFO, fmt=None, log_file=None, console=True,
+                  max_bytes=DEFAULT_LOG_MAX_BYTES, backup_count=DEFAULT_LOG_BACKUPS) -> LogPipeline:
+    """Ставит конвейер на корневой логгер (повторный вызов заменяет прежний конвейер)."""
+    global _active
+    if _active is not None:
+        _active.stop()
+    _active = LogPipeline(level, fmt, console=console, log_file=log_file,
+                          max_bytes=max_bytes, backup_count=backup_count).start()
+    return _active
+
+
+def add_sink(handler: logging.Handler) -> None:
+    """Подключает приёмник к активному конвейеру, а без конвейера — прямо к корневому логгеру."""
+    if _active is not None:
+        _active.add_sink(handler)
+    else:
+        logging.getLogger().addHandler(handler)
+
+
+def shutdown_logging() -> None:
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_root_logger(level=logging.INFO, handler=None, fmt=None, log_file=None):
+    setup_logging(level=level, fmt=fmt, log_file=log_file)
+    if handler:
+        add_sink(handler)
+    return logging.getLogger()
+
+
+if QObject is not None:
+    class _QtLogBridge(QObject):
+        """Живёт в GUI-потоке; сигнал из потока слушателя доставляется очередью событий Qt."""
+        pending = Signal()
+
+        def __init__(self, flush, interval_ms: int):
+            super().__init__()
+            self._timer = QTimer(self)
+            self._timer.setSingleShot(True)
+            self._timer.setInterval(interval_ms)
+            self._timer.timeout.connect(flush)
+            self.pending.connect(self._schedule)
+
+        def _schedule(self):
+            # все строки, пришедшие до срабатывания таймера, уйдут в виджет одним вызовом
+            if not self._timer.isActive():
+                self._timer.start()
 
 
 class QTextEditHandler(logging.Handler):
     """
-    Лог-хендлер, который вызывает переданную функцию для добавления строки в QTextEdit.
-    append_func должно принимать одну строку.
+    Лог-хендлер для окна журнала. append_func должно принимать одну строку
+    и вызывается только в GUI-потоке, пачкой строк не чаще раза в interval_ms.
+    emit() можно вызывать из любого потока: строка копится в буфере, а в GUI-поток
+    уходит один сигнал на пачку. Если строк накопилось больше max_lines,
+    старые отбрасываются с пометкой.
     """
-    def __init__(self, append_func):
+    def __init__(self, append_func, interval_ms: int = GUI_FLUSH_MS, max_lines: int = GUI_MAX_LINES):
         super().__init__()
+        if QObject is None:
+            raise RuntimeError("Для QTextEditHandler нужен PySide6")
         self.append_func = append_func
+        self.max_lines = max_lines
+        self._buffer: List[str] = []
+        self._dropped = 0
+        self._signalled = False
+        self._buffer_lock = threading.Lock()
+        self._bridge = _QtLogBridge(self.flush_to_widget, interval_ms)
 
     def emit(self, record):
         try:
             msg = self.format(record)
-            # append_func вызывается в GUI-потоке; в простом приложении это безопасно
-            self.append_func(msg)
         except Exception:
             self.handleError(record)
+            return
+        with self._buffer_lock:
+            self._buffer.append(msg)
+            if len(self._buffer) > self.max_lines:
+                extra = len(self._buffer) - self.max_lines
+                del self._buffer[:extra]
+                self._dropped += extra
+            notify = not self._signalled
+            self._signalled = True
+        if notify:
+            self._bridge.pending.emit()
 
-
-def setup_root_logger(level=logging.INFO, handler=None, fmt=None):
-    root = logging.getLogger()
-    root.setLevel(level)
-    if fmt is None:
-        fmt = "%(asctime)s - %(levelname)s - %(message)s"
-    formatter = logging.Formatter(fmt)
-    if handler:
-        handler.setFormatter(formatter)
-        root.addHandler(handler)
-    else:
-        ch = logging.StreamHandler()
-        ch.setFormatter(formatter)
-        root.addHandler(ch)
-    return root
+    def flush_to_widget(self):
+        with self._buffer_lock:
+            lines, self._buffer = self._buffer, []
+            dropped, self._dropped = self._dropped, 0
+            self._signalled = False
+        if dropped:
+            lines.insert(0, f"... пропущено строк журнала: {dropped}")
+        if lines:
+            self.append_func("\n".join(lines))
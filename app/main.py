@@ -5,6 +5,7 @@
 Запускает QApplication, создаёт DB, контроллер и окно.
 """
 
+import os
 import sys
 import logging
 from PySide6.QtWidgets import QApplication
@@ -12,7 +13,7 @@ from .models import RecipeDB
 from .controllers import RecipeController
 from .gui import ModernMainWindow
 
-from .logger_config import setup_root_logger, QTextEditHandler
+from .logger_config import setup_root_logger, shutdown_logging
 
 def run():
     # Создаём приложение Qt
@@ -20,9 +21,9 @@ def run():
 
     # Создаём БД (файл recipes.db рядом с проектом)
     db = RecipeDB(db_path="recipes.db")
-    # Логгер
+    # Логгер: запись в очередь, вывод в консоль (и в файл, если задан RECIPES_LOG_FILE) — в фоновом потоке
     logger = logging.getLogger("recipe_app")
-    setup_root_logger(level=logging.INFO)
+    setup_root_logger(level=logging.INFO, log_file=os.environ.get("RECIPES_LOG_FILE"))
     # Контроллер
     controller = RecipeController(db=db, logger=logger)
     # Окно
@@ -32,7 +33,9 @@ def run():
     # Перевыставим handler для записи в виджет (MainWindow создает QTextEdit handler внутри)
     # Показываем окно
     mw.show()
-    sys.exit(app.exec())
+    code = app.exec()
+    shutdown_logging()
+    sys.exit(code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+# app/menu.py
+"""
+Генератор меню на несколько дней с ограничениями.
+
+Ограничения (MenuConstraints):
+- обязательные теги для каждого приёма пищи (slot_tags) и запрещённые теги (exclude_tags);
+- рецепты в меню не повторяются;
+- у двух блюд одного дня не больше max_shared_ingredients общих ингредиентов;
+- один ингредиент встречается не больше чем в max_ingredient_uses блюдах меню.
+
+Кандидаты выбираются пачкой: для каждой группы приёмов пищи с одинаковыми тегами
+битовое множество подходящих рецептов берётся из индекса тегов в памяти (app.tagquery),
+из него равновероятно выбираются случайные номера и переводятся в id за один проход
+(bitmaps.nth_ids) — каждый подходящий рецепт попадает в выборку с одинаковой вероятностью,
+как бы ни были распределены id. Затем ограничения решаются жадно за один проход
+по перемешанным кандидатам; ингредиенты читаются пачками только для тех кандидатов,
+до которых дошёл проход. Если кандидатов не хватило, выборка увеличивается
+(уже выбранные рецепты не повторяются); если подходящих рецептов меньше выборки, берутся все.
+
+Одинаковые seed и данные дают одинаковое меню; без seed он выбирается случайно
+и возвращается в Menu.seed, чтобы меню можно было повторить.
+"""
+
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from . import bitmaps
+from .models import RecipeDB, RecipeError, RecipeSummary, normalize_tags
+from .tagquery import Node, TagIndex
+
+DEFAULT_SLOTS = ("завтрак", "обед", "ужин")
+MAX_DAYS = 31
+MAX_SLOTS = 8
+# кандидатов в выборке на одно место в меню (и во сколько раз растёт выборка в следующем раунде)
+OVERSAMPLE = 4
+MIN_POOL = 32
+# ингредиенты кандидатов читаются пачками по столько рецептов
+INGREDIENT_BATCH = 64
+# раунды доборки кандидатов
+SAMPLE_ROUNDS = 3
+
+
+@dataclass
+class MenuConstraints:
+    slot_tags: Dict[str, List[str]] = field(default_factory=dict)
+    exclude_tags: List[str] = field(default_factory=list)
+    max_shared_ingredients: Optional[int] = None
+    max_ingredient_uses: Optional[int] = None
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MenuConstraints":
+        """Ограничения из JSON; теги можно задавать списком или строкой через запятую."""
+        if not isinstance(data, dict):
+            raise RecipeError("Ограничения меню должны быть объектом")
+        unknown = set(data) - {"slot_tags", "exclude_tags", "max_shared_ingredients", "max_ingredient_uses", "seed"}
+        if unknown:
+            raise RecipeError(f"Неизвестные ограничения: {', '.join(sorted(unknown))}")
+        slot_tags = data.get("slot_tags") or {}
+        if not isinstance(slot_tags, dict):
+            raise RecipeError("slot_tags должно быть объектом {приём пищи: теги}")
+        return cls(
+            slot_tags={str(slot): _tag_list(tags) for slot, tags in slot_tags.items()},
+            exclude_tags=_tag_list(data.get("exclude_tags")),
+            max_shared_ingredients=_optional_int(data, "max_shared_ingredients"),
+            max_ingredient_uses=_optional_int(data, "max_ingredient_uses", minimum=1),
+            seed=_optional_int(data, "seed"),
+        )
+
+
+def _tag_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return normalize_tags(value)
+    if isinstance(value, (list, tuple)):
+        return normalize_tags(",".join(str(v) for v in value))
+    raise RecipeError(f"Теги должны быть строкой или списком, получено {value!r}")
+
+
+def _optional_int(data: Dict[str, Any], name: str, minimum: int = 0) -> Optional[int]:
+    value = data.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise RecipeError(f"{name} должно быть целым числом не меньше {minimum}")
+    return value
+
+
+@dataclass
+class MenuItem:
+    day: int  # с 1
+    slot: str
+    recipe: Optional[RecipeSummary]  # None — подходящего рецепта не нашлось
+
+
+@dataclass
+class Menu:
+    days: int
+    slots: List[str]
+    seed: int
+    items: List[MenuItem]
+
+    def unfilled(self) -> List[Tuple[int, str]]:
+        return [(item.day, item.slot) for item in self.items if item.recipe is None]
+
+    def to_dict(self) -> Dict[str, Any]:
+        days: List[Dict[str, Any]] = [{"day": d + 1, "meals": {}} for d in range(self.days)]
+        for item in self.items:
+            days[item.day - 1]["meals"][item.slot] = item.recipe.to_dict() if item.recipe else None
+        return {"seed": self.seed, "slots": self.slots, "days": days,
+                "unfilled": [{"day": d, "slot": s} for d, s in self.unfilled()]}
+
+
+def _candidates_query(required: Tuple[str, ...], excluded: Tuple[str, ...]) -> Node:
+    # все теги группы и ни одного запрещённого; пустой AND — все рецепты
+    return ("and", tuple(("tag", t) for t in required) + tuple(("not", ("tag", t)) for t in excluded))
+
+
+class MenuPlanner:
+    def __init__(self, db: RecipeDB, tags: Optional[TagIndex] = None):
+        self.db = db
+        self.tags = tags or TagIndex(db)
+
+    def generate(self, days: int = 7, slots: Optional[Sequence[str]] = None,
+                 constraints: Optional[MenuConstraints] = None) -> Menu:
+        constraints = constraints or MenuConstraints()
+        slots = [str(s).strip() for s in (slots or DEFAULT_SLOTS) if str(s).strip()]
+        if not 1 <= int(days) <= MAX_DAYS:
+            raise RecipeError(f"Число дней должно быть от 1 до {MAX_DAYS}")
+        if not 1 <= len(slots) <= MAX_SLOTS or len(set(slots)) != len(slots):
+            raise RecipeError(f"Нужно от 1 до {MAX_SLOTS} разных приёмов пищи")
+        days = int(days)
+        seed = constraints.seed if constraints.seed is not None else random.randrange(2 ** 31)
+        rng = random.Random(seed)
+        excluded = tuple(constraints.exclude_tags)
+
+        # приёмы пищи с одинаковыми тегами делят одну выборку кандидатов
+        slot_key = {slot: tuple(sorted(constraints.slot_tags.get(slot, ()))) for slot in slots}
+        need = Counter(slot_key.values())
+        candidates = {key: self.tags.query(_candidates_query(key, excluded)) for key in need}
+        pools: Dict[Tuple[str, ...], List[int]] = {key: [] for key in need}
+        # номера (в candidates[key]) уже выбранных рецептов, чтобы доборка их не повторяла
+        taken: Dict[Tuple[str, ...], Set[int]] = {key: set() for key in need}
+        pending = list(need)
+        ingredients: Dict[int, FrozenSet[int]] = {}
+
+        chosen: List[Optional[int]] = []
+        for round_no in range(SAMPLE_ROUNDS):
+            for key in pending:
+                target = max(MIN_POOL, days * need[key] * OVERSAMPLE) * (OVERSAMPLE ** round_no)
+                pools[key].extend(self._sample(candidates[key], taken[key], target, rng))
+            chosen = self._solve(days, slots, slot_key, pools, ingredients, constraints)
+            # добираем кандидатов только для тех групп, где остались пустые места
+            short = {slot_key[slots[i % len(slots)]] for i, rid in enumerate(chosen) if rid is None}
+            pending = [key for key in need if key in short]
+            if not pending:
+                break
+
+        summaries = {s.id: s for s in self.db.get_summaries([rid for rid in chosen if rid is not None])}
+        items = [MenuItem(day=i // len(slots) + 1, slot=slots[i % len(slots)],
+                          recipe=summaries.get(rid) if rid is not None else None)
+                 for i, rid in enumerate(chosen)]
+        return Menu(days=days, slots=slots, seed=seed, items=items)
+
+    @staticmethod
+    def _sample(candidates: int, taken: Set[int], target: int, rng: random.Random) -> List[int]:
+        """До target ещё не выбранных рецептов из candidates, равновероятно, в случайном порядке."""
+        total = bitmaps.count(candidates)
+        free = total - len(taken)
+        if free <= 0:
+            return []
+        if free <= target:
+            ranks = [r for r in range(total) if r not in taken]
+        else:
+            ranks = []
+            while len(ranks) < target:
+                r = rng.randrange(total)
+                if r not in taken:
+                    taken.add(r)
+                    ranks.append(r)
+        taken.update(ranks)
+        ids = bitmaps.nth_ids(candidates, ranks)
+        rng.shuffle(ids)
+        return ids
+
+    def _solve(self, days: int, slots: List[str], slot_key: Dict[str, Tuple[str, ...]],
+               pools: Dict[Tuple[str, ...], List[int]], ingredients: Dict[int, FrozenSet[int]],
+               constraints: MenuConstraints) -> List[Optional[int]]:
+        max_shared = constraints.max_shared_ingredients
+        max_uses = constraints.max_ingredient_uses
+        check = max_shared is not None or max_uses is not None
+        used = set()
+        uses: Counter = Counter()
+        chosen: List[Optional[int]] = []
+        for _ in range(days):
+            today: List[FrozenSet[int]] = []
+            for slot in slots:
+                pool = pools[slot_key[slot]]
+                pick, picked = None, frozenset()
+                for index, rid in enumerate(pool):
+                    if rid in used:
+                        continue
+                    ing = self._ingredients(ingredients, pool, index) if check else frozenset()
+                    if max_shared is not None and any(len(ing & other) > max_shared for other in today):
+                        continue
+                    if max_uses is not None and any(uses[i] >= max_uses for i in ing):
+                        continue
+                    pick, picked = rid, ing
+                    break
+                chosen.append(pick)
+                if pick is not None:
+                    used.add(pick)
+                    today.append(picked)
+                    uses.update(picked)
+        return chosen
+
+    def _ingredients(self, cache: Dict[int, FrozenSet[int]], pool: List[int], index: int) -> FrozenSet[int]:
+        ing = cache.get(pool[index])
+        if ing is None:
+            batch = [rid for rid in pool[index:index + INGREDIENT_BATCH] if rid not in cache]
+            for rid, iids in self.db.ingredients_of(batch).items():
+                cache[rid] = frozenset(iids)
+            ing = cache[pool[index]]
+        return ing
@@ -0,0 +1,294 @@
+# app/metrics.py
+"""
+Метрики запросов к SQLite и HTTP-эндпоинтов в формате Prometheus (text exposition 0.0.4).
+
+- QueryMetrics — гистограммы задержки по каждому SQL-выражению, число строк,
+  журнал медленных запросов (порог slow_ms, логгер recipes.sql; параметры запроса
+  попадают в лог только при log_params=True — в них пользовательские данные);
+- InstrumentedConnection / InstrumentedCursor — подключаются к sqlite3.connect(factory=...)
+  и замеряют время внутри execute и fetch* (время приложения между вызовами не учитывается);
+- render_prometheus — текст для эндпоинта /metrics.
+
+Метрики собираются, только если RecipeDB создан с metrics=QueryMetrics(...):
+без них соединения обычные и накладных расходов нет.
+"""
+
+import bisect
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# границы корзин в секундах (как у клиентских библиотек Prometheus, плюс 100 мкс для быстрых запросов)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SLOW_MS = 100.0
+SLOW_LOG_SIZE = 100
+MAX_STATEMENT_LENGTH = 200
+
+sql_logger = logging.getLogger("recipes.sql")
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами; счётчики корзин не накопительные (см. cumulative)."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result, running = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            result.append((_format_float(bound), running))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class MetricFamily:
+    """Набор гистограмм (и сопутствующих счётчиков) с одинаковыми метками."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[Tuple[str, ...], Histogram] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        hist = self.histograms.get(labels)
+        if hist is None:
+            hist = self.histograms[labels] = Histogram(self.buckets)
+        hist.observe(value)
+
+    def render(self, lines: List[str]) -> None:
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, hist in sorted(self.histograms.items()):
+            base = _labels(self.labelnames, labels)
+            for le, n in hist.cumulative():
+                lines.append(f"{self.name}_bucket{{{base}{',' if base else ''}le=\"{le}\"}} {n}")
+            lines.append(f"{self.name}_sum{{{base}}} {_format_float(hist.total)}")
+            lines.append(f"{self.name}_count{{{base}}} {hist.count}")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_statement(sql: str) -> str:
+    """Ключ выражения для метрик: пробелы схлопнуты, списки '?, ?, ?' свёрнуты, длина ограничена."""
+    text = re.sub(r"\s+", " ", sql).strip()
+    text = re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", text)
+    if len(text) > MAX_STATEMENT_LENGTH:
+        text = text[:MAX_STATEMENT_LENGTH - 3] + "..."
+    return text
+
+
+class QueryMetrics:
+    """Потокобезопасный реестр метрик SQL-выражений."""
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 logger: Optional[logging.Logger] = None, log_params: bool = False):
+        self.slow_ms = slow_ms
+        self.log_params = log_params
+        self.logger = logger or sql_logger
+        self._lock = threading.Lock()
+        self._durations = MetricFamily("recipes_sql_duration_seconds",
+                                       "Время выполнения SQL-выражения (execute + fetch)", ("statement",), buckets)
+        self._rows: Dict[str, int] = {}
+        self._slow_total = 0
+        self._slow: Deque[Tuple[str, float, int, str]] = deque(maxlen=SLOW_LOG_SIZE)
+
+    def record(self, sql: str, seconds: float, rows: int, params=None) -> None:
+        key = normalize_statement(sql)
+        slow = self.slow_ms is not None and seconds * 1000 >= self.slow_ms
+        with self._lock:
+            self._durations.observe((key,), seconds)
+            self._rows[key] = self._rows.get(key, 0) + max(rows, 0)
+            if slow:
+                self._slow_total += 1
+                self._slow.append((time.strftime("%Y-%m-%dT%H:%M:%S"), seconds * 1000, rows, key))
+        if slow and self.log_params:
+            self.logger.warning("Медленный запрос: %.1f мс, строк %d: %s; параметры %.200r",
+                                seconds * 1000, rows, key, params)
+        elif slow:
+            self.logger.warning("Медленный запрос: %.1f мс, строк %d: %s", seconds * 1000, rows, key)
+
+    def slow_queries(self) -> List[Tuple[str, float, int, str]]:
+        """Последние медленные запросы: (время, мс, строк, выражение)."""
+        with self._lock:
+            return list(self._slow)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{выражение: {"count", "total_ms", "rows"}} — для тестов и отладки."""
+        with self._lock:
+            return {
+                key[0]: {"count": h.count, "total_ms": h.total * 1000, "rows": self._rows.get(key[0], 0)}
+                for key, h in self._durations.histograms.items()
+            }
+
+    def render(self, lines: List[str]) -> None:
+        with self._lock:
+            self._durations.render(lines)
+            lines.append("# HELP recipes_sql_rows_total Строк прочитано или изменено выражением")
+            lines.append("# TYPE recipes_sql_rows_total counter")
+            for key, rows in sorted(self._rows.items()):
+                lines.append(f"recipes_sql_rows_total{{{_labels(('statement',), (key,))}}} {rows}")
+            lines.append("# HELP recipes_sql_slow_queries_total Запросов дольше порога slow_ms")
+            lines.append("# TYPE recipes_sql_slow_queries_total counter")
+            lines.append(f"recipes_sql_slow_queries_total {self._slow_total}")
+
+
+class RequestMetrics:
+    """Время обработки HTTP-запросов по методу, шаблону маршрута и статусу."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self._durations = MetricFamily("recipes_http_request_duration_seconds",
+                                       "Время обработки HTTP-запроса (до отправки заголовков ответа)",
+                                       ("method", "route", "status"), buckets)
+
+    def record(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self._durations.observe((method, route, str(status)), seconds)
+
+    def render(self, lines: List[str]) -> None:
+        with self._lock:
+            self._durations.render(lines)
+
+
+def render_prometheus(*registries) -> str:
+    lines: List[str] = []
+    for registry in registries:
+        if registry is not None:
+            registry.render(lines)
+    return "\n".join(lines) + "\n"
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+# -----------------------
+# Инструментированные соединения sqlite3
+# -----------------------
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, замеряющий время внутри execute и последующих fetch*/итерации.
+    Наблюдение закрывается, когда строки кончились, при следующем execute,
+    при close() или при удалении курсора.
+    """
+
+    def _begin(self, sql: str, params) -> None:
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self) -> None:
+        sql = getattr(self, "_sql", None)
+        if sql is None:
+            return
+        self._sql = None
+        rows = self._rows or max(self.rowcount, 0)
+        self.connection.metrics.record(sql, self._elapsed, rows, self._params)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+
+    def executescript(self, sql_script):
+        self._finish()
+        return super().executescript(sql_script)
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._elapsed += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed_fetch(super().fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, у которого все курсоры (и conn.execute) пишут в self.metrics."""
+
+    metrics: QueryMetrics
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
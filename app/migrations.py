@@ -0,0 +1,302 @@
+# app/migrations.py
+"""
+Версионные миграции схемы SQLite.
+Текущая версия схемы хранится в PRAGMA user_version.
+Каждая миграция выполняется в отдельной транзакции вместе с повышением user_version,
+поэтому прерванная миграция откатывается целиком и будет повторена при следующем запуске.
+Все миграции идемпотентны (IF NOT EXISTS / пересборка), чтобы их можно было применять
+к уже существующим рабочим файлам recipes.db, созданным до появления версий.
+"""
+
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from .models import RecipeError, normalize_tags, sync_recipe_ingredients
+
+
+class MigrationError(RecipeError):
+    """Выбрасывается, если миграция схемы завершилась ошибкой."""
+    pass
+
+
+def _m001_recipes(cur: sqlite3.Cursor) -> None:
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        ingredients TEXT,
+        steps TEXT,
+        tags TEXT,
+        created_at TEXT
+    )
+    """)
+
+
+def _m002_created_at_indexes(cur: sqlite3.Cursor) -> None:
+    # ORDER BY created_at DESC, id DESC — список и keyset-пагинация
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_created_id ON recipes(created_at, id)")
+    # GROUP BY substr(created_at, 1, 10) — агрегация по дням читает только индекс
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_day ON recipes(substr(created_at, 1, 10))")
+
+
+def _m003_recipe_tags(cur: sqlite3.Cursor) -> None:
+    # Нормализованный индекс тегов: одна строка на пару (рецепт, тег)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_tags (
+        tag TEXT NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        PRIMARY KEY (tag, recipe_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_tags_recipe ON recipe_tags(recipe_id)")
+    cur.execute("DELETE FROM recipe_tags")
+    cur.execute("SELECT id, tags FROM recipes WHERE tags IS NOT NULL AND tags != ''")
+    rows = cur.fetchall()
+    cur.executemany(
+        "INSERT INTO recipe_tags(tag, recipe_id) VALUES (?, ?)",
+        [(tag, row[0]) for row in rows for tag in normalize_tags(row[1])]
+    )
+
+
+def _m004_fts(cur: sqlite3.Cursor) -> None:
+    # Полнотекстовый индекс FTS5 поверх recipes (external content), синхронизируется триггерами
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        title, ingredients, steps,
+        content='recipes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts(rowid, title, ingredients, steps)
+        VALUES (new.id, new.title, new.ingredients, new.steps);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, title, ingredients, steps)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.steps);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE OF title, ingredients, steps ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, title, ingredients, steps)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.steps);
+        INSERT INTO recipes_fts(rowid, title, ingredients, steps)
+        VALUES (new.id, new.title, new.ingredients, new.steps);
+    END
+    """)
+    # веса bm25: совпадение в названии важнее ингредиентов, ингредиенты важнее шагов
+    cur.execute("INSERT INTO recipes_fts(recipes_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0)')")
+    cur.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+
+
+def rebuild_daily_activity(cur: sqlite3.Cursor) -> None:
+    """Пересчитывает daily_activity по таблице recipes (полный проход, O(рецептов))."""
+    cur.execute("DELETE FROM daily_activity")
+    cur.execute("""
+    INSERT INTO daily_activity(day, count)
+    SELECT substr(COALESCE(created_at, ''), 1, 10) AS day, COUNT(*)
+    FROM recipes
+    GROUP BY day
+    """)
+
+
+def _daily_activity_triggers(cur: sqlite3.Cursor) -> None:
+    # рецепт без created_at считается в дне '' (его не показывает статистика)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS daily_activity_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO daily_activity(day, count) VALUES (substr(COALESCE(new.created_at, ''), 1, 10), 1)
+        ON CONFLICT(day) DO UPDATE SET count = count + 1;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS daily_activity_ad AFTER DELETE ON recipes BEGIN
+        UPDATE daily_activity SET count = count - 1 WHERE day = substr(COALESCE(old.created_at, ''), 1, 10);
+        DELETE FROM daily_activity WHERE day = substr(COALESCE(old.created_at, ''), 1, 10) AND count <= 0;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS daily_activity_au AFTER UPDATE OF created_at ON recipes
+    WHEN substr(COALESCE(old.created_at, ''), 1, 10) IS NOT substr(COALESCE(new.created_at, ''), 1, 10) BEGIN
+        UPDATE daily_activity SET count = count - 1 WHERE day = substr(COALESCE(old.created_at, ''), 1, 10);
+        DELETE FROM daily_activity WHERE day = substr(COALESCE(old.created_at, ''), 1, 10) AND count <= 0;
+        INSERT INTO daily_activity(day, count) VALUES (substr(COALESCE(new.created_at, ''), 1, 10), 1)
+        ON CONFLICT(day) DO UPDATE SET count = count + 1;
+    END
+    """)
+
+
+def _m005_daily_activity(cur: sqlite3.Cursor) -> None:
+    # Материализованные счётчики добавлений по дням, поддерживаются триггерами
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS daily_activity (
+        day TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    _daily_activity_triggers(cur)
+    rebuild_daily_activity(cur)
+
+
+def _m006_data_version(cur: sqlite3.Cursor) -> None:
+    # Версия данных: растёт при любом изменении recipes (в т.ч. из другого процесса),
+    # по ней веб-слой инвалидирует кэш и строит ETag / Last-Modified
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS db_meta (
+        key TEXT PRIMARY KEY,
+        value
+    ) WITHOUT ROWID
+    """)
+    cur.execute("INSERT OR IGNORE INTO db_meta(key, value) VALUES ('data_version', 0)")
+    cur.execute("""
+    INSERT OR IGNORE INTO db_meta(key, value)
+    VALUES ('last_modified', strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+    """)
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS db_meta_{event.lower()} AFTER {event} ON recipes BEGIN
+            UPDATE db_meta SET value = value + 1 WHERE key = 'data_version';
+            UPDATE db_meta SET value = strftime('%Y-%m-%dT%H:%M:%S', 'now') WHERE key = 'last_modified';
+        END
+        """)
+
+
+# Сколько последних записей журнала изменений хранить; отставшие читатели перестраиваются целиком
+CHANGE_LOG_KEEP = 100000
+
+
+def _m007_recipe_changes(cur: sqlite3.Cursor) -> None:
+    # Журнал изменений: id каждого добавленного / изменённого / удалённого рецепта.
+    # По нему кэши в памяти (индекс ингредиентов и т.п.) догоняют БД инкрементально,
+    # в том числе после записи из другого процесса
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_id INTEGER NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_changes_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipe_changes(recipe_id) VALUES (new.id);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_changes_au AFTER UPDATE ON recipes BEGIN
+        INSERT INTO recipe_changes(recipe_id) VALUES (new.id);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_changes_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipe_changes(recipe_id) VALUES (old.id);
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_changes_trim AFTER INSERT ON recipe_changes BEGIN
+        DELETE FROM recipe_changes WHERE seq <= new.seq - {int(CHANGE_LOG_KEEP)};
+    END
+    """)
+
+
+def _m008_ingredients(cur: sqlite3.Cursor) -> None:
+    # Нормализованный словарь ингредиентов и связь рецепт — ингредиент
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingredients (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        ingredient_id INTEGER NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        PRIMARY KEY (ingredient_id, recipe_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients(recipe_id, ingredient_id)")
+    # заполнение связей — в миграции 10, вместе с ключами ингредиентов
+
+
+def _m009_created_key_index(cur: sqlite3.Cursor) -> None:
+    # Миграция схемы не переписывает данные: NULL в created_at остаётся NULL, а список
+    # сортируется по COALESCE(created_at, '') (models.CREATED_KEY) — индекс строится по тому же выражению
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_created_key ON recipes(COALESCE(created_at, ''), id)")
+    cur.execute("DROP INDEX IF EXISTS idx_recipes_created_id")
+    # статистика по дням читает daily_activity (миграция 5), индекс по дню только замедлял запись
+    cur.execute("DROP INDEX IF EXISTS idx_recipes_day")
+    # триггеры daily_activity падали на NULL в created_at (раньше миграция 2 заменяла NULL на '')
+    for name in ("daily_activity_ai", "daily_activity_ad", "daily_activity_au"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _daily_activity_triggers(cur)
+
+
+def _m010_ingredient_keys(cur: sqlite3.Cursor) -> None:
+    # Ингредиенты сравниваются по ключу без окончаний (models.ingredient_key), альтернативы
+    # через «или» разделяются: словарь и связи пересобираются по текущим правилам разбора
+    cur.execute("DELETE FROM recipe_ingredients")
+    cur.execute("DROP TABLE IF EXISTS ingredients")
+    cur.execute("""
+    CREATE TABLE ingredients (
+        id INTEGER PRIMARY KEY,
+        key TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL
+    )
+    """)
+    cur.execute("SELECT id, ingredients FROM recipes WHERE ingredients IS NOT NULL AND ingredients != ''")
+    rows = cur.fetchall()
+    for row in rows:
+        sync_recipe_ingredients(cur, row[0], row[1])
+
+
+# (версия, описание, функция) — строго по возрастанию версии; новые миграции добавляются в конец
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "таблица recipes", _m001_recipes),
+    (2, "индексы по created_at и по дню", _m002_created_at_indexes),
+    (3, "нормализованный индекс тегов recipe_tags", _m003_recipe_tags),
+    (4, "полнотекстовый индекс recipes_fts", _m004_fts),
+    (5, "счётчики добавлений по дням daily_activity", _m005_daily_activity),
+    (6, "версия данных db_meta", _m006_data_version),
+    (7, "журнал изменений recipe_changes", _m007_recipe_changes),
+    (8, "словарь ингредиентов и recipe_ingredients", _m008_ingredients),
+    (9, "created_at без подмены NULL: индекс списка и триггеры daily_activity", _m009_created_key_index),
+    (10, "ключи ингредиентов без окончаний, «или» разделяет альтернативы", _m010_ingredient_keys),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None, logger=None) -> int:
+    """
+    Применяет недостающие миграции до версии target (по умолчанию — последней).
+    Возвращает итоговую версию схемы.
+    """
+    target = latest_version() if target is None else target
+    if conn.in_transaction:
+        conn.commit()
+    for version, description, apply in MIGRATIONS:
+        if version > target or version <= schema_version(conn):
+            continue
+        cur = conn.cursor()
+        try:
+            # IMMEDIATE берёт блокировку записи сразу: второй процесс дождётся нас и
+            # после перепроверки user_version пропустит уже применённую миграцию
+            cur.execute("BEGIN IMMEDIATE")
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            apply(cur)
+            cur.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise MigrationError(f"Миграция {version} ({description}) не выполнена: {e}") from e
+        if logger:
+            logger.info("Применена миграция схемы %d: %s", version, description)
+    return schema_version(conn)
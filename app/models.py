@@ -12,11 +12,26 @@ from typing import List, Optional
 """
 
 from dataclasses import dataclass
-from typing import Optional, List, Tuple, Dict
+from typing import Any, Callable, Optional, List, Tuple, Dict, Iterable, Iterator, Union
 import sqlite3
+import base64
+from array import array
+import contextlib
 import datetime
+import functools
+import html
 import json
 import os
+import queue
+import random
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+import urllib.request
+
+from .metrics import InstrumentedConnection, QueryMetrics
 
 
 # -----------------------
@@ -63,6 +78,375 @@ class Recipe:
     def to_tuple_for_insert(self) -> Tuple:
         return (self.title, self.ingredients, self.steps, self.tags, self.created_at)
 
+    def tag_list(self) -> List[str]:
+        return normalize_tags(self.tags)
+
+
+class RecipeSummary:
+    """
+    Облегчённое представление рецепта для списков: только то, что показывают таблицы.
+    __slots__ — без __dict__ на каждый объект; ингредиенты и шаги не читаются из БД вовсе,
+    полный рецепт загружается по требованию через RecipeDB.get().
+    """
+    __slots__ = ("id", "title", "tags", "created_at")
+
+    def __init__(self, id: int, title: str, tags: str, created_at: str):
+        self.id = id
+        self.title = title
+        self.tags = tags
+        self.created_at = created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "title": self.title, "tags": self.tags, "created_at": self.created_at}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RecipeSummary):
+            return NotImplemented
+        return (self.id, self.title, self.tags, self.created_at) == (other.id, other.title, other.tags, other.created_at)
+
+    def __repr__(self) -> str:
+        return f"RecipeSummary(id={self.id!r}, title={self.title!r}, tags={self.tags!r}, created_at={self.created_at!r})"
+
+
+# Колонки выборок и row_factory, строящие объекты прямо из кортежа строки
+RECIPE_COLUMNS = "id, title, ingredients, steps, tags, created_at"
+SUMMARY_COLUMNS = "id, title, tags, created_at"
+# Ключ сортировки списка: NULL в created_at считается пустой строкой (не выпадает из keyset-сравнения);
+# по этому выражению построен индекс idx_recipes_created_key
+CREATED_KEY = "COALESCE(created_at, '')"
+
+
+def recipe_row_factory(cursor: sqlite3.Cursor, row: Tuple) -> Recipe:
+    return Recipe(row[0], row[1], row[2] or "", row[3] or "", row[4] or "", row[5] or "")
+
+
+def summary_row_factory(cursor: sqlite3.Cursor, row: Tuple) -> RecipeSummary:
+    return RecipeSummary(row[0], row[1], row[2] or "", row[3] or "")
+
+
+def normalize_tags(tags: Optional[str]) -> List[str]:
+    """
+    Разбивает CSV-строку тегов на нормализованные теги:
+    пробелы обрезаются, регистр приводится к нижнему, дубликаты и пустые убираются.
+    """
+    result = []
+    for part in (tags or "").split(","):
+        tag = part.strip().lower()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+# Сколько раз пробуем случайный id из диапазона, прежде чем перейти к OFFSET-выборке
+RANDOM_PROBE_ATTEMPTS = 16
+
+# Сколько ждать блокировки записи другим соединением, прежде чем получить "database is locked"
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+# Режимы PRAGMA synchronous для пишущих соединений
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Размер страницы для keyset-пагинации
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Маркеры подсветки в сниппетах FTS5 (заменяются на <mark> после экранирования)
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+
+
+@dataclass
+class SearchHit:
+    """Результат полнотекстового поиска: рецепт, оценка bm25 и сниппет с подсветкой."""
+    recipe: Recipe
+    score: float
+    snippet: str
+
+    def snippet_html(self) -> str:
+        escaped = html.escape(self.snippet)
+        return escaped.replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+
+@dataclass
+class RecipePage:
+    """Страница списка рецептов; next_cursor is None, если это последняя страница."""
+    items: List[Union[Recipe, RecipeSummary]]
+    next_cursor: Optional[str]
+
+
+@dataclass
+class BatchResult:
+    """Результат одного элемента пакетной операции: ok и id рецепта либо текст ошибки."""
+    index: int
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    """Версия данных (растёт при каждом изменении рецептов) и время последнего изменения (UTC, ISO)."""
+    version: int
+    last_modified: str
+
+
+def encode_cursor(created_at: str, recipe_id: int) -> str:
+    raw = json.dumps([created_at, recipe_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, recipe_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(created_at, str) or not isinstance(recipe_id, int):
+            raise ValueError(cursor)
+        return created_at, recipe_id
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise RecipeError(f"Некорректный курсор страницы: {cursor!r}") from e
+
+
+# Поля рецепта, доступные в JSON API (?fields=...); порядок ключей в ответе — как здесь
+JSON_FIELDS = ("id", "title", "ingredients", "steps", "tags", "created_at")
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Tuple[str, ...]:
+    """'title,tags' или список имён -> кортеж полей без повторов; пусто — все поля."""
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    names: List[str] = []
+    for name in fields or ():
+        name = name.strip()
+        if not name:
+            continue
+        if name not in JSON_FIELDS:
+            raise RecipeError(f"Неизвестное поле {name!r}, доступны: {', '.join(JSON_FIELDS)}")
+        if name not in names:
+            names.append(name)
+    return tuple(names) or JSON_FIELDS
+
+
+def json_object_sql(fields: Tuple[str, ...]) -> str:
+    # имена полей только из JSON_FIELDS, поэтому подстановка в текст запроса безопасна
+    parts = []
+    for name in fields:
+        column = name if name == "id" else f"coalesce({name}, '')"
+        parts.append(f"'{name}', {column}")
+    return f"json_object({', '.join(parts)})"
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5:
+    каждое слово берётся в кавычки и ищется по префиксу, слова объединяются через AND.
+    """
+    words = re.findall(r"\w+", query or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+
+# Слова, которые не являются частью названия ингредиента (единицы измерения, тара и т.п.)
+INGREDIENT_STOPWORDS = {
+    "г", "гр", "грамм", "граммов", "кг", "мг", "мл", "л", "литр", "литра", "шт", "штук", "штуки",
+    "ст", "ч", "стакан", "стакана", "стаканов", "ложка", "ложки", "ложек", "щепотка", "щепотки",
+    "зубчик", "зубчика", "зубчиков", "пучок", "пучка", "по", "вкусу", "для", "и",
+    "столовая", "столовые", "столовых", "чайная", "чайные", "чайных",
+    "банка", "банки", "банок", "упаковка", "упаковки", "упаковок", "пачка", "пачки", "пачек",
+    "бутылка", "бутылки", "бутылок", "кусок", "куска", "кусков", "ломтик", "ломтика", "ломтиков",
+    "веточка", "веточки", "веточек", "горсть", "горсти", "капля", "капли", "капель",
+    "g", "kg", "mg", "ml", "l", "pcs", "tbsp", "tsp", "cup", "cups", "to", "taste",
+    "can", "cans", "pack", "packs", "pinch", "clove", "cloves",
+}
+
+# Альтернативы («майонез или йогурт») — отдельные ингредиенты, как и перечисление через запятую
+_INGREDIENT_SEPARATORS = re.compile(r"[,;\n]+|\b(?:или|or)\b")
+# Окончания, по которым различаются формы одного слова (яйцо/яйца, консервированный/консервированные)
+_WORD_ENDING = re.compile(r"(?<=\w{3})[аяоеёыиуюьйэ]{1,2}$")
+
+
+def normalize_ingredient(item: str) -> str:
+    """'Мука пшеничная 200 г (просеянная)' -> 'мука пшеничная'."""
+    item = re.sub(r"\([^)]*\)", " ", (item or "").lower().replace("ё", "е"))
+    words = [w for w in re.findall(r"[^\W\d_]+", item) if w not in INGREDIENT_STOPWORDS]
+    return " ".join(words)
+
+
+def ingredient_key(name: str) -> str:
+    """
+    Ключ нормализованного названия без окончаний: 'яйцо' и 'яйца' -> 'яйц'.
+    По ключу ингредиенты сравниваются, а в словаре хранится первое встреченное название.
+    """
+    words = []
+    for w in name.split():
+        if re.fullmatch(r"[a-z]{4,}", w) and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(_WORD_ENDING.sub("", w))
+    return " ".join(words)
+
+
+def parse_ingredients(text: Optional[str]) -> List[str]:
+    """
+    Разбивает свободный текст ингредиентов (через запятую, ';', с новой строки или «или»)
+    на нормализованные названия; формы одного ингредиента (яйцо/яйца) считаются повтором.
+    """
+    result: Dict[str, str] = {}
+    for part in _INGREDIENT_SEPARATORS.split(text or ""):
+        name = normalize_ingredient(part)
+        if name:
+            result.setdefault(ingredient_key(name), name)
+    return list(result.values())
+
+
+def sync_recipe_ingredients(cur: sqlite3.Cursor, recipe_id: int, text: Optional[str]) -> None:
+    """Перезаписывает связи recipe_ingredients рецепта по тексту его ингредиентов."""
+    cur.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+    names = parse_ingredients(text)
+    if not names:
+        return
+    keys = [ingredient_key(n) for n in names]
+    cur.executemany("INSERT OR IGNORE INTO ingredients(key, name) VALUES (?, ?)", zip(keys, names))
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        cur.execute(
+            "INSERT OR IGNORE INTO recipe_ingredients(ingredient_id, recipe_id) "
+            f"SELECT id, ? FROM ingredients WHERE key IN ({', '.join('?' * len(chunk))})",
+            (recipe_id, *chunk)
+        )
+
+
+# -----------------------
+# Групповой commit
+# -----------------------
+class GroupCommitter:
+    """
+    Групповой commit для конкурентных писателей.
+    Операции записи из разных потоков ставятся в очередь; поток-писатель собирает всё,
+    что пришло за окно window_ms (не больше max_batch), выполняет операции в одной
+    транзакции — каждую в своей точке сохранения — и делает один commit на всю группу.
+    submit() возвращает результат только после commit, поэтому гарантии для вызывающего
+    те же, что у обычной записи, но fsync приходится один на группу, а не на запрос.
+    """
+
+    def __init__(self, db: "RecipeDB", window_ms: float = 2.0, max_batch: int = 256):
+        self.db = db
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        # под _lock проверяется _closed и ставится операция: после маркера остановки в очередь ничего не попадёт
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="recipe-db-writer", daemon=True)
+        self._thread.start()
+
+    def is_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable[[], Any]) -> Any:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RecipeError("База данных закрыта: запись невозможна")
+            self._queue.put((fn, future))
+        return future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            first = not self._closed
+            self._closed = True
+            if first:
+                self._queue.put(None)
+        self._thread.join()
+        self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        # операции, которые писатель уже не выполнит, не должны ждать результата вечно
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RecipeError("База данных закрыта: запись невозможна"))
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run(batch)
+        self._fail_pending()
+        self.db._release_thread_connections()
+
+    def _run(self, batch) -> None:
+        outcomes = []
+        try:
+            with self.db.transaction():
+                for fn, future in batch:
+                    try:
+                        with self.db.transaction():
+                            outcomes.append((future, fn(), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # commit всей группы не удался — ошибка у всех её участников
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, value, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+class _ThreadConnections:
+    """Соединения одного потока (хранится в threading.local, см. RecipeDB._own)."""
+    __slots__ = ("conns", "__weakref__")
+
+    def __init__(self):
+        self.conns: List[sqlite3.Connection] = []
+
+
+def _close_connections(pool_lock: threading.Lock, pool: List[sqlite3.Connection],
+                       conns: List[sqlite3.Connection]) -> None:
+    for conn in list(conns):
+        with pool_lock:
+            if conn in pool:
+                pool.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    conns.clear()
+
+
+def _write_op(method):
+    """
+    Публичная операция записи. Вне явной транзакции при включённом групповом commit
+    операция передаётся потоку-писателю; иначе выполняется в текущем потоке.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        group = self._group_commit
+        if group is not None and self._tx_depth() == 0 and not group.is_writer_thread():
+            return group.submit(lambda: method(self, *args, **kwargs))
+        return method(self, *args, **kwargs)
+    return wrapper
+
 
 # -----------------------
 # Класс работы с БД
@@ -71,114 +455,673 @@ class RecipeDB:
     """
     Управление SQLite базой.
     По умолчанию создаёт файл recipes.db в текущей папке.
+
+    Соединения выдаются по одному на поток: у каждого потока своё соединение для записи (conn)
+    и своё read-only соединение для запросов (read_conn). База работает в режиме WAL,
+    поэтому читатели не ждут писателей, а писатели ждут друг друга не дольше busy_timeout_ms.
+
+    Все операции записи выполняются через transaction(): вне явной транзакции каждая
+    фиксируется сама, внутри `with db.transaction():` — вместе со всеми остальными.
+    group_commit_ms включает групповой commit (см. GroupCommitter).
+    synchronous — режим PRAGMA synchronous. По умолчанию FULL: каждый commit делает fsync
+    и переживает отключение питания. NORMAL в режиме WAL быстрее (fsync только при checkpoint),
+    но последние транзакции при сбое питания могут пропасть; групповой commit при NORMAL почти
+    ничего не даёт, потому что делить ему нечего. NORMAL/OFF подходят для одноразовых баз
+    (например, генерации корпуса для замеров).
+    Соединения потока закрываются, когда поток завершается, поэтому короткоживущие
+    потоки пулов не копят открытые файлы.
+    metrics включает замеры каждого SQL-выражения (см. app.metrics.QueryMetrics).
     """
 
-    def __init__(self, db_path: str = "recipes.db"):
+    def __init__(self, db_path: str = "recipes.db", busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 group_commit_ms: Optional[float] = None, metrics: Optional[QueryMetrics] = None,
+                 synchronous: str = "FULL"):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise RecipeError(f"synchronous должен быть одним из {', '.join(SYNCHRONOUS_MODES)}")
         self.db_path = db_path
-        # ensure directory exists when a path has directories
-        base_dir = os.path.dirname(os.path.abspath(db_path))
-        os.makedirs(base_dir, exist_ok=True)
-        # разрешаем многопоточность для GUI (check_same_thread=False)
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.metrics = metrics
+        # ":memory:" — у каждого соединения была бы своя база, поэтому пул не используется
+        self._in_memory = db_path == ":memory:"
+        if not self._in_memory:
+            # ensure directory exists when a path has directories
+            base_dir = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(base_dir, exist_ok=True)
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._shared_conn: Optional[sqlite3.Connection] = None
+        self._group_commit: Optional[GroupCommitter] = None
         self._ensure_table()
+        if group_commit_ms is not None:
+            self._group_commit = GroupCommitter(self, window_ms=group_commit_ms)
+
+    # -----------------------
+    # Пул соединений
+    # -----------------------
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        # check_same_thread=False нужен только для close() из другого потока;
+        # в работе каждое соединение используется лишь потоком-владельцем
+        factory = InstrumentedConnection if self.metrics is not None else sqlite3.Connection
+        if readonly:
+            uri = "file:" + urllib.request.pathname2url(os.path.abspath(self.db_path)) + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not readonly and not self._in_memory:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        with self._pool_lock:
+            self._connections.append(conn)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Соединение текущего потока для записи."""
+        if self._in_memory:
+            if self._shared_conn is None:
+                self._shared_conn = self._connect()
+            return self._shared_conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._own(self._connect())
+        return conn
+
+    @property
+    def read_conn(self) -> sqlite3.Connection:
+        """Read-only соединение текущего потока."""
+        if self._in_memory:
+            return self.conn
+        conn = getattr(self._local, "read_conn", None)
+        if conn is None:
+            conn = self._local.read_conn = self._own(self._connect(readonly=True))
+        return conn
+
+    def _own(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        # владелец живёт только в threading.local потока: когда поток завершается,
+        # threading.local отпускает его, и finalize закрывает соединения этого потока
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = self._local.owner = _ThreadConnections()
+            weakref.finalize(owner, _close_connections, self._pool_lock, self._connections, owner.conns)
+        owner.conns.append(conn)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        # внутри незавершённой транзакции читаем через пишущее соединение, чтобы видеть свои изменения
+        writer = self._shared_conn if self._in_memory else getattr(self._local, "conn", None)
+        if writer is not None and writer.in_transaction:
+            return writer
+        return self.read_conn
+
+    def _release_thread_connections(self) -> None:
+        # закрывает соединения текущего потока (для потоков, которые завершаются)
+        for name in ("conn", "read_conn"):
+            conn = getattr(self._local, name, None)
+            if conn is None:
+                continue
+            owner = getattr(self._local, "owner", None)
+            if owner is not None and conn in owner.conns:
+                owner.conns.remove(conn)
+            _close_connections(self._pool_lock, self._connections, [conn])
+            setattr(self._local, name, None)
+
+    # -----------------------
+    # Транзакции
+    # -----------------------
+    def _tx_depth(self) -> int:
+        return getattr(self._local, "tx_depth", 0)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Единица работы: всё внутри блока фиксируется одним commit или откатывается целиком.
+        Вложенные блоки становятся точками сохранения (SAVEPOINT): ошибка внутри вложенного
+        блока откатывает только его, если внешний код перехватил исключение.
+        """
+        conn = self.conn
+        depth = self._tx_depth()
+        # транзакцию, открытую кем-то в обход transaction(), не фиксируем — только savepoint
+        owner = depth == 0 and not conn.in_transaction
+        savepoint = f"sp_{depth}"
+        if owner:
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        self._local.tx_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.tx_depth = depth
+            if owner:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._local.tx_depth = depth
+        if owner:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE {savepoint}")
 
     def _ensure_table(self):
-        cur = self.conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS recipes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            ingredients TEXT,
-            steps TEXT,
-            tags TEXT,
-            created_at TEXT
+        # Схема создаётся и обновляется версионными миграциями (PRAGMA user_version)
+        from .migrations import migrate
+        migrate(self.conn)
+
+    def _sync_tags(self, cur: sqlite3.Cursor, recipe_id: int, tags: Optional[str]) -> None:
+        cur.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+        cur.executemany(
+            "INSERT INTO recipe_tags(tag, recipe_id) VALUES (?, ?)",
+            [(tag, recipe_id) for tag in normalize_tags(tags)]
         )
-        """)
-        self.conn.commit()
 
     # Create
+    @_write_op
     def add(self, recipe: Recipe) -> int:
         if not recipe.title or not recipe.title.strip():
             raise RecipeError("Название рецепта не может быть пустым")
-        cur = self.conn.cursor()
+        with self.transaction() as conn:
+            return self._insert(conn.cursor(), recipe)
+
+    def _insert(self, cur: sqlite3.Cursor, recipe: Recipe) -> int:
         cur.execute(
             "INSERT INTO recipes(title, ingredients, steps, tags, created_at) VALUES (?, ?, ?, ?, ?)",
             recipe.to_tuple_for_insert()
         )
-        self.conn.commit()
-        return cur.lastrowid
+        rid = cur.lastrowid
+        self._sync_tags(cur, rid, recipe.tags)
+        sync_recipe_ingredients(cur, rid, recipe.ingredients)
+        return rid
+
+    # Create many: пачка рецептов одной транзакцией (один commit и один fsync на пачку)
+    @_write_op
+    def insert_many(self, recipes: Iterable[Recipe]) -> List[int]:
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            return [self._insert(cur, r) for r in recipes]
 
     # Read all
     def list_all(self, limit: Optional[int] = None) -> List[Recipe]:
-        cur = self.conn.cursor()
-        q = "SELECT id, title, ingredients, steps, tags, created_at FROM recipes ORDER BY created_at DESC"
+        return self._list(RECIPE_COLUMNS, recipe_row_factory, limit)
+
+    # Read all, только колонки списка (без ingredients/steps)
+    def list_summaries(self, limit: Optional[int] = None) -> List[RecipeSummary]:
+        return self._list(SUMMARY_COLUMNS, summary_row_factory, limit)
+
+    def _list(self, cols: str, factory, limit: Optional[int]) -> list:
+        cur = self._reader().cursor()
+        cur.row_factory = factory
+        q = f"SELECT {cols} FROM recipes ORDER BY {CREATED_KEY} DESC, id DESC"
         if limit:
-            q += f" LIMIT {int(limit)}"
-        cur.execute(q)
-        rows = cur.fetchall()
-        return [Recipe.from_row(tuple(r)) for r in rows]
+            cur.execute(q + " LIMIT ?", (int(limit),))
+        else:
+            cur.execute(q)
+        return cur.fetchall()
+
+    # Read page: keyset-пагинация по (created_at, id) без OFFSET —
+    # каждая страница начинается с поиска по индексу, поэтому N-я страница стоит как первая.
+    # summary=True — страница RecipeSummary без ingredients/steps
+    def list_page(self, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                  summary: bool = False) -> RecipePage:
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        cur = self._reader().cursor()
+        if summary:
+            cols, cur.row_factory = SUMMARY_COLUMNS, summary_row_factory
+        else:
+            cols, cur.row_factory = RECIPE_COLUMNS, recipe_row_factory
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            cur.execute(
+                f"SELECT {cols} FROM recipes WHERE ({CREATED_KEY}, id) < (?, ?) "
+                f"ORDER BY {CREATED_KEY} DESC, id DESC LIMIT ?",
+                (created_at, last_id, page_size + 1)
+            )
+        else:
+            cur.execute(f"SELECT {cols} FROM recipes ORDER BY {CREATED_KEY} DESC, id DESC LIMIT ?",
+                        (page_size + 1,))
+        items = cur.fetchall()
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            last = items[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return RecipePage(items=items, next_cursor=next_cursor)
+
+    # Read all, потоково: генератор по id пачками (keyset), память не зависит от размера таблицы
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Recipe]:
+        last_id = 0
+        while True:
+            # курсор берётся заново на каждую пачку — генератор можно продолжать из другого потока
+            cur = self._reader().cursor()
+            cur.row_factory = recipe_row_factory
+            cur.execute(
+                f"SELECT {RECIPE_COLUMNS} FROM recipes WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, int(batch_size))
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1].id
 
     # Read one
     def get(self, recipe_id: int) -> Recipe:
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute("SELECT id, title, ingredients, steps, tags, created_at FROM recipes WHERE id = ?", (recipe_id,))
         row = cur.fetchone()
         if not row:
             raise RecipeNotFoundError(f"Рецепт с id={recipe_id} не найден")
         return Recipe.from_row(tuple(row))
 
+    # -----------------------
+    # JSON прямо из SQLite: json_object() собирает объект в запросе, Python только склеивает строки
+    # -----------------------
+    def get_json(self, recipe_id: int, fields: Tuple[str, ...] = JSON_FIELDS) -> str:
+        cur = self._reader().cursor()
+        cur.execute(f"SELECT {json_object_sql(fields)} FROM recipes WHERE id = ?", (recipe_id,))
+        row = cur.fetchone()
+        if not row:
+            raise RecipeNotFoundError(f"Рецепт с id={recipe_id} не найден")
+        return row[0]
+
+    def list_page_json(self, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                       fields: Tuple[str, ...] = JSON_FIELDS) -> Tuple[List[str], Optional[str]]:
+        """Как list_page, но элементы — готовые JSON-объекты; возвращает (items, next_cursor)."""
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        cols = f"{json_object_sql(fields)}, {CREATED_KEY}, id"
+        cur = self._reader().cursor()
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            cur.execute(
+                f"SELECT {cols} FROM recipes WHERE ({CREATED_KEY}, id) < (?, ?) "
+                f"ORDER BY {CREATED_KEY} DESC, id DESC LIMIT ?",
+                (created_at, last_id, page_size + 1)
+            )
+        else:
+            cur.execute(f"SELECT {cols} FROM recipes ORDER BY {CREATED_KEY} DESC, id DESC LIMIT ?",
+                        (page_size + 1,))
+        rows = cur.fetchall()
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][2])
+        return [row[0] for row in rows], next_cursor
+
+    def iter_json_batches(self, fields: Tuple[str, ...] = JSON_FIELDS,
+                          batch_size: int = 1000) -> Iterator[List[str]]:
+        """Весь каталог пачками JSON-строк по возрастанию id (keyset, как iter_all)."""
+        select = f"SELECT {json_object_sql(fields)}, id FROM recipes WHERE id > ? ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            cur = self._reader().cursor()
+            cur.execute(select, (last_id, int(batch_size)))
+            rows = cur.fetchall()
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+            last_id = rows[-1][1]
+
     # Update
+    @_write_op
     def update(self, recipe_id: int, title: str, ingredients: str, steps: str, tags: str) -> None:
-        cur = self.conn.cursor()
+        with self.transaction() as conn:
+            self._update(conn.cursor(), recipe_id, title, ingredients, steps, tags)
+
+    def _update(self, cur: sqlite3.Cursor, recipe_id: int, title: str, ingredients: str, steps: str, tags: str) -> None:
         cur.execute(
             "UPDATE recipes SET title = ?, ingredients = ?, steps = ?, tags = ? WHERE id = ?",
             (title, ingredients, steps, tags, recipe_id)
         )
         if cur.rowcount == 0:
             raise RecipeNotFoundError(f"Рецепт с id={recipe_id} не найден для обновления")
-        self.conn.commit()
+        self._sync_tags(cur, recipe_id, tags)
+        sync_recipe_ingredients(cur, recipe_id, ingredients)
 
     # Delete
+    @_write_op
     def delete(self, recipe_id: int) -> None:
-        cur = self.conn.cursor()
+        with self.transaction() as conn:
+            self._delete(conn.cursor(), recipe_id)
+
+    def _delete(self, cur: sqlite3.Cursor, recipe_id: int) -> None:
         cur.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
         if cur.rowcount == 0:
             raise RecipeNotFoundError(f"Рецепт с id={recipe_id} не найден для удаления")
-        self.conn.commit()
+        cur.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+        cur.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+
+    # -----------------------
+    # Пакетные изменения: одна транзакция на пачку, результат по каждому элементу.
+    # Каждый элемент выполняется во вложенной транзакции (SAVEPOINT), поэтому ошибка
+    # в одном элементе откатывает только его, а остальные фиксируются общим commit.
+    # -----------------------
+    @_write_op
+    def add_many(self, recipes: Iterable[Recipe]) -> List[BatchResult]:
+        def op(cur, recipe):
+            if not recipe.title or not recipe.title.strip():
+                raise RecipeError("Название рецепта не может быть пустым")
+            return self._insert(cur, recipe)
+        return self._run_batch(recipes, op)
 
-    # Поиск по тегу (в простом виде — ищем в строке tags)
+    @_write_op
+    def update_many(self, updates: Iterable[Tuple[int, str, str, str, str]]) -> List[BatchResult]:
+        # updates: (recipe_id, title, ingredients, steps, tags)
+        def op(cur, item):
+            self._update(cur, *item)
+            return item[0]
+        return self._run_batch(updates, op)
+
+    @_write_op
+    def delete_many(self, recipe_ids: Iterable[int]) -> List[BatchResult]:
+        def op(cur, recipe_id):
+            self._delete(cur, recipe_id)
+            return recipe_id
+        return self._run_batch(recipe_ids, op)
+
+    def _run_batch(self, items: Iterable, op) -> List[BatchResult]:
+        results = []
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            for index, item in enumerate(items):
+                try:
+                    with self.transaction():
+                        value = op(cur, item)
+                except (RecipeError, sqlite3.IntegrityError) as e:
+                    results.append(BatchResult(index=index, ok=False, error=str(e)))
+                else:
+                    results.append(BatchResult(index=index, ok=True, id=value))
+        return results
+
+    # Поиск по тегу — точное совпадение через индекс recipe_tags
     def find_by_tag(self, tag: str) -> List[Recipe]:
-        cur = self.conn.cursor()
-        like = f"%{tag}%"
-        cur.execute("SELECT id, title, ingredients, steps, tags, created_at FROM recipes WHERE tags LIKE ? ORDER BY created_at DESC", (like,))
+        tags = normalize_tags(tag)
+        if not tags:
+            return []
+        cur = self._reader().cursor()
+        cur.execute("""
+        SELECT r.id, r.title, r.ingredients, r.steps, r.tags, r.created_at
+        FROM recipe_tags t JOIN recipes r ON r.id = t.recipe_id
+        WHERE t.tag = ?
+        ORDER BY r.created_at DESC
+        """, (tags[0],))
         rows = cur.fetchall()
         return [Recipe.from_row(tuple(r)) for r in rows]
 
+    # Случайный рецепт без загрузки таблицы: пробуем случайные id из диапазона [min, max].
+    # Каждая проба — один поиск по первичному ключу; промахи (дыры после удалений) отбрасываются,
+    # поэтому выбор остаётся равномерным. При сильно разреженных id — запасной путь через OFFSET.
+    def random_recipe(self, tag: Optional[str] = None, attempts: int = RANDOM_PROBE_ATTEMPTS) -> Optional[Recipe]:
+        cols = "r.id, r.title, r.ingredients, r.steps, r.tags, r.created_at"
+        cur = self._reader().cursor()
+        if tag is not None:
+            tags = normalize_tags(tag)
+            if not tags:
+                return None
+            params: Tuple = (tags[0],)
+            # MIN и MAX отдельными подзапросами: вместе в одном SELECT SQLite сканирует всю выборку
+            bounds_q = ("SELECT (SELECT MIN(recipe_id) FROM recipe_tags WHERE tag = ?1), "
+                        "(SELECT MAX(recipe_id) FROM recipe_tags WHERE tag = ?1)")
+            probe_q = (f"SELECT {cols} FROM recipe_tags t JOIN recipes r ON r.id = t.recipe_id "
+                       "WHERE t.tag = ? AND t.recipe_id = ?")
+            count_q = "SELECT COUNT(*) FROM recipe_tags WHERE tag = ?"
+            offset_q = (f"SELECT {cols} FROM recipe_tags t JOIN recipes r ON r.id = t.recipe_id "
+                        "WHERE t.tag = ? ORDER BY t.recipe_id LIMIT 1 OFFSET ?")
+        else:
+            params = ()
+            bounds_q = "SELECT (SELECT MIN(id) FROM recipes), (SELECT MAX(id) FROM recipes)"
+            probe_q = f"SELECT {cols} FROM recipes r WHERE r.id = ?"
+            count_q = "SELECT COUNT(*) FROM recipes"
+            offset_q = f"SELECT {cols} FROM recipes r ORDER BY r.id LIMIT 1 OFFSET ?"
+
+        cur.execute(bounds_q, params)
+        lo, hi = cur.fetchone()
+        if lo is None:
+            return None
+        for _ in range(attempts):
+            cur.execute(probe_q, params + (random.randint(lo, hi),))
+            row = cur.fetchone()
+            if row:
+                return Recipe.from_row(tuple(row))
+
+        cur.execute(count_q, params)
+        total = cur.fetchone()[0]
+        if not total:
+            return None
+        cur.execute(offset_q, params + (random.randrange(total),))
+        row = cur.fetchone()
+        return Recipe.from_row(tuple(row)) if row else None
+
+    # Полнотекстовый поиск по названию, ингредиентам и шагам (ранжирование bm25)
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+        match = build_fts_query(query)
+        if not match:
+            return []
+        cur = self._reader().cursor()
+        cur.execute("""
+        SELECT r.id, r.title, r.ingredients, r.steps, r.tags, r.created_at,
+               recipes_fts.rank AS score,
+               snippet(recipes_fts, -1, ?, ?, '…', 12) AS snip
+        FROM recipes_fts JOIN recipes r ON r.id = recipes_fts.rowid
+        WHERE recipes_fts MATCH ?
+        ORDER BY recipes_fts.rank
+        LIMIT ? OFFSET ?
+        """, (SNIPPET_OPEN, SNIPPET_CLOSE, match, int(limit), int(offset)))
+        return [SearchHit(Recipe.from_row(tuple(r)[:6]), r["score"], r["snip"] or "") for r in cur.fetchall()]
+
     # Количество добавлений по дате -> возвращает dict {date_str: count}
+    # Читает материализованную таблицу daily_activity (её ведут триггеры), то есть O(дней)
     def count_by_date(self) -> Dict[str, int]:
-        cur = self.conn.cursor()
-        # Берём только дату из ISO строки (до 'T') — SQLite SUBSTR or DATE functions are limited, но у нас ISO
-        cur.execute("""
-        SELECT substr(created_at,1,10) as day, COUNT(*) as cnt
-        FROM recipes
-        GROUP BY day
-        ORDER BY day ASC
-        """)
+        cur = self._reader().cursor()
+        cur.execute("SELECT day, count FROM daily_activity WHERE day != '' ORDER BY day ASC")
         rows = cur.fetchall()
-        return {r["day"]: r["cnt"] for r in rows if r["day"]}
+        return {r["day"]: r["count"] for r in rows if r["day"]}
+
+    # Число добавлений по корзинам (day / week / month) за период [start, end] включительно.
+    # Диапазон ищется по первичному ключу daily_activity, группировка — в SQL;
+    # ключ корзины — её первый день ('ГГГГ-ММ-ДД'), неделя начинается с понедельника
+    _BUCKET_SQL = {
+        "day": "day",
+        "week": "date(day, '-' || ((strftime('%w', day) + 6) % 7) || ' days')",
+        "month": "substr(day, 1, 7) || '-01'",
+    }
+
+    def activity_range(self, start: str, end: str, bucket: str = "day") -> List[Tuple[str, int]]:
+        expr = self._BUCKET_SQL.get(bucket)
+        if expr is None:
+            raise RecipeError(f"Неизвестный период {bucket!r}")
+        cur = self._reader().cursor()
+        cur.execute(
+            f"SELECT {expr} AS bucket, SUM(count) FROM daily_activity "
+            "WHERE day BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket",
+            (start, end)
+        )
+        return [(r[0], r[1]) for r in cur.fetchall()]
+
+    # Последний день, в который добавлялись рецепты (или None) — одно чтение с конца индекса
+    def last_activity_day(self) -> Optional[str]:
+        cur = self._reader().cursor()
+        cur.execute("SELECT MAX(day) FROM daily_activity WHERE count > 0 AND day != ''")
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    # Полный пересчёт daily_activity (например, после ручной правки БД в обход триггеров)
+    @_write_op
+    def rebuild_daily_activity(self) -> None:
+        from .migrations import rebuild_daily_activity
+        with self.transaction() as conn:
+            rebuild_daily_activity(conn.cursor())
+
+    # Текущая версия данных — одно чтение по первичному ключу db_meta
+    def data_version(self) -> DataVersion:
+        cur = self._reader().cursor()
+        cur.execute("SELECT key, value FROM db_meta WHERE key IN ('data_version', 'last_modified')")
+        meta = {r["key"]: r["value"] for r in cur.fetchall()}
+        return DataVersion(version=int(meta.get("data_version") or 0), last_modified=meta.get("last_modified") or "")
+
+    # -----------------------
+    # Журнал изменений и индекс ингредиентов (для кэшей в памяти)
+    # -----------------------
+    def change_seq(self) -> int:
+        cur = self._reader().cursor()
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM recipe_changes")
+        return cur.fetchone()[0]
+
+    def changes_since(self, seq: int) -> Tuple[int, Optional[List[int]]]:
+        """
+        Возвращает (текущий seq, id рецептов, изменённых после seq).
+        Вместо списка возвращается None, если часть журнала уже обрезана — тогда нужна полная перестройка.
+        """
+        cur = self._reader().cursor()
+        # MIN и MAX отдельными подзапросами: вместе в одном SELECT SQLite просматривает весь журнал
+        cur.execute("SELECT (SELECT MIN(seq) FROM recipe_changes), (SELECT COALESCE(MAX(seq), 0) FROM recipe_changes)")
+        lo, hi = cur.fetchone()
+        if hi <= seq:
+            return hi, []
+        if lo is None or lo > seq + 1:
+            return hi, None
+        cur.execute("SELECT DISTINCT recipe_id FROM recipe_changes WHERE seq > ? AND seq <= ?", (seq, hi))
+        return hi, [r[0] for r in cur.fetchall()]
+
+    def recipe_ids(self, tag: Optional[str] = None) -> "array[int]":
+        """id всех рецептов (или рецептов с тегом) массивом array('q'): 8 байт на рецепт."""
+        cur = self._reader().cursor()
+        if tag is None:
+            cur.execute("SELECT id FROM recipes")
+        else:
+            cur.execute("SELECT recipe_id FROM recipe_tags WHERE tag = ?", (tag,))
+        result = array("q")
+        while True:
+            rows = cur.fetchmany(10000)
+            if not rows:
+                return result
+            result.extend(row[0] for row in rows)
+
+    def filter_ids(self, recipe_ids: List[int], tag: Optional[str] = None) -> List[int]:
+        """Те из recipe_ids, что существуют (и имеют тег tag), по возрастанию."""
+        found: List[int] = []
+        cur = self._reader().cursor()
+        for i in range(0, len(recipe_ids), 500):
+            chunk = tuple(recipe_ids[i:i + 500])
+            placeholders = ", ".join("?" * len(chunk))
+            if tag is None:
+                cur.execute(f"SELECT id FROM recipes WHERE id IN ({placeholders})", chunk)
+            else:
+                cur.execute(f"SELECT recipe_id FROM recipe_tags WHERE tag = ? AND recipe_id IN ({placeholders})",
+                            (tag,) + chunk)
+            found.extend(row[0] for row in cur.fetchall())
+        return sorted(found)
+
+    def iter_recipe_ingredients(self, batch_size: int = 50000) -> Iterator[Tuple[int, int]]:
+        """Все пары (recipe_id, ingredient_id) по возрастанию recipe_id."""
+        cur = self._reader().cursor()
+        cur.execute("SELECT recipe_id, ingredient_id FROM recipe_ingredients ORDER BY recipe_id, ingredient_id")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for r in rows:
+                yield r[0], r[1]
+
+    def iter_recipe_tags(self, batch_size: int = 50000) -> Iterator[Tuple[str, int]]:
+        """Все пары (tag, recipe_id), сгруппированные по тегу (порядок первичного ключа)."""
+        cur = self._reader().cursor()
+        cur.execute("SELECT tag, recipe_id FROM recipe_tags ORDER BY tag, recipe_id")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for r in rows:
+                yield r[0], r[1]
+
+    def tags_of(self, recipe_ids: List[int]) -> List[Tuple[int, str]]:
+        """Пары (recipe_id, tag) для указанных рецептов."""
+        result: List[Tuple[int, str]] = []
+        cur = self._reader().cursor()
+        for i in range(0, len(recipe_ids), 500):
+            chunk = tuple(recipe_ids[i:i + 500])
+            cur.execute(f"SELECT recipe_id, tag FROM recipe_tags WHERE recipe_id IN ({', '.join('?' * len(chunk))})",
+                        chunk)
+            result.extend((row[0], row[1]) for row in cur.fetchall())
+        return result
+
+    def ingredients_of(self, recipe_ids: List[int]) -> Dict[int, List[int]]:
+        result: Dict[int, List[int]] = {rid: [] for rid in recipe_ids}
+        if not recipe_ids:
+            return result
+        ids = list(result)
+        cur = self._reader().cursor()
+        for i in range(0, len(ids), 500):
+            chunk = tuple(ids[i:i + 500])
+            cur.execute(
+                f"SELECT recipe_id, ingredient_id FROM recipe_ingredients WHERE recipe_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for rid, iid in cur.fetchall():
+                result[rid].append(iid)
+        return result
+
+    def ingredient_names(self, ingredient_ids: Optional[List[int]] = None) -> Dict[int, str]:
+        cur = self._reader().cursor()
+        if ingredient_ids is None:
+            cur.execute("SELECT id, name FROM ingredients")
+            return {r[0]: r[1] for r in cur.fetchall()}
+        result: Dict[int, str] = {}
+        for i in range(0, len(ingredient_ids), 500):
+            chunk = tuple(ingredient_ids[i:i + 500])
+            cur.execute(f"SELECT id, name FROM ingredients WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            result.update((r[0], r[1]) for r in cur.fetchall())
+        return result
+
+    def ingredient_ids(self, names: List[str]) -> Dict[str, int]:
+        # ищем по ключу (ingredient_key), поэтому 'яйцо' найдёт ингредиент 'яйца'
+        by_key: Dict[str, List[str]] = {}
+        for name in names:
+            by_key.setdefault(ingredient_key(name), []).append(name)
+        keys = list(by_key)
+        result: Dict[str, int] = {}
+        cur = self._reader().cursor()
+        for i in range(0, len(keys), 500):
+            chunk = tuple(keys[i:i + 500])
+            cur.execute(f"SELECT key, id FROM ingredients WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+            for key, iid in cur.fetchall():
+                result.update((name, iid) for name in by_key[key])
+        return result
+
+    # Облегчённые записи по списку id, в порядке ids (отсутствующие пропускаются)
+    def get_summaries(self, recipe_ids: List[int]) -> List[RecipeSummary]:
+        cur = self._reader().cursor()
+        cur.row_factory = summary_row_factory
+        by_id: Dict[int, RecipeSummary] = {}
+        for i in range(0, len(recipe_ids), 500):
+            chunk = tuple(recipe_ids[i:i + 500])
+            cur.execute(f"SELECT {SUMMARY_COLUMNS} FROM recipes WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            by_id.update((s.id, s) for s in cur.fetchall())
+        return [by_id[rid] for rid in recipe_ids if rid in by_id]
 
     # Удобный метод для заполнения тестовыми данными
     def seed(self, recipes: List[Recipe]) -> None:
-        cur = self.conn.cursor()
-        cur.executemany(
-            "INSERT INTO recipes(title, ingredients, steps, tags, created_at) VALUES (?, ?, ?, ?, ?)",
-            [r.to_tuple_for_insert() for r in recipes]
-        )
-        self.conn.commit()
+        self.insert_many(recipes)
 
     def close(self):
-        try:
-            self.conn.close()
-        except Exception:
-            pass
+        if self._group_commit is not None:
+            self._group_commit.close()
+            self._group_commit = None
+        with self._pool_lock:
+            # список очищается на месте: на него ссылаются finalize живых потоков
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._shared_conn = None
+        self._local = threading.local()
@@ -0,0 +1,256 @@
+# app/pantry.py
+"""
+Индекс ингредиентов в памяти и запрос «что можно приготовить».
+Для каждого ингредиента хранится список рецептов (posting list):
+редкие — как отсортированный array('I'), частые — как битовое множество (app.bitmaps),
+в зависимости от того, что компактнее. Рецепты сгруппированы по числу ингредиентов.
+
+Запрос recipes_makeable_with(pantry, max_missing=k) не просматривает тексты рецептов:
+число совпавших ингредиентов считается побитовым сумматором по множествам продуктов
+из запаса, число недостающих — вычитанием из общего числа ингредиентов рецепта.
+Индекс строится из таблицы recipe_ingredients при первом запросе и затем догоняет БД
+по журналу recipe_changes, изменяя только затронутые рецепты.
+"""
+
+import bisect
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import bitmaps
+from .models import RecipeDB, RecipeSummary, ingredient_key, normalize_ingredient
+
+# Больше недостающих ингредиентов не ищем: такой рецепт уже не «из того, что есть»
+MAX_MISSING_LIMIT = 5
+
+
+@dataclass
+class PantryMatch:
+    """Рецепт, который можно приготовить из запаса: сколько ингредиентов есть и каких не хватает."""
+    recipe: RecipeSummary
+    matched: int
+    missing: List[str] = field(default_factory=list)
+
+
+def parse_pantry(pantry: Union[str, Iterable[str]]) -> List[str]:
+    items = pantry.split(",") if isinstance(pantry, str) else list(pantry)
+    # dict сохраняет порядок и убирает повторы за O(1) на элемент (список приходит от пользователя);
+    # формы одного ингредиента (яйцо/яйца) совпадают по ingredient_key
+    result: Dict[str, str] = {}
+    for name in (normalize_ingredient(str(item)) for item in items):
+        if name:
+            result.setdefault(ingredient_key(name), name)
+    return list(result.values())
+
+
+class IngredientIndex:
+    def __init__(self, db: RecipeDB):
+        self.db = db
+        self._lock = threading.RLock()
+        self._seq: Optional[int] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings: Dict[int, Union[int, array]] = {}
+        self._by_count: Dict[int, int] = {}
+        self._names: Dict[int, str] = {}
+        self._width = 0
+        # ингредиенты рецепта rid: flat[offsets[rid] : offsets[rid] + lengths[rid]]
+        self._offsets = array("q")
+        self._lengths = array("H")
+        self._flat = array("I")
+        self._live = 0
+
+    # -----------------------
+    # Синхронизация с БД
+    # -----------------------
+    def refresh(self) -> None:
+        with self._lock:
+            if self._seq is None:
+                self._rebuild()
+                return
+            seq, changed = self.db.changes_since(self._seq)
+            if changed is None:
+                self._rebuild()
+                return
+            if changed:
+                self._patch(changed)
+            self._seq = seq
+
+    def _rebuild(self) -> None:
+        # seq читается до данных: изменения, попавшие между ними, применятся повторно — это безопасно
+        seq = self.db.change_seq()
+        self._reset()
+        lists: Dict[int, array] = {}
+        by_count: Dict[int, List[int]] = {}
+        current_rid, current = None, []
+
+        def flush():
+            if current_rid is not None:
+                self._set_segment(current_rid, current)
+                by_count.setdefault(len(current), []).append(current_rid)
+
+        for rid, iid in self.db.iter_recipe_ingredients():
+            if rid != current_rid:
+                flush()
+                current_rid, current = rid, []
+            current.append(iid)
+            posting = lists.get(iid)
+            if posting is None:
+                posting = lists[iid] = array("I")
+            posting.append(rid)
+        flush()
+
+        self._width = (current_rid or 0) + 1
+        for iid, posting in lists.items():
+            self._postings[iid] = self._compact(posting)
+        self._by_count = {n: bitmaps.bitmap_from_ids(rids) for n, rids in by_count.items()}
+        self._names = self.db.ingredient_names()
+        self._seq = seq
+
+    def _patch(self, recipe_ids: List[int]) -> None:
+        current = self.db.ingredients_of(recipe_ids)
+        unknown = set()
+        for rid in recipe_ids:
+            new = current.get(rid, [])
+            old = set(self._segment(rid))
+            for iid in old.difference(new):
+                self._posting_remove(iid, rid)
+            for iid in set(new).difference(old):
+                self._posting_add(iid, rid)
+                if iid not in self._names:
+                    unknown.add(iid)
+            if len(old) != len(new):
+                self._count_move(rid, len(old), len(new))
+            self._set_segment(rid, new)
+        if unknown:
+            self._names.update(self.db.ingredient_names(sorted(unknown)))
+
+    # -----------------------
+    # Хранилище
+    # -----------------------
+    def _segment(self, rid: int) -> array:
+        if rid >= len(self._lengths) or not self._lengths[rid]:
+            return array("I")
+        start = self._offsets[rid]
+        return self._flat[start:start + self._lengths[rid]]
+
+    def _set_segment(self, rid: int, iids: List[int]) -> None:
+        if rid >= len(self._lengths):
+            grow = max(rid + 1, 2 * len(self._lengths)) - len(self._lengths)
+            self._offsets.extend(array("q", bytes(8 * grow)))
+            self._lengths.extend(array("H", bytes(2 * grow)))
+        self._live += len(iids) - self._lengths[rid]
+        self._offsets[rid] = len(self._flat)
+        self._lengths[rid] = len(iids)
+        self._flat.extend(iids)
+        self._width = max(self._width, rid + 1)
+        # старые сегменты остаются в flat мусором; при избытке мусора — уплотнение
+        if len(self._flat) > 2 * self._live + 4096:
+            self._compact_segments()
+
+    def _compact_segments(self) -> None:
+        flat = array("I")
+        for rid, length in enumerate(self._lengths):
+            if length:
+                start = self._offsets[rid]
+                self._offsets[rid] = len(flat)
+                flat.extend(self._flat[start:start + length])
+        self._flat = flat
+
+    def _compact(self, posting: array) -> Union[int, array]:
+        # битовое множество занимает width/8 байт, массив — 4 байта на рецепт
+        if len(posting) * 32 > self._width:
+            return bitmaps.bitmap_from_ids(posting)
+        return posting
+
+    def _posting_add(self, iid: int, rid: int) -> None:
+        posting = self._postings.get(iid)
+        if isinstance(posting, int):
+            self._postings[iid] = posting | (1 << rid)
+            return
+        if posting is None:
+            posting = self._postings[iid] = array("I")
+        pos = bisect.bisect_left(posting, rid)
+        if pos == len(posting) or posting[pos] != rid:
+            posting.insert(pos, rid)
+        self._postings[iid] = self._compact(posting)
+
+    def _posting_remove(self, iid: int, rid: int) -> None:
+        posting = self._postings.get(iid)
+        if isinstance(posting, int):
+            self._postings[iid] = posting & ~(1 << rid)
+        elif posting is not None:
+            pos = bisect.bisect_left(posting, rid)
+            if pos < len(posting) and posting[pos] == rid:
+                del posting[pos]
+
+    def _count_move(self, rid: int, old: int, new: int) -> None:
+        bit = 1 << rid
+        if old:
+            self._by_count[old] = self._by_count.get(old, 0) & ~bit
+        if new:
+            self._by_count[new] = self._by_count.get(new, 0) | bit
+
+    def _bitmap(self, iid: int) -> int:
+        posting = self._postings.get(iid)
+        if posting is None:
+            return 0
+        if isinstance(posting, int):
+            return posting
+        return bitmaps.bitmap_from_ids(posting)
+
+    # -----------------------
+    # Запрос
+    # -----------------------
+    def makeable_with(self, pantry: List[str], max_missing: int = 0,
+                      limit: int = 20) -> List[Tuple[int, int, List[str]]]:
+        """
+        Рецепты, для которых не хватает не более max_missing ингредиентов из pantry
+        (нормализованные названия). Возвращает [(recipe_id, совпало, [недостающие])],
+        сначала с наименьшим числом недостающих, затем с наибольшим числом ингредиентов.
+        """
+        max_missing = max(0, min(int(max_missing), MAX_MISSING_LIMIT))
+        with self._lock:
+            self.refresh()
+            pantry_ids = set(self.db.ingredient_ids(pantry).values())
+            sets = [b for b in (self._bitmap(iid) for iid in pantry_ids) if b]
+            if not sets:
+                return []
+            candidates = 0
+            matched: List[int] = []
+            for b in sets:
+                candidates |= b
+                bitmaps.add_to_counter(matched, b)
+            total: List[int] = []
+            for n, members in self._by_count.items():
+                for j in range(n.bit_length()):
+                    if n >> j & 1:
+                        while len(total) <= j:
+                            total.append(0)
+                        total[j] |= members
+            missing = bitmaps.subtract_counters(total, matched)
+
+            found: List[Tuple[int, int]] = []
+            sizes = sorted(self._by_count, reverse=True)
+            for d in range(max_missing + 1):
+                exact = bitmaps.counter_equals(missing, d, candidates)
+                for n in sizes:
+                    if not exact or len(found) >= limit:
+                        break
+                    members = exact & self._by_count[n]
+                    exact &= ~members
+                    for rid in bitmaps.iter_ids_desc(members):
+                        found.append((rid, d))
+                        if len(found) >= limit:
+                            break
+                if len(found) >= limit:
+                    break
+
+            result = []
+            for rid, d in found:
+                iids = self._segment(rid)
+                lacking = [self._names.get(i, "?") for i in iids if i not in pantry_ids]
+                result.append((rid, len(iids) - d, lacking))
+            return result
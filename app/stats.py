@@ -0,0 +1,126 @@
+# app/stats.py
+"""
+Статистика активности по периодам: границы корзин (день / неделя / месяц),
+выравнивание диапазона и заполнение пустых корзин нулями.
+Агрегация выполняется в SQL (RecipeDB.activity_range), здесь — только сетка корзин.
+Заполнение векторное на NumPy; без NumPy используется тот же алгоритм на чистом Python.
+"""
+
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # веб-версия может работать без NumPy
+    np = None
+
+from .models import RecipeError
+
+BUCKETS = ("day", "week", "month")
+# сколько корзин показывать, если начало периода не задано
+DEFAULT_WINDOW = {"day": 30, "week": 12, "month": 12}
+# защита от запросов «по дням за сто лет»
+MAX_BUCKETS = 3660
+
+
+def parse_day(value, name: str = "дата") -> Optional[datetime.date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise RecipeError(f"Некорректная {name}: {value!r}, ожидается ГГГГ-ММ-ДД")
+
+
+def check_bucket(bucket: str) -> str:
+    if bucket not in BUCKETS:
+        raise RecipeError(f"Неизвестный период {bucket!r}, ожидается один из: {', '.join(BUCKETS)}")
+    return bucket
+
+
+def bucket_start(day: datetime.date, bucket: str) -> datetime.date:
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday())  # неделя с понедельника
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _shift(day: datetime.date, bucket: str, n: int) -> datetime.date:
+    """Начало корзины на n корзин позже (n может быть отрицательным); day — начало корзины."""
+    if bucket == "week":
+        return day + datetime.timedelta(weeks=n)
+    if bucket == "month":
+        months = day.year * 12 + day.month - 1 + n
+        return datetime.date(months // 12, months % 12 + 1, 1)
+    return day + datetime.timedelta(days=n)
+
+
+def resolve_range(start, end, bucket: str, default_end: datetime.date) -> Tuple[datetime.date, datetime.date]:
+    """
+    Выравнивает период по границам корзин: [начало корзины start, последний день корзины end].
+    Без start берётся DEFAULT_WINDOW[bucket] корзин до end; без end — default_end.
+    """
+    check_bucket(bucket)
+    end_day = parse_day(end, "конечная дата") or default_end
+    last = bucket_start(end_day, bucket)
+    start_day = parse_day(start, "начальная дата")
+    first = bucket_start(start_day, bucket) if start_day else _shift(last, bucket, -(DEFAULT_WINDOW[bucket] - 1))
+    if first > last:
+        raise RecipeError("Начало периода позже конца")
+    return first, _shift(last, bucket, 1) - datetime.timedelta(days=1)
+
+
+def fill_buckets(rows: Iterable[Tuple[str, int]], first: datetime.date, last: datetime.date,
+                 bucket: str) -> Dict[str, int]:
+    """
+    rows — (начало корзины 'ГГГГ-ММ-ДД', число) из SQL; результат — все корзины периода
+    по порядку, пустые с нулём. first / last — границы из resolve_range.
+    """
+    rows = list(rows)
+    if np is not None:
+        return _fill_numpy(rows, first, last, bucket)
+    result: Dict[str, int] = {}
+    day = first
+    while day <= last:
+        result[day.isoformat()] = 0
+        if len(result) > MAX_BUCKETS:
+            raise RecipeError(f"Слишком длинный период: больше {MAX_BUCKETS} корзин")
+        day = _shift(day, bucket, 1)
+    for key, count in rows:
+        if key in result:
+            result[key] += int(count)
+    return result
+
+
+def _is_day(key) -> bool:
+    try:
+        datetime.date.fromisoformat(key)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _fill_numpy(rows: List[Tuple[str, int]], first: datetime.date, last: datetime.date,
+                bucket: str) -> Dict[str, int]:
+    lo, hi = np.datetime64(first, "D"), np.datetime64(last, "D")
+    if bucket == "month":
+        edges = np.arange(lo.astype("datetime64[M]"), hi.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    else:
+        edges = np.arange(lo, hi + 1, 7 if bucket == "week" else 1, dtype="datetime64[D]")
+    if len(edges) > MAX_BUCKETS:
+        raise RecipeError(f"Слишком длинный период: больше {MAX_BUCKETS} корзин")
+    counts = np.zeros(len(edges), dtype=np.int64)
+    # ключи, которые не являются датой, пропускаются — как в варианте без NumPy
+    rows = [(k, c) for k, c in rows if _is_day(k)]
+    if rows:
+        keys = np.array([k for k, _ in rows], dtype="datetime64[D]")
+        values = np.array([c for _, c in rows], dtype=np.int64)
+        idx = np.searchsorted(edges, keys, side="right") - 1
+        inside = (idx >= 0) & (keys <= hi)
+        np.add.at(counts, idx[inside], values[inside])
+    return dict(zip(np.datetime_as_string(edges, unit="D").tolist(), counts.tolist()))
@@ -0,0 +1,168 @@
+# app/table_model.py
+"""
+Модель таблицы рецептов для QTableView.
+Строки (RecipeSummary) подгружаются страницами через canFetchMore/fetchMore
+по мере прокрутки — в памяти только просмотренная часть каталога, виджетов на ячейки нет.
+После добавления, изменения или удаления рецепта обновляется одна строка, а не вся таблица.
+Порядок строк тот же, что у RecipeDB.list_page: created_at DESC, id DESC.
+С runner (app.tasks.TaskRunner) страницы читаются в фоновом потоке.
+"""
+
+import bisect
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+
+from .models import RecipeSummary
+
+# Сколько строк таблицы подгружается за один раз
+TABLE_PAGE_SIZE = 200
+
+COLUMNS = (("ID", "id"), ("Название", "title"), ("Теги", "tags"), ("Создан", "created_at"))
+
+
+def _sort_key(summary: RecipeSummary):
+    # ключ для bisect по возрастанию при хранении строк по убыванию (created_at, id)
+    return summary.created_at, summary.id
+
+
+class RecipeTableModel(QAbstractTableModel):
+    IdRole = Qt.ItemDataRole.UserRole + 1
+    # ошибка фоновой загрузки страницы (текст для пользователя)
+    load_failed = Signal(str)
+
+    PAGE_TASK = "table-page"
+
+    def __init__(self, controller, page_size: int = TABLE_PAGE_SIZE, parent=None, runner=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.page_size = page_size
+        self.runner = runner
+        self._loading = False
+        self._rows: List[RecipeSummary] = []
+        self._row_of: Dict[int, int] = {}
+        self._next_cursor: Optional[str] = None
+        self._exhausted = False
+
+    # -----------------------
+    # Интерфейс QAbstractTableModel
+    # -----------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        summary = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = getattr(summary, COLUMNS[index.column()][1])
+            return str(value) if value is not None else ""
+        if role == self.IdRole:
+            return summary.id
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][0]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        if self.runner is None:
+            self.append_page(self.controller.list_summaries(cursor=self._next_cursor, page_size=self.page_size))
+            return
+        self._loading = True
+        self.runner.submit(self.PAGE_TASK, self.controller.list_summaries,
+                           cursor=self._next_cursor, page_size=self.page_size,
+                           on_done=self._page_loaded, on_error=self._page_failed)
+
+    def _page_loaded(self, page) -> None:
+        self._loading = False
+        self.append_page(page)
+
+    def _page_failed(self, error: Exception) -> None:
+        self._loading = False
+        self.load_failed.emit(str(error))
+
+    # -----------------------
+    # Загрузка и точечные обновления
+    # -----------------------
+    def append_page(self, page) -> None:
+        """Добавляет в конец страницу RecipePage (загруженную здесь же или в фоновом потоке)."""
+        items = [s for s in page.items if s.id not in self._row_of]
+        if items:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+            for offset, summary in enumerate(items):
+                self._row_of[summary.id] = start + offset
+            self._rows.extend(items)
+            self.endInsertRows()
+        self._next_cursor = page.next_cursor
+        self._exhausted = page.next_cursor is None
+
+    def reload(self) -> None:
+        """Сбрасывает загруженные строки; первая страница подгрузится при отображении."""
+        if self.runner is not None:
+            self.runner.cancel(self.PAGE_TASK)
+        self._loading = False
+        self.beginResetModel()
+        self._rows, self._row_of = [], {}
+        self._next_cursor, self._exhausted = None, False
+        self.endResetModel()
+
+    def recipe_id(self, row: int) -> Optional[int]:
+        return self._rows[row].id if 0 <= row < len(self._rows) else None
+
+    def row_of(self, recipe_id: int) -> Optional[int]:
+        return self._row_of.get(recipe_id)
+
+    def recipe_added(self, recipe_id: int, summary: Optional[RecipeSummary] = None) -> None:
+        # summary можно передать готовым (прочитанным в фоне вместе с записью)
+        if summary is None:
+            summaries = self.controller.get_summaries([recipe_id])
+            summary = summaries[0] if summaries else None
+        if summary is None or recipe_id in self._row_of:
+            return
+        # строки хранятся по убыванию ключа, поэтому ищем позицию в развёрнутом порядке
+        keys = [_sort_key(s) for s in reversed(self._rows)]
+        row = len(self._rows) - bisect.bisect_left(keys, _sort_key(summary))
+        if row == len(self._rows) and not self._exhausted:
+            return  # строка за пределами загруженного — придёт со следующей страницей
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, summary)
+        self._reindex(row)
+        self.endInsertRows()
+
+    def recipe_updated(self, recipe_id: int, summary: Optional[RecipeSummary] = None) -> None:
+        row = self._row_of.get(recipe_id)
+        if row is None:
+            return
+        if summary is None:
+            summaries = self.controller.get_summaries([recipe_id])
+            summary = summaries[0] if summaries else None
+        if summary is None:
+            self.recipe_deleted(recipe_id)
+            return
+        self._rows[row] = summary
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def recipe_deleted(self, recipe_id: int) -> None:
+        row = self._row_of.get(recipe_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._row_of[recipe_id]
+        self._reindex(row)
+        self.endRemoveRows()
+
+    def _reindex(self, start: int) -> None:
+        for row in range(start, len(self._rows)):
+            self._row_of[self._rows[row].id] = row
@@ -0,0 +1,280 @@
+# app/tagquery.py
+"""
+Логические запросы по тегам: «десерт AND веган AND NOT орехи», «(завтрак OR бранч), быстро».
+
+Синтаксис:
+- операторы AND / OR / NOT (регистр не важен), И / ИЛИ / НЕ (заглавными), а также & | !;
+- запятая означает AND; скобки группируют; приоритет NOT > AND > OR;
+- тег — слова между операторами («без глютена») или текст в кавычках ("rock & roll").
+
+Запрос вычисляется по битовым множествам id рецептов в памяти (app.bitmaps):
+по одному длинному целому на тег плюс множество всех рецептов для NOT.
+Индекс строится из recipe_tags при первом запросе и затем догоняет БД по журналу
+recipe_changes, пересобирая биты только изменённых рецептов. SQL при вычислении не нужен.
+"""
+
+import itertools
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import bitmaps
+from .models import RecipeDB, RecipeError, RecipeSummary
+
+# Узел разобранного запроса: ("tag", имя) | ("not", узел) | ("and", (узлы)) | ("or", (узлы))
+Node = Tuple
+
+# английские операторы — в любом регистре, русские — только заглавными, чтобы не путать с частью тега
+WORD_OPERATORS = {"and": "and", "or": "or", "not": "not"}
+RUSSIAN_OPERATORS = {"И": "and", "ИЛИ": "or", "НЕ": "not"}
+SYMBOL_OPERATORS = {"&": "and", ",": "and", "|": "or", "!": "not"}
+_TOKEN_RE = re.compile(r'\s*(?:([(),&|!])|"([^"]*)"|([^\s(),&|!"]+))')
+
+
+def _word_operator(word: str) -> Optional[str]:
+    return RUSSIAN_OPERATORS.get(word) or WORD_OPERATORS.get(word.lower())
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    words: List[str] = []
+
+    def flush():
+        if words:
+            tokens.append(("tag", " ".join(words).lower()))
+            words.clear()
+
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise RecipeError(f"Непарная кавычка в запросе: {text!r}")
+        pos = m.end()
+        symbol, quoted, word = m.groups()
+        if quoted is not None:
+            flush()
+            tokens.append(("tag", quoted.strip().lower()))
+        elif word is not None and _word_operator(word) is None:
+            words.append(word)
+        else:
+            flush()
+            if symbol in ("(", ")"):
+                tokens.append(("paren", symbol))
+            else:
+                tokens.append(("op", SYMBOL_OPERATORS[symbol] if symbol else _word_operator(word)))
+    flush()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise RecipeError(f"Запрос обрывается: {self.text!r}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise RecipeError("Пустой запрос по тегам")
+        node = self.expr()
+        if self.peek() is not None:
+            raise RecipeError(f"Лишнее {self.peek()[1]!r} в запросе {self.text!r}")
+        return node
+
+    def expr(self) -> Node:
+        parts = [self.conjunction()]
+        while self.peek() == ("op", "or"):
+            self.take()
+            parts.append(self.conjunction())
+        return _combine("or", parts)
+
+    def conjunction(self) -> Node:
+        parts = [self.unary()]
+        while True:
+            token = self.peek()
+            if token == ("op", "and"):
+                self.take()
+            elif token is None or token in (("op", "or"), ("paren", ")")):
+                break
+            # «(a) (b)» или «a (b)» — неявный AND
+            parts.append(self.unary())
+        return _combine("and", parts)
+
+    def unary(self) -> Node:
+        kind, value = self.take()
+        if (kind, value) == ("op", "not"):
+            return ("not", self.unary())
+        if (kind, value) == ("paren", "("):
+            node = self.expr()
+            if self.take() != ("paren", ")"):
+                raise RecipeError(f"Не закрыта скобка в запросе {self.text!r}")
+            return node
+        if kind == "tag" and value:
+            return ("tag", value)
+        raise RecipeError(f"Ожидался тег, а не {value!r} в запросе {self.text!r}")
+
+
+def _combine(kind: str, parts: List[Node]) -> Node:
+    if len(parts) == 1:
+        return parts[0]
+    flat: List[Node] = []
+    for part in parts:
+        flat.extend(part[1] if part[0] == kind else (part,))
+    return (kind, tuple(flat))
+
+
+def parse_tag_query(text: str) -> Node:
+    return _Parser(text or "").parse()
+
+
+def format_query(node: Node) -> str:
+    """Каноническая запись запроса (для ключей кэша и ответов API)."""
+    kind = node[0]
+    if kind == "tag":
+        name = node[1]
+        if re.search(r'[(),&|!"]', name) or any(_word_operator(w) for w in name.split()):
+            return f'"{name}"'
+        return name
+    if kind == "not":
+        inner = format_query(node[1])
+        return f"NOT {inner}" if node[1][0] in ("tag", "not") else f"NOT ({inner})"
+    # внутри AND скобки нужны только у OR (у него приоритет ниже)
+    parts = [f"({format_query(child)})" if kind == "and" and child[0] == "or" else format_query(child)
+             for child in node[1]]
+    return f" {kind.upper()} ".join(parts)
+
+
+def evaluate(node: Node, tag_bitmaps: Dict[str, int], universe: int) -> int:
+    kind = node[0]
+    if kind == "tag":
+        return tag_bitmaps.get(node[1], 0)
+    if kind == "not":
+        return universe & ~evaluate(node[1], tag_bitmaps, universe)
+    if kind == "or":
+        result = 0
+        for child in node[1]:
+            result |= evaluate(child, tag_bitmaps, universe)
+        return result
+    # AND: отрицания вычитаются из результата (& ~x) без построения дополнения до universe
+    positive = [evaluate(c, tag_bitmaps, universe) for c in node[1] if c[0] != "not"]
+    negative = [c[1] for c in node[1] if c[0] == "not"]
+    if positive:
+        positive.sort(key=int.bit_length)
+        result = positive[0]
+        for bm in positive[1:]:
+            if not result:
+                return 0
+            result &= bm
+    else:
+        result = universe
+    for child in negative:
+        if not result:
+            break
+        result &= ~evaluate(child, tag_bitmaps, universe)
+    return result
+
+
+@dataclass
+class TagQueryResult:
+    """Результат запроса: каноническая запись, число рецептов и первые из них (новые сначала)."""
+    query: str
+    count: int
+    items: List[RecipeSummary] = field(default_factory=list)
+
+
+class TagIndex:
+    def __init__(self, db: RecipeDB):
+        self.db = db
+        self._lock = threading.RLock()
+        self._seq: Optional[int] = None
+        self._bitmaps: Dict[str, int] = {}
+        self._universe = 0
+
+    def refresh(self) -> None:
+        with self._lock:
+            if self._seq is None:
+                self._rebuild()
+                return
+            seq, changed = self.db.changes_since(self._seq)
+            if changed is None:
+                self._rebuild()
+                return
+            if changed:
+                self._patch(changed)
+            self._seq = seq
+
+    def _rebuild(self) -> None:
+        # seq читается до данных: изменения, попавшие между ними, применятся повторно — это безопасно
+        seq = self.db.change_seq()
+        result: Dict[str, int] = {}
+        for tag, pairs in itertools.groupby(self.db.iter_recipe_tags(), key=lambda pair: pair[0]):
+            result[tag] = bitmaps.bitmap_from_ids(rid for _, rid in pairs)
+        self._bitmaps = result
+        self._universe = bitmaps.bitmap_from_ids(self.db.recipe_ids())
+        self._seq = seq
+
+    def _patch(self, changed: List[int]) -> None:
+        # биты изменённых рецептов снимаются со всех тегов и ставятся заново по текущим данным
+        mask = bitmaps.bitmap_from_ids(changed)
+        for tag in [t for t, bm in self._bitmaps.items() if bm & mask]:
+            bm = self._bitmaps[tag] & ~mask
+            if bm:
+                self._bitmaps[tag] = bm
+            else:
+                del self._bitmaps[tag]
+        self._universe = (self._universe & ~mask) | bitmaps.bitmap_from_ids(self.db.filter_ids(changed))
+        by_tag: Dict[str, List[int]] = {}
+        for rid, tag in self.db.tags_of(changed):
+            by_tag.setdefault(tag, []).append(rid)
+        for tag, rids in by_tag.items():
+            self._bitmaps[tag] = self._bitmaps.get(tag, 0) | bitmaps.bitmap_from_ids(rids)
+
+    # -----------------------
+    # Запросы
+    # -----------------------
+    def query(self, expr: Union[str, Node]) -> int:
+        """Битовое множество рецептов, удовлетворяющих запросу."""
+        node = parse_tag_query(expr) if isinstance(expr, str) else expr
+        self.refresh()
+        with self._lock:
+            return evaluate(node, self._bitmaps, self._universe)
+
+    def count(self, expr: Union[str, Node]) -> int:
+        return bitmaps.count(self.query(expr))
+
+    def ids(self, expr: Union[str, Node], limit: Optional[int] = None) -> List[int]:
+        """id подходящих рецептов по убыванию (сначала новые), не больше limit."""
+        return bitmaps.top_ids(self.query(expr), limit)
+
+    def search(self, expr: Union[str, Node], limit: Optional[int] = None) -> Tuple[int, List[int]]:
+        """(число подходящих рецептов, первые limit id по убыванию) за одно вычисление запроса."""
+        bm = self.query(expr)
+        return bitmaps.count(bm), bitmaps.top_ids(bm, limit)
+
+    def contains(self, expr: Union[str, Node], recipe_id: int) -> bool:
+        return bool(self.query(expr) >> recipe_id & 1)
+
+    def random_id(self, expr: Union[str, Node], rng: Optional[random.Random] = None) -> Optional[int]:
+        """Равновероятный id из подходящих рецептов или None."""
+        bm = self.query(expr)
+        total = bitmaps.count(bm)
+        if not total:
+            return None
+        return bitmaps.nth_id(bm, (rng or random).randrange(total))
+
+    def tag_counts(self) -> Dict[str, int]:
+        self.refresh()
+        with self._lock:
+            return {tag: bitmaps.count(bm) for tag, bm in sorted(self._bitmaps.items())}
@@ -0,0 +1,130 @@
+# app/tasks.py
+"""
+Фоновые задачи GUI на QThreadPool.
+Запросы к БД и подготовка данных графика выполняются в пуле потоков, а результат
+приходит в GUI-поток через сигнал (очередь событий Qt) и передаётся колбэку.
+
+- задачи с одинаковым ключом вытесняют друг друга: ещё не начатая старая задача
+  снимается с очереди пула, результат уже запущенной игнорируется;
+- schedule() склеивает серию запросов (например, обновлений после пачки правок)
+  в один запуск через delay_ms после последнего запроса.
+"""
+
+import itertools
+from typing import Any, Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+# потоков хватает на параллельную загрузку таблицы, графика и одиночных запросов
+DEFAULT_MAX_THREADS = 4
+DEFAULT_COALESCE_MS = 50
+
+
+class _TaskSignals(QObject):
+    # создаётся в GUI-потоке, поэтому сигналы из рабочего потока доставляются в GUI-поток
+    finished = Signal(object)
+    failed = Signal(object)
+
+
+class Task(QRunnable):
+    def __init__(self, fn: Callable[..., Any], args, kwargs, key=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.cancelled = False
+        self.signals = _TaskSignals()
+
+    def cancel(self) -> None:
+        # флаг читается в рабочем потоке перед запуском и в GUI-потоке при доставке результата
+        self.cancelled = True
+
+    def run(self):
+        # отменённая задача всё равно сигналит, чтобы раннер забыл о ней; колбэк не вызывается
+        if self.cancelled:
+            self.signals.finished.emit(None)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    def __init__(self, parent=None, max_threads: int = DEFAULT_MAX_THREADS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # потоки не завершаются по простою: у каждого свои соединения SQLite (см. RecipeDB)
+        self.pool.setExpiryTimeout(-1)
+        self._active: Dict[Any, Task] = {}
+        self._running = set()
+        self._timers: Dict[Any, QTimer] = {}
+        self._pending: Dict[Any, tuple] = {}
+        self._ids = itertools.count()
+
+    def submit(self, key, fn: Callable[..., Any], *args,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None, **kwargs) -> Task:
+        """
+        Запускает fn(*args, **kwargs) в пуле. key=None — задача без вытеснения.
+        Колбэки вызываются в GUI-потоке; результат отменённой задачи не доставляется.
+        """
+        if key is not None:
+            self.cancel(key)
+        task = Task(fn, args, kwargs, key=key if key is not None else ("anon", next(self._ids)))
+        self._active[task.key] = task
+        self._running.add(task)
+
+        def deliver(result, callback):
+            self._running.discard(task)
+            if self._active.get(task.key) is task:
+                del self._active[task.key]
+            if not task.cancelled and callback is not None:
+                callback(result)
+
+        task.signals.finished.connect(lambda result: deliver(result, on_done))
+        task.signals.failed.connect(lambda error: deliver(error, on_error))
+        self.pool.start(task)
+        return task
+
+    def schedule(self, key, fn: Callable[..., Any], *args, delay_ms: int = DEFAULT_COALESCE_MS, **kwargs) -> None:
+        """Как submit, но запуск откладывается: повторные вызовы в пределах delay_ms склеиваются."""
+        self._pending[key] = (fn, args, kwargs)
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = self._timers[key] = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda: self._fire(key))
+        timer.start(delay_ms)
+
+    def _fire(self, key) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            fn, args, kwargs = pending
+            self.submit(key, fn, *args, **kwargs)
+
+    def cancel(self, key) -> None:
+        """Отменяет задачу с ключом key: снимает с очереди или игнорирует её результат."""
+        timer = self._timers.get(key)
+        if timer is not None:
+            timer.stop()
+            self._pending.pop(key, None)
+        task = self._active.pop(key, None)
+        if task is not None:
+            task.cancel()
+            if self.pool.tryTake(task):
+                self._running.discard(task)
+
+    def is_busy(self, key) -> bool:
+        return key in self._active or key in self._pending
+
+    def shutdown(self, wait_ms: int = 3000) -> None:
+        for key in list(self._active):
+            self.cancel(key)
+        self.pool.clear()
+        self.pool.waitForDone(wait_ms)
@@ -0,0 +1,5 @@
+# bench/__init__.py
+"""
+Воспроизводимые замеры производительности на синтетических каталогах рецептов.
+Запуск: python -m bench --sizes 10k,100k [--baseline bench_baseline.json]
+"""
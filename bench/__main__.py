@@ -0,0 +1,77 @@
+# bench/__main__.py
+"""
+python -m bench --sizes 10k,100k,1M --repeat 5 -o bench_results.json
+python -m bench --sizes 10k --baseline bench_baseline.json   # код возврата 1 при регрессии
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from .corpus import DEFAULT_SEED, build_corpus, corpus_path, parse_size
+from .runner import GROUPS, compare, environment, run_size
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Замеры производительности на синтетических каталогах")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="размеры каталогов через запятую (10k, 100k, 1M)")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов каждой операции")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed генератора каталога")
+    parser.add_argument("--groups", default=",".join(GROUPS), help="группы замеров: db,controller,web")
+    parser.add_argument("--cache-dir", default=".bench_cache", help="где хранить сгенерированные каталоги")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="файл с результатами (JSON)")
+    parser.add_argument("--baseline", help="сравнить с сохранёнными результатами")
+    parser.add_argument("--threshold", type=float, default=1.25, help="допустимый рост медианы (во сколько раз)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    groups = [g.strip() for g in args.groups.split(",") if g.strip()]
+    log = lambda line: print(line, file=sys.stderr)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "environment": environment(),
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="recipes-bench-") as work_dir:
+        for count in sizes:
+            path = corpus_path(args.cache_dir, count, args.seed)
+            if not os.path.exists(path):
+                log(f"Генерация каталога на {count} рецептов: {path}")
+                build_corpus(path, count, args.seed,
+                             progress=lambda done, total: log(f"  {done}/{total}"))
+            report["results"][str(count)] = run_size(path, count, work_dir, repeat=args.repeat,
+                                                     groups=groups, seed=args.seed, log=log)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"Результаты записаны в {args.output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(baseline, report, threshold=args.threshold)
+    regressions = [r for r in rows if r["regression"]]
+    for r in rows:
+        mark = "РЕГРЕССИЯ" if r["regression"] else ""
+        print(f"{r['size']:>9} {r['group']:<10} {r['name']:<28} {r['baseline_ms']:10.3f} -> "
+              f"{r['current_ms']:10.3f} ms  x{r['ratio']:<6} {mark}")
+    print(f"Сравнено операций: {len(rows)}, регрессий: {len(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# bench/corpus.py
+"""
+Детерминированный генератор синтетических каталогов рецептов.
+Один и тот же seed и размер всегда дают одинаковые рецепты (random.Random с фиксированным seed),
+поэтому замеры на разных машинах и в разные дни сравнимы.
+
+Распределения приближены к живому каталогу:
+- теги и ингредиенты выбираются с весами по закону Ципфа (несколько популярных, длинный хвост);
+- даты покрывают три года, поток рецептов со временем растёт;
+- длина шагов от пары предложений до нескольких абзацев.
+"""
+
+import datetime
+import os
+import random
+from typing import Iterator, List
+
+from app.models import Recipe, RecipeDB
+
+DEFAULT_SEED = 20240601
+BATCH_SIZE = 5000
+CORPUS_START = datetime.datetime(2022, 1, 1)
+CORPUS_DAYS = 3 * 365
+
+TAGS = [
+    "завтрак", "обед", "ужин", "десерт", "выпечка", "суп", "салат", "закуска", "напитки",
+    "быстро", "вегетарианское", "веган", "постное", "детское", "праздничное", "гриль",
+    "мясо", "курица", "рыба", "морепродукты", "паста", "крупы", "овощи", "фрукты", "сыр",
+    "без глютена", "без сахара", "пп", "острое", "итальянская кухня", "русская кухня",
+    "азиатская кухня", "грузинская кухня", "французская кухня", "бюджетно", "на компанию",
+    "в мультиварке", "в духовке", "без выпечки", "заготовки",
+]
+
+INGREDIENTS = [
+    "соль", "сахар", "мука", "яйца", "молоко", "масло сливочное", "масло растительное",
+    "лук", "чеснок", "морковь", "картофель", "помидоры", "огурцы", "перец болгарский",
+    "перец чёрный", "сметана", "сыр", "творог", "кефир", "рис", "гречка", "овсяные хлопья",
+    "макароны", "курица", "говядина", "свинина", "фарш", "лосось", "треска", "креветки",
+    "капуста", "кабачок", "баклажан", "грибы", "зелень", "укроп", "петрушка", "базилик",
+    "лимон", "яблоки", "бананы", "ягоды", "мёд", "корица", "ваниль", "разрыхлитель",
+    "сода", "дрожжи", "какао", "шоколад", "орехи", "изюм", "сливки", "майонез", "горчица",
+    "томатная паста", "соевый соус", "имбирь", "паприка", "куркума", "лавровый лист",
+    "фасоль", "нут", "чечевица", "кукуруза", "горошек", "тыква", "свёкла", "шпинат",
+    "авокадо", "тофу", "кокосовое молоко", "желатин", "крахмал", "уксус", "вино белое",
+]
+
+TITLE_DISHES = [
+    "суп", "салат", "пирог", "запеканка", "омлет", "рагу", "паста", "каша", "блины", "оладьи",
+    "котлеты", "плов", "ризотто", "кекс", "торт", "печенье", "смузи", "соус", "гратен", "тефтели",
+]
+TITLE_STYLES = [
+    "домашний", "быстрый", "классический", "летний", "осенний", "пряный", "нежный", "сытный",
+    "по-бабушкиному", "праздничный", "лёгкий", "острый",
+]
+
+SENTENCES = [
+    "Нарежьте {a} мелкими кубиками.",
+    "Разогрейте сковороду и обжарьте {a} до золотистого цвета.",
+    "Смешайте {a} и {b} в глубокой миске.",
+    "Добавьте {a}, посолите и перемешайте.",
+    "Доведите до кипения и варите на слабом огне 15 минут.",
+    "Выпекайте в разогретой до 180 градусов духовке 30–35 минут.",
+    "Взбейте {a} с {b} до однородности.",
+    "Дайте настояться под крышкой 10 минут.",
+    "Подавайте горячим, посыпав зеленью.",
+    "Охладите в холодильнике не менее часа.",
+]
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class CorpusGenerator:
+    """Генератор рецептов; все случайные решения берутся из одного random.Random(seed)."""
+
+    def __init__(self, seed: int = DEFAULT_SEED):
+        self.rng = random.Random(seed)
+        self._tag_weights = _zipf_weights(len(TAGS))
+        self._ingredient_weights = _zipf_weights(len(INGREDIENTS), 0.9)
+
+    def _pick(self, population: List[str], weights: List[float], k: int) -> List[str]:
+        chosen: List[str] = []
+        while len(chosen) < k:
+            item = self.rng.choices(population, weights)[0]
+            if item not in chosen:
+                chosen.append(item)
+        return chosen
+
+    def _created_at(self) -> str:
+        # квадратный корень даёт растущий со временем поток рецептов
+        day = int(CORPUS_DAYS * self.rng.random() ** 0.5)
+        moment = CORPUS_START + datetime.timedelta(days=day, seconds=self.rng.randrange(86400))
+        return moment.isoformat(timespec="seconds")
+
+    def _steps(self, ingredients: List[str]) -> str:
+        count = max(2, min(40, int(self.rng.lognormvariate(2.0, 0.6))))
+        lines = []
+        for n in range(1, count + 1):
+            template = self.rng.choice(SENTENCES)
+            lines.append(f"{n}. " + template.format(a=self.rng.choice(ingredients), b=self.rng.choice(ingredients)))
+        return "\n".join(lines)
+
+    def recipe(self) -> Recipe:
+        rng = self.rng
+        ingredients = self._pick(INGREDIENTS, self._ingredient_weights, rng.randint(3, 12))
+        tags = self._pick(TAGS, self._tag_weights, rng.choices([1, 2, 3, 4], [3, 4, 2, 1])[0])
+        title = f"{rng.choice(TITLE_STYLES).capitalize()} {rng.choice(TITLE_DISHES)}: {ingredients[0]} и {ingredients[1]}"
+        return Recipe(
+            id=None,
+            title=title,
+            ingredients=", ".join(ingredients),
+            steps=self._steps(ingredients),
+            tags=", ".join(tags),
+            created_at=self._created_at(),
+        )
+
+    def recipes(self, count: int) -> Iterator[Recipe]:
+        for _ in range(count):
+            yield self.recipe()
+
+
+def generate_recipes(count: int, seed: int = DEFAULT_SEED) -> Iterator[Recipe]:
+    return CorpusGenerator(seed).recipes(count)
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500"""
+    text = text.strip().lower()
+    factor = 1
+    if text.endswith("k"):
+        factor, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        factor, text = 1000000, text[:-1]
+    try:
+        value = int(float(text) * factor)
+    except ValueError:
+        raise ValueError(f"Некорректный размер каталога: {text!r}")
+    if value <= 0:
+        raise ValueError("Размер каталога должен быть положительным")
+    return value
+
+
+def corpus_path(cache_dir: str, count: int, seed: int = DEFAULT_SEED) -> str:
+    return os.path.join(cache_dir, f"corpus_{count}_{seed}.db")
+
+
+def build_corpus(path: str, count: int, seed: int = DEFAULT_SEED, progress=None) -> str:
+    """
+    Создаёт БД с count рецептами (если файла ещё нет) и возвращает путь.
+    Файл собирается под временным именем и переименовывается в конце,
+    так что прерванная генерация не оставит неполный каталог в кэше.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".part"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    # корпус одноразовый: fsync на каждую пачку при генерации не нужен
+    db = RecipeDB(tmp_path, synchronous="NORMAL")
+    try:
+        batch: List[Recipe] = []
+        done = 0
+        for recipe in generate_recipes(count, seed):
+            batch.append(recipe)
+            if len(batch) >= BATCH_SIZE:
+                db.insert_many(batch)
+                done += len(batch)
+                batch.clear()
+                if progress:
+                    progress(done, count)
+        if batch:
+            db.insert_many(batch)
+        db.conn.execute("ANALYZE")
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,360 @@
+# bench/runner.py
+"""
+Прогон замеров: операции RecipeDB, RecipeController и эндпоинты web/main.py.
+Каждая операция выполняется repeat раз после прогрева; в результат пишутся
+min / медиана / p95 / среднее в миллисекундах. Пишущие операции работают
+с копией каталога, так что кэшированный каталог не меняется между прогонами.
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.controllers import RecipeController
+from app.models import Recipe, RecipeDB
+from app.tagquery import TagIndex
+
+from .corpus import DEFAULT_SEED, INGREDIENTS, TAGS, CorpusGenerator
+
+GROUPS = ("db", "controller", "web")
+# тяжёлые операции (читают весь каталог) на больших каталогах повторяем не больше этого числа раз
+HEAVY_REPEAT = 3
+
+
+@dataclass
+class Timing:
+    runs: int
+    min_ms: float
+    median_ms: float
+    p95_ms: float
+    mean_ms: float
+
+
+@dataclass
+class Benchmark:
+    name: str
+    fn: Callable[[], Any]
+    heavy: bool = False
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Timing:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return Timing(
+        runs=len(samples),
+        min_ms=round(samples[0], 4),
+        median_ms=round(statistics.median(samples), 4),
+        p95_ms=round(p95, 4),
+        mean_ms=round(statistics.fmean(samples), 4),
+    )
+
+
+class BenchContext:
+    """Общее состояние замеров: БД, детерминированный генератор запросов и созданные id."""
+
+    def __init__(self, db: RecipeDB, seed: int = DEFAULT_SEED):
+        self.db = db
+        self.controller = RecipeController(db=db)
+        self.rng = random.Random(seed + 1)
+        self.generator = CorpusGenerator(seed + 2)
+        self.min_id, self.max_id = db.read_conn.execute(
+            "SELECT (SELECT MIN(id) FROM recipes), (SELECT MAX(id) FROM recipes)").fetchone()
+        self.created: List[int] = []
+
+    def any_id(self) -> int:
+        # каталог генерируется без удалений, поэтому id идут подряд
+        return self.rng.randint(self.min_id, self.max_id)
+
+    def tag(self) -> str:
+        return self.rng.choice(TAGS[:10])
+
+    def rare_tag(self) -> str:
+        return self.rng.choice(TAGS[-10:])
+
+    def word(self) -> str:
+        return self.rng.choice(INGREDIENTS[:30])
+
+    def tag_query(self) -> str:
+        # логический запрос по тегам: популярный тег, альтернатива и исключение
+        first, second = self.rng.sample(TAGS[:10], 2)
+        return f"({first} OR {second}) AND NOT {self.rare_tag()}"
+
+    def menu_constraints(self) -> Dict[str, Any]:
+        return {"slot_tags": {"завтрак": ["завтрак"], "обед": [self.rng.choice(["суп", "салат"])],
+                              "ужин": ["ужин", self.tag()]},
+                "exclude_tags": [self.rare_tag()], "max_shared_ingredients": 2, "max_ingredient_uses": 4,
+                "seed": self.rng.randrange(2 ** 31)}
+
+    def pantry(self) -> List[str]:
+        return self.rng.sample(INGREDIENTS[:25], 8)
+
+    def new_recipe(self) -> Recipe:
+        return self.generator.recipe()
+
+    def take_created(self) -> int:
+        if not self.created:
+            self.created.append(self.db.add(self.new_recipe()))
+        return self.created.pop()
+
+    def remember(self, ids) -> None:
+        self.created.extend(ids)
+
+
+def db_benchmarks(ctx: BenchContext) -> List[Benchmark]:
+    db = ctx.db
+
+    def update():
+        r = ctx.new_recipe()
+        db.update(ctx.any_id(), r.title, r.ingredients, r.steps, r.tags)
+
+    def add_many():
+        ctx.remember(res.id for res in db.add_many([ctx.new_recipe() for _ in range(100)]) if res.ok)
+
+    def update_many():
+        items = []
+        for _ in range(100):
+            r = ctx.new_recipe()
+            items.append((ctx.any_id(), r.title, r.ingredients, r.steps, r.tags))
+        db.update_many(items)
+
+    return [
+        Benchmark("add", lambda: ctx.remember([db.add(ctx.new_recipe())])),
+        Benchmark("get", lambda: db.get(ctx.any_id())),
+        Benchmark("update", update),
+        Benchmark("delete", lambda: db.delete(ctx.take_created())),
+        Benchmark("insert_many_1000", lambda: ctx.remember(db.insert_many([ctx.new_recipe() for _ in range(1000)]))),
+        Benchmark("add_many_100", add_many),
+        Benchmark("update_many_100", update_many),
+        Benchmark("delete_many_100", lambda: db.delete_many([ctx.take_created() for _ in range(100)])),
+        Benchmark("list_page", lambda: db.list_page(page_size=50)),
+        Benchmark("list_page_summary", lambda: db.list_page(page_size=50, summary=True)),
+        Benchmark("list_all", lambda: db.list_all(), heavy=True),
+        Benchmark("list_summaries", lambda: db.list_summaries(), heavy=True),
+        Benchmark("iter_all", lambda: sum(1 for _ in db.iter_all()), heavy=True),
+        Benchmark("find_by_tag_popular", lambda: db.find_by_tag(ctx.tag()), heavy=True),
+        Benchmark("find_by_tag_rare", lambda: db.find_by_tag(ctx.rare_tag()), heavy=True),
+        Benchmark("random_recipe", lambda: db.random_recipe()),
+        Benchmark("random_recipe_tag", lambda: db.random_recipe(ctx.tag())),
+        Benchmark("random_recipe_rare_tag", lambda: db.random_recipe(ctx.rare_tag())),
+        Benchmark("search", lambda: db.search(ctx.word())),
+        Benchmark("search_two_terms", lambda: db.search(f"{ctx.word()} {ctx.tag()}")),
+        Benchmark("count_by_date", lambda: db.count_by_date()),
+        Benchmark("data_version", lambda: db.data_version()),
+        Benchmark("get_summaries_100", lambda: db.get_summaries([ctx.any_id() for _ in range(100)])),
+    ]
+
+
+def controller_benchmarks(ctx: BenchContext) -> List[Benchmark]:
+    c = ctx.controller
+
+    def add_recipe():
+        r = ctx.new_recipe()
+        ctx.remember([c.add_recipe(r.title, r.ingredients, r.steps, r.tags)])
+
+    def edit_recipe():
+        r = ctx.new_recipe()
+        c.edit_recipe(ctx.any_id(), r.title, r.ingredients, r.steps, r.tags)
+
+    return [
+        Benchmark("add_recipe", add_recipe),
+        Benchmark("edit_recipe", edit_recipe),
+        Benchmark("delete_recipe", lambda: c.delete_recipe(ctx.take_created())),
+        Benchmark("get_recipe", lambda: c.get_recipe(ctx.any_id())),
+        Benchmark("list_recipes_page", lambda: c.list_recipes(page_size=50)),
+        Benchmark("list_summaries_page", lambda: c.list_summaries(page_size=50)),
+        Benchmark("list_recipes", lambda: c.list_recipes(), heavy=True),
+        Benchmark("random_recipe", lambda: c.random_recipe()),
+        Benchmark("random_recipe_tag", lambda: c.random_recipe(ctx.tag())),
+        Benchmark("search_recipes", lambda: c.search_recipes(ctx.word())),
+        Benchmark("activity_stats", lambda: c.activity_stats()),
+        Benchmark("recipes_makeable_with", lambda: c.recipes_makeable_with(ctx.pantry(), max_missing=1)),
+        Benchmark("data_version", lambda: c.data_version()),
+        # индекс тегов в памяти (app.tagquery): построение с нуля и запросы по готовому индексу
+        Benchmark("tag_index_build", lambda: TagIndex(ctx.db).refresh(), heavy=True),
+        Benchmark("find_by_tags", lambda: c.find_by_tags(ctx.tag_query(), limit=50)),
+        Benchmark("random_recipe_query", lambda: c.random_recipe(ctx.tag_query())),
+        Benchmark("draw_recipe", lambda: c.draw_recipe(session="bench")),
+        Benchmark("draw_recipe_tag", lambda: c.draw_recipe(ctx.tag(), session="bench")),
+        Benchmark("generate_menu", lambda: c.generate_menu(7)),
+        Benchmark("generate_menu_constraints", lambda: c.generate_menu(7, constraints=ctx.menu_constraints())),
+    ]
+
+
+def web_benchmarks(ctx: BenchContext, db_path: str) -> Optional[List[Benchmark]]:
+    """
+    Эндпоинты через ASGI-клиент httpx в том же процессе (без сети и сервера).
+    Возвращает None, если FastAPI или httpx не установлены.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    # отдельный экземпляр модуля на каталоге замеров: web.main в sys.modules (если приложение
+    # уже импортировано) не трогаем, а RECIPES_DB нужна только на время его импорта
+    previous = os.environ.get("RECIPES_DB")
+    os.environ["RECIPES_DB"] = db_path
+    try:
+        spec = importlib.util.find_spec("web.main")
+        web_main = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(web_main)
+    except ImportError:
+        return None
+    finally:
+        if previous is None:
+            os.environ.pop("RECIPES_DB", None)
+        else:
+            os.environ["RECIPES_DB"] = previous
+    ctx.web_main = web_main
+
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=web_main.app), base_url="http://bench")
+
+    def request(method: str, url: str, **kwargs) -> Callable[[], Any]:
+        def run():
+            params = kwargs.get("params")
+            response = loop.run_until_complete(client.request(
+                method, url, params=params() if callable(params) else params,
+                data=kwargs.get("data")() if "data" in kwargs else None,
+                json=kwargs.get("json")() if "json" in kwargs else None,
+                headers=kwargs.get("headers")() if "headers" in kwargs else None,
+            ))
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url}: HTTP {response.status_code}")
+            response.read()
+        return run
+
+    def etag() -> Dict[str, str]:
+        response = loop.run_until_complete(client.get("/"))
+        return {"If-None-Match": response.headers.get("etag", "")}
+
+    def add_form() -> Dict[str, str]:
+        r = ctx.new_recipe()
+        return {"title": r.title, "ingredients": r.ingredients, "steps": r.steps, "tags": r.tags}
+
+    ctx.web_client = (loop, client)
+    return [
+        Benchmark("GET /", request("GET", "/")),
+        Benchmark("GET / (304)", request("GET", "/", headers=etag)),
+        Benchmark("GET /api/recipes", request("GET", "/api/recipes", params={"page_size": 50})),
+        Benchmark("GET /random", request("GET", "/random")),
+        Benchmark("GET /random?tag", request("GET", "/random", params=lambda: {"tag": ctx.tag()})),
+        Benchmark("GET /search", request("GET", "/search", params=lambda: {"q": ctx.word()})),
+        Benchmark("GET /api/pantry", request("GET", "/api/pantry",
+                                             params=lambda: {"items": ",".join(ctx.pantry()), "max_missing": 1})),
+        Benchmark("GET /random?deck", request("GET", "/random", params={"deck": 1})),
+        Benchmark("GET /api/v1/tags/query", request("GET", "/api/v1/tags/query",
+                                                    params=lambda: {"q": ctx.tag_query(), "limit": 50})),
+        Benchmark("POST /api/v1/menu", request("POST", "/api/v1/menu",
+                                               json=lambda: dict(ctx.menu_constraints(), days=7))),
+        Benchmark("POST /add", request("POST", "/add", data=add_form)),
+        Benchmark("GET /export", request("GET", "/export", params={"format": "jsonl"}), heavy=True),
+    ]
+
+
+def _close_web(ctx: BenchContext) -> None:
+    loop_client = getattr(ctx, "web_client", None)
+    if loop_client:
+        loop, client = loop_client
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    web_main = getattr(ctx, "web_main", None)
+    if web_main is not None:
+        web_main.actrl.shutdown(wait=True)
+        web_main.db.close()
+
+
+def run_size(corpus_file: str, count: int, work_dir: str, repeat: int = 5,
+             groups=GROUPS, seed: int = DEFAULT_SEED, log=None) -> Dict[str, Dict[str, dict]]:
+    """Замеры на одном каталоге; возвращает {группа: {операция: Timing как dict}}."""
+    work_file = os.path.join(work_dir, f"work_{count}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(work_file + suffix):
+            os.remove(work_file + suffix)
+    shutil.copyfile(corpus_file, work_file)
+
+    db = RecipeDB(work_file)
+    ctx = BenchContext(db, seed)
+    heavy_repeat = min(repeat, HEAVY_REPEAT) if count >= 100000 else repeat
+    results: Dict[str, Dict[str, dict]] = {}
+    try:
+        for group in groups:
+            if group == "db":
+                benchmarks = db_benchmarks(ctx)
+            elif group == "controller":
+                benchmarks = controller_benchmarks(ctx)
+            elif group == "web":
+                benchmarks = web_benchmarks(ctx, work_file)
+                if benchmarks is None:
+                    if log:
+                        log("web: FastAPI/httpx не установлены, эндпоинты пропущены")
+                    continue
+            else:
+                raise ValueError(f"Неизвестная группа замеров: {group!r}")
+            group_results = results[group] = {}
+            for bench in benchmarks:
+                timing = measure(bench.fn, heavy_repeat if bench.heavy else repeat,
+                                 warmup=0 if bench.heavy and count >= 100000 else 1)
+                group_results[bench.name] = asdict(timing)
+                if log:
+                    log(f"{count:>9} {group:<10} {bench.name:<28} {timing.median_ms:10.3f} ms (p95 {timing.p95_ms:.3f})")
+    finally:
+        _close_web(ctx)
+        db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(work_file + suffix):
+                os.remove(work_file + suffix)
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 1.25, min_delta_ms: float = 0.05) -> List[dict]:
+    """
+    Сравнивает медианы с сохранённым baseline.
+    Регрессия — медиана выросла больше чем в threshold раз и больше чем на min_delta_ms
+    (второе условие отсекает шум на операциях в микросекунды).
+    Возвращает список строк сравнения для всех общих операций; у регрессий regression=True.
+    """
+    rows = []
+    for size, groups in current.get("results", {}).items():
+        base_groups = baseline.get("results", {}).get(size, {})
+        for group, ops in groups.items():
+            for name, timing in ops.items():
+                base = base_groups.get(group, {}).get(name)
+                if not base:
+                    continue
+                old, new = base["median_ms"], timing["median_ms"]
+                ratio = new / old if old > 0 else float("inf")
+                rows.append({
+                    "size": size,
+                    "group": group,
+                    "name": name,
+                    "baseline_ms": old,
+                    "current_ms": new,
+                    "ratio": round(ratio, 3),
+                    "regression": ratio > threshold and new - old > min_delta_ms,
+                })
+    return rows
@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("matplotlib")
+
+from matplotlib.figure import Figure
+from app.activity_chart import ActivityChart, prepare_activity
+
+
+class CountingCanvas:
+    def __init__(self):
+        self.draws = 0
+
+    def draw_idle(self):
+        self.draws += 1
+
+
+def test_prepare_activity_vectorized():
+    stats = {"2025-01-03": 2, "2025-01-01T10:00:00": 1, "2025-01-02": 0, "мусор": 5}
+    dates, counts = prepare_activity(stats)
+    assert [str(d) for d in dates] == ["2025-01-01", "2025-01-03"]
+    assert counts.tolist() == [1, 2]
+    dates, counts = prepare_activity({f"2025-02-{d:02d}": d for d in range(1, 29)}, days=5)
+    assert counts.tolist() == [24, 25, 26, 27, 28]
+
+
+def test_chart_updates_existing_artists():
+    figure, canvas = Figure(), CountingCanvas()
+    chart = ActivityChart(figure, canvas, max_bars=5)
+    patches = list(chart.ax.patches)
+    chart.update(*prepare_activity({"2025-01-01": 1, "2025-01-02": 3}))
+    draws = canvas.draws
+    chart.update(*prepare_activity({"2025-01-01": 1, "2025-01-02": 3}))
+    assert canvas.draws == draws  # данные те же — перерисовки нет
+
+    chart.update(*prepare_activity({"2025-01-01": 1, "2025-01-02": 4}))
+    assert chart.ax.patches[:] == patches  # новых артистов не создаётся
+    visible = [p for p in patches if p.get_visible()]
+    assert [p.get_height() for p in visible] == [1.0, 4.0]
+    assert chart._labels[1].get_text() == "4"
+
+    chart.update(*prepare_activity({}))
+    assert not any(p.get_visible() for p in patches) and chart._message.get_visible()
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from bench.__main__ import main
+from bench.corpus import build_corpus, generate_recipes, parse_size
+from bench.runner import compare, run_size
+
+
+def test_corpus_is_deterministic():
+    first = list(generate_recipes(50, seed=7))
+    assert first == list(generate_recipes(50, seed=7))
+    assert first != list(generate_recipes(50, seed=8))
+    assert all(r.title and r.tags and r.ingredients and r.created_at for r in first)
+
+
+def test_parse_size():
+    assert parse_size("10k") == 10000
+    assert parse_size("1M") == 1000000
+    assert parse_size("250") == 250
+    with pytest.raises(ValueError):
+        parse_size("много")
+
+
+def test_run_size_measures_db_and_controller(tmp_path):
+    corpus = build_corpus(str(tmp_path / "corpus.db"), 300, seed=1)
+    results = run_size(corpus, 300, str(tmp_path), repeat=2, groups=("db", "controller"), seed=1)
+    assert {"add", "find_by_tag_popular", "count_by_date", "random_recipe"} <= set(results["db"])
+    assert results["controller"]["recipes_makeable_with"]["runs"] == 2
+    assert {"find_by_tags", "draw_recipe_tag", "generate_menu_constraints"} <= set(results["controller"])
+    # пишущие замеры работают с копией: кэшированный каталог не меняется
+    assert list(tmp_path.glob("work_*")) == []
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"10000": {"db": {"get": {"median_ms": 1.0}, "add": {"median_ms": 0.01}}}}}
+    current = {"results": {"10000": {"db": {"get": {"median_ms": 2.0}, "add": {"median_ms": 0.03},
+                                            "new_op": {"median_ms": 5.0}}}}}
+    rows = {r["name"]: r for r in compare(baseline, current, threshold=1.25)}
+    assert rows["get"]["regression"]
+    assert not rows["add"]["regression"]  # рост в 3 раза, но в пределах шума
+    assert "new_op" not in rows
+
+
+def test_cli_writes_results_and_compares(tmp_path, capsys):
+    out = tmp_path / "results.json"
+    args = ["--sizes", "200", "--repeat", "1", "--groups", "db", "--cache-dir", str(tmp_path / "cache"),
+            "-o", str(out)]
+    assert main(args) == 0
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert "200" in data["results"] and data["environment"]["sqlite"]
+    assert main(args + ["--baseline", str(out), "--threshold", "1000"]) == 0
+    assert "регрессий: 0" in capsys.readouterr().out
+
+
+def test_web_benchmarks_keep_environment(tmp_path, monkeypatch):
+    import os
+    import sys
+    from app.models import RecipeDB
+    from bench.runner import BenchContext, _close_web, web_benchmarks
+    monkeypatch.setenv("RECIPES_DB", "prod.db")
+    loaded = sys.modules.get("web.main")
+    db_path = str(tmp_path / "web.db")
+    db = RecipeDB(db_path)
+    db.add_many(generate_recipes(5, seed=1))
+    ctx = BenchContext(db)
+    try:
+        web_benchmarks(ctx, db_path)
+    finally:
+        _close_web(ctx)
+        db.close()
+    assert os.environ["RECIPES_DB"] == "prod.db"
+    assert sys.modules.get("web.main") is loaded
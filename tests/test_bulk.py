@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+from app import bulk
+from app.cli import main
+from app.models import RecipeDB, Recipe, RecipeError
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecipeDB(str(tmp_path / "bulk.db"))
+    yield db
+    db.close()
+
+
+def test_import_jsonl_in_batches_with_rejects(db):
+    lines = [
+        json.dumps({"title": "Суп", "ingredients": "вода", "tags": ["обед", "горячее"]}, ensure_ascii=False),
+        "{битый json",
+        json.dumps({"title": "  "}),
+        json.dumps({"title": "Торт", "created_at": "2025-11-04T10:00:00"}, ensure_ascii=False),
+        json.dumps({"title": "Каша", "created_at": "вчера"}, ensure_ascii=False),
+        json.dumps({"title": "Чай"}, ensure_ascii=False),
+    ]
+    progress = []
+    report = bulk.import_recipes(db, io.StringIO("\n".join(lines)), "jsonl", batch_size=2,
+                                 progress=lambda r: progress.append(r.imported))
+    assert report.imported == 3
+    assert [line for line, _ in report.rejected] == [2, 3, 5]
+    assert progress == [2, 3]
+    assert [r.title for r in db.find_by_tag("горячее")] == ["Суп"]
+
+
+def test_import_stops_on_bad_encoding_with_partial_report(db):
+    good = "".join(json.dumps({"title": f"R{i}"}) + "\n" for i in range(2000)).encode("utf-8")
+    raw = io.BytesIO(good + b'{"title": "\xff\xfe"}\n' + json.dumps({"title": "after"}).encode() + b"\n")
+    stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    report = bulk.import_recipes(db, stream, "jsonl", batch_size=100)
+    assert report.aborted and report.rejected_count == 1
+    # строки, прочитанные до ошибки, записаны (поток декодируется блоками, поэтому не все 2000)
+    assert 0 < report.imported == len(db.list_all()) <= 2000
+
+
+def test_import_normalizes_created_at(db):
+    from app.controllers import RecipeController
+    lines = [json.dumps({"title": t, "created_at": c}) for t, c in
+             (("basic", "20250106T120000"), ("offset", "2025-01-05T10:00:00+03:00"), ("date", "2025-01-07"))]
+    report = bulk.import_recipes(db, io.StringIO("\n".join(lines)), "jsonl")
+    assert report.imported == 3
+    stored = {r.title: r.created_at for r in db.list_all()}
+    assert stored == {"basic": "2025-01-06T12:00:00", "offset": "2025-01-05T07:00:00", "date": "2025-01-07T00:00:00"}
+    assert [r.title for r in db.list_page().items] == ["date", "basic", "offset"]
+    stats = RecipeController(db).activity_stats()
+    assert list(stats)[-1] == "2025-01-07" and sum(stats.values()) == 3
+
+
+def test_export_import_roundtrip_csv(db, tmp_path):
+    db.seed([
+        Recipe(None, "Борщ", "свекла, капуста", "варить\nдолго", "обед", "2025-11-03T09:00:00"),
+        Recipe(None, "Салат", "огурцы", "нарезать", "закуска", "2025-11-04T09:00:00"),
+    ])
+    text = "".join(bulk.export_recipes(db, "csv", batch_size=1))
+    assert text.splitlines()[0] == ",".join(bulk.FIELDS)
+
+    other = RecipeDB(str(tmp_path / "copy.db"))
+    report = bulk.import_recipes(other, io.StringIO(text, newline=""), "csv")
+    assert report.imported == 2 and report.rejected_count == 0
+    assert [(r.title, r.steps) for r in other.list_all()] == [(r.title, r.steps) for r in db.list_all()]
+    other.close()
+
+
+def test_export_jsonl_streams_every_row(db):
+    db.seed([Recipe(None, f"R{i}", "", "", "", Recipe.now_iso()) for i in range(5)])
+    rows = [json.loads(line) for line in bulk.export_recipes(db, "jsonl", batch_size=2)]
+    assert [r["title"] for r in rows] == [f"R{i}" for i in range(5)]
+
+
+def test_unknown_format(db):
+    with pytest.raises(RecipeError):
+        list(bulk.export_recipes(db, "xml"))
+
+
+def test_cli_import_export(db, tmp_path, capsys):
+    src = tmp_path / "in.jsonl"
+    src.write_text(json.dumps({"title": "Омлет", "tags": "завтрак"}, ensure_ascii=False) + "\n", encoding="utf-8")
+    assert main(["--db", db.db_path, "import", str(src)]) == 0
+    out = tmp_path / "out.csv"
+    assert main(["--db", db.db_path, "export", "-o", str(out)]) == 0
+    assert "Омлет" in out.read_text(encoding="utf-8")
+
+
+def test_cli_reports_file_errors(db, tmp_path, capsys):
+    missing = str(tmp_path / "missing.jsonl")
+    assert main(["--db", db.db_path, "import", missing]) == 1
+    assert "missing.jsonl" in capsys.readouterr().err
+    unwritable = str(tmp_path / "no-such-dir" / "out.jsonl")
+    assert main(["--db", db.db_path, "export", "-o", unwritable]) == 1
+    assert "out.jsonl" in capsys.readouterr().err
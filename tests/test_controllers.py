@@ -65,8 +65,8 @@ from app.models import RecipeDB, Recipe, RecipeNotFoundError
 class DummyLogger:
     def __init__(self):
         self.messages = []
-    def info(self, msg): self.messages.append(msg)
-    def warning(self, msg): self.messages.append(msg)
+    def info(self, msg, *args): self.messages.append(msg % args if args else msg)
+    def warning(self, msg, *args): self.messages.append(msg % args if args else msg)
 
 @pytest.fixture
 def controller_with_logger(tmp_path):
@@ -88,3 +88,180 @@ def test_random_recipe_logs(controller_with_logger):
     controller_with_logger.add_recipe("Тест", "ингр", "шаги", "метка")
     _ = controller_with_logger.random_recipe()
     assert any("Сгенерирован" in m for m in controller_with_logger.logger.messages)
+
+
+def test_search_recipes(controller):
+    controller.add_recipe("Оладьи", "кефир, мука", "жарить", "завтрак")
+    hits = controller.search_recipes("кеф")
+    assert [h.recipe.title for h in hits] == ["Оладьи"]
+    assert controller.search_recipes("   ") == []
+
+
+def test_list_recipes_paginated(controller):
+    for i in range(3):
+        controller.add_recipe(f"R{i}", "", "", "")
+    page = controller.list_recipes(page_size=2)
+    assert len(page.items) == 2 and page.next_cursor
+    rest = controller.list_recipes(cursor=page.next_cursor, page_size=2)
+    assert len(rest.items) == 1 and rest.next_cursor is None
+    assert len(controller.list_recipes()) == 3
+
+
+def test_async_controller_runs_off_loop(controller):
+    import asyncio
+    import threading
+    from app.controllers import AsyncRecipeController
+
+    actrl = AsyncRecipeController(controller, max_workers=2)
+
+    async def scenario():
+        rid = await actrl.add_recipe("Суп", "вода", "варить", "обед")
+        recipe = await actrl.get_recipe(rid)
+        thread = await actrl.call(lambda: threading.current_thread().name)
+        return recipe, thread
+
+    try:
+        recipe, thread = asyncio.run(scenario())
+    finally:
+        actrl.shutdown()
+    assert recipe.title == "Суп"
+    assert thread.startswith("recipe-db")
+
+
+def test_async_controller_timeout(controller):
+    import asyncio
+    import time
+    from app.controllers import AsyncRecipeController, QueryTimeoutError
+
+    actrl = AsyncRecipeController(controller, max_workers=1, timeout=0.05)
+    try:
+        with pytest.raises(QueryTimeoutError):
+            asyncio.run(actrl.call(time.sleep, 0.5))
+    finally:
+        actrl.shutdown()
+
+
+def test_interrupt_only_while_job_runs():
+    from app.controllers import _RunningQuery
+
+    class Conn:
+        interrupted = 0
+
+        def interrupt(self):
+            self.interrupted += 1
+
+    conn = Conn()
+    running = _RunningQuery()
+    running.interrupt()
+    running.start(conn)
+    running.interrupt()
+    running.finish()
+    # поток пула уже взял следующее задание на том же соединении — его не трогаем
+    running.interrupt()
+    assert conn.interrupted == 1
+
+
+def test_batch_operations(controller):
+    added = controller.add_many([{"title": "A", "tags": "t"}, {"title": ""}, {"title": "B"}])
+    assert [(r.index, r.ok) for r in added] == [(0, True), (1, False), (2, True)]
+    updated = controller.update_many([{"id": added[0].id, "title": "A2"}, {"title": "без id"}])
+    assert [r.ok for r in updated] == [True, False]
+    assert controller.get_recipe(added[0].id).title == "A2"
+    deleted = controller.delete_many([added[2].id, "x"])
+    assert [r.ok for r in deleted] == [True, False]
+    assert [r.title for r in controller.list_recipes()] == ["A2"]
+
+
+def test_batch_rejects_non_string_fields(controller):
+    added = controller.add_many([{"title": "A", "tags": 5}, {"title": "B"}, {"title": 7},
+                                 {"title": "C", "ingredients": ["x"]}, "не объект"])
+    assert [r.ok for r in added] == [False, True, False, False, False]
+    assert "tags" in added[0].error and "ingredients" in added[3].error
+    assert [r.title for r in controller.list_recipes()] == ["B"]
+    updated = controller.update_many([{"id": added[1].id, "title": "B2", "steps": {"a": 1}},
+                                      {"id": added[1].id, "title": "B3", "tags": None}])
+    assert [r.ok for r in updated] == [False, True]
+    assert controller.get_recipe(added[1].id).title == "B3"
+
+
+def test_controller_calls_share_transaction(controller):
+    rid = controller.add_recipe("Старый", "", "", "")
+    with pytest.raises(RecipeError):
+        with controller.transaction():
+            controller.add_recipe("Новый", "", "", "")
+            controller.delete_recipe(rid)
+            controller.add_recipe("", "", "", "")
+    assert [r.title for r in controller.list_recipes()] == ["Старый"]
+
+
+def test_list_summaries(controller):
+    controller.add_recipe("A", "ингр", "шаги", "t")
+    assert [s.title for s in controller.list_summaries()] == ["A"]
+    page = controller.list_summaries(page_size=10)
+    assert page.items[0].to_dict()["tags"] == "t"
+
+
+def test_json_api_helpers(controller):
+    import json
+    rid = controller.add_recipe("Суп", "вода", "варить", "обед")
+    other = controller.add_recipe("Каша", "", "", "")
+    body = json.loads(controller.list_recipes_json(page_size=1, fields="id,title"))
+    assert body["items"] == [{"id": other, "title": "Каша"}] and body["next_cursor"]
+    lines = "".join(controller.iter_recipes_ndjson(fields="id", batch_size=1)).splitlines()
+    assert [json.loads(line) for line in lines] == [{"id": rid}, {"id": other}]
+    with pytest.raises(RecipeError):
+        controller.iter_recipes_ndjson(fields="nope")
+
+    controller.patch_recipe(rid, {"tags": "ужин"})
+    assert json.loads(controller.recipe_json(rid, "title,tags")) == {"title": "Суп", "tags": "ужин"}
+    with pytest.raises(RecipeError):
+        controller.patch_recipe(rid, {"title": " "})
+    with pytest.raises(RecipeNotFoundError):
+        controller.patch_recipe(9999, {"title": "X"})
+
+
+def test_draw_recipe_without_repeats(controller):
+    ids = {controller.add_recipe(f"R{i}", "", "", "t") for i in range(5)}
+    assert {controller.draw_recipe("t").id for _ in range(5)} == ids
+    with pytest.raises(RecipeError):
+        controller.draw_recipe("нет")
+
+
+def test_generate_menu(controller):
+    for i in range(6):
+        controller.add_recipe(f"R{i}", "", "", "суп" if i % 2 else "")
+    menu = controller.generate_menu(3, ["обед"], {"slot_tags": {"обед": ["суп"]}, "seed": 1})
+    assert sorted(item.recipe.title for item in menu.items) == ["R1", "R3", "R5"]
+    with pytest.raises(RecipeError):
+        controller.generate_menu(0)
+
+
+def test_find_by_tags_and_random_with_query(controller):
+    vegan = controller.add_recipe("Сорбет", "", "", "десерт,веган")
+    controller.add_recipe("Пахлава", "", "", "десерт,орехи")
+    result = controller.find_by_tags("десерт and not орехи")
+    assert (result.query, result.count, [s.id for s in result.items]) == ("десерт AND NOT орехи", 1, [vegan])
+    assert controller.random_recipe("Десерт, НЕ орехи").id == vegan
+    assert controller.draw_recipe("(веган OR бранч)").id == vegan
+    with pytest.raises(RecipeError):
+        controller.random_recipe("орехи AND NOT орехи")
+    with pytest.raises(RecipeError):
+        controller.find_by_tags("(десерт")
+
+
+def test_indexes_built_once_under_concurrent_first_requests(controller):
+    from concurrent.futures import ThreadPoolExecutor
+    for i in range(20):
+        controller.add_recipe(f"R{i}", "мука, яйца", "", "десерт")
+    builds = []
+    rebuild = controller.tag_index._rebuild
+
+    def counting_rebuild():
+        builds.append(1)
+        rebuild()
+
+    controller.tag_index._rebuild = counting_rebuild
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: controller.draw_recipe("десерт"), range(16)))
+    assert len(builds) == 1
+    assert controller._decks.tags is controller.tag_index
@@ -0,0 +1,78 @@
+import pytest
+
+from app.decks import RandomDecks, ShuffledDeck
+from app.models import Recipe, RecipeDB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecipeDB(str(tmp_path / "decks.db"))
+    yield db
+    db.close()
+
+
+def _add(db, title, tags=""):
+    return db.add(Recipe(None, title, "", "", tags, Recipe.now_iso()))
+
+
+def test_deck_pop_is_a_permutation():
+    import random
+    from array import array
+    deck = ShuffledDeck(array("q", range(1, 101)), seq=0)
+    rng = random.Random(1)
+    drawn = [deck.draw(rng) for _ in range(100)]
+    assert sorted(drawn) == list(range(1, 101))
+    assert deck.draw(rng) is None
+
+
+def test_no_repeats_until_exhausted(db):
+    ids = [_add(db, f"R{i}", "обед" if i % 2 else "ужин") for i in range(10)]
+    decks = RandomDecks(db, seed=7)
+    first = [decks.draw().id for _ in range(10)]
+    assert sorted(first) == sorted(ids)
+    second = [decks.draw().id for _ in range(10)]
+    assert sorted(second) == sorted(ids)
+    assert first[-1] != second[0]
+
+    lunch = {decks.draw("Обед").id for _ in range(5)}
+    assert lunch == set(ids[1::2])
+    assert decks.remaining("обед") == 0
+    assert decks.draw("нет-такого") is None
+
+
+def test_deck_follows_changes(db):
+    a, b, c = (_add(db, t, "x") for t in "abc")
+    decks = RandomDecks(db, seed=3)
+    got = [decks.draw("x").id]
+    deleted = next(i for i in (a, b, c) if i not in got)
+    db.delete(deleted)
+    d = _add(db, "d", "x")
+    _add(db, "e", "y")
+    got += [decks.draw("x").id for _ in range(2)]
+    assert d in got and deleted not in got and len(set(got)) == 3
+
+
+def test_sessions_have_own_decks(db):
+    for i in range(4):
+        _add(db, f"R{i}")
+    decks = RandomDecks(db, max_decks=2, seed=1)
+    decks.draw(session="a")
+    decks.draw(session="b")
+    assert decks.remaining(session="a") == 3
+    decks.draw(session="c")  # вытесняет самую давнюю колоду
+    assert decks.remaining(session="a") is None
+    decks.reset("b")
+    assert decks.remaining(session="b") is None
+
+
+def test_shared_decks_are_bounded_separately(db):
+    for i in range(4):
+        _add(db, f"R{i}", "t")
+    decks = RandomDecks(db, max_decks=1, max_shared_decks=1, seed=1)
+    decks.draw(session="a")
+    # анонимные запросы делят одну колоду и не вытесняют колоду посетителя
+    shared = {decks.draw().id for _ in range(4)}
+    assert len(shared) == 4
+    decks.draw("t")
+    assert decks.remaining(session="a") == 3
+    assert decks.remaining() is None and decks.remaining("t") == 3
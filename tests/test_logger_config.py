@@ -0,0 +1,82 @@
+import logging
+import threading
+
+import pytest
+from app.controllers import RecipeController
+from app.logger_config import LogPipeline, setup_logging, shutdown_logging
+from app.models import RecipeDB
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.threads.add(threading.current_thread().name)
+        self.lines.append(self.format(record))
+
+
+class Lazy:
+    """Фиксирует, в каком потоке объект превратили в строку."""
+    def __init__(self):
+        self.formatted_in = None
+
+    def __str__(self):
+        self.formatted_in = threading.current_thread()
+        return "lazy"
+
+
+@pytest.fixture
+def pipeline():
+    logger = logging.getLogger("test.pipeline")
+    logger.propagate = False
+    pipe = LogPipeline(level=logging.INFO, fmt="%(message)s", console=False).start(logger)
+    yield pipe, logger
+    pipe.stop(logger)
+
+
+def test_records_from_worker_threads_are_formatted_by_listener(pipeline):
+    pipe, logger = pipeline
+    sink = CollectingHandler()
+    pipe.add_sink(sink)
+    lazy = Lazy()
+    logger.info("значение %s", lazy)
+    workers = [threading.Thread(target=lambda n=n: logger.info("поток %d", n)) for n in range(8)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    pipe.stop(logger)
+    assert sink.lines[0] == "значение lazy"
+    assert sorted(sink.lines[1:]) == sorted(f"поток {n}" for n in range(8))
+    # подстановка аргументов выполнена в потоке слушателя, а не в вызывающем
+    assert lazy.formatted_in is not threading.main_thread()
+    assert threading.main_thread().name not in sink.threads
+
+
+def test_rotating_file_sink(tmp_path):
+    log_file = tmp_path / "app.log"
+    setup_logging(level=logging.INFO, console=False, log_file=str(log_file), max_bytes=200, backup_count=2)
+    try:
+        logger = logging.getLogger("test.file")
+        for n in range(20):
+            logger.info("строка журнала номер %d", n)
+    finally:
+        shutdown_logging()
+    assert "строка журнала номер 19" in log_file.read_text(encoding="utf-8")
+    assert (tmp_path / "app.log.1").exists()
+
+
+def test_controller_logs_with_lazy_arguments(tmp_path, caplog):
+    db = RecipeDB(str(tmp_path / "log.db"))
+    ctrl = RecipeController(db=db, logger=logging.getLogger("test.controller"))
+    try:
+        with caplog.at_level(logging.INFO, logger="test.controller"):
+            rid = ctrl.add_recipe("Суп", "вода", "варить", "обед")
+        record = caplog.records[-1]
+        assert record.args == (rid, "Суп")
+        assert record.getMessage() == f"Добавлен рецепт id={rid} title='Суп'"
+    finally:
+        db.close()
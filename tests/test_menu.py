@@ -0,0 +1,75 @@
+from collections import Counter
+
+import pytest
+
+from app.menu import MenuConstraints, MenuPlanner
+from app.models import Recipe, RecipeDB, RecipeError
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecipeDB(str(tmp_path / "menu.db"))
+    recipes = []
+    for i in range(60):
+        tags = ["завтрак" if i % 3 == 0 else "обед" if i % 3 == 1 else "ужин"]
+        if i % 5 == 0:
+            tags.append("острое")
+        ingredients = f"ингр{i % 7}, ингр{i % 11}, соль"
+        recipes.append(Recipe(None, f"Р{i}", ingredients, "", ",".join(tags), Recipe.now_iso()))
+    db.insert_many(recipes)
+    yield db
+    db.close()
+
+
+def _tags(db, item):
+    return db.get(item.recipe.id).tag_list()
+
+
+def test_menu_respects_slot_tags_and_no_repeats(db):
+    constraints = MenuConstraints(slot_tags={s: [s] for s in ("завтрак", "обед", "ужин")},
+                                  exclude_tags=["острое"], seed=5)
+    menu = MenuPlanner(db).generate(5, constraints=constraints)
+    assert menu.unfilled() == [] and len(menu.items) == 15
+    ids = [item.recipe.id for item in menu.items]
+    assert len(set(ids)) == len(ids)
+    for item in menu.items:
+        tags = _tags(db, item)
+        assert item.slot in tags and "острое" not in tags
+
+
+def test_menu_is_deterministic_with_seed(db):
+    planner = MenuPlanner(db)
+    first = planner.generate(7, ["a", "b"], MenuConstraints(seed=42)).to_dict()
+    assert planner.generate(7, ["a", "b"], MenuConstraints(seed=42)).to_dict() == first
+    assert first["seed"] == 42
+
+
+def test_menu_ingredient_limits(db):
+    # у всех рецептов есть «соль»: не больше двух блюд с ней, а в один день — без общих ингредиентов
+    menu = MenuPlanner(db).generate(3, ["a", "b"], MenuConstraints(max_ingredient_uses=2, seed=1))
+    assert sum(item.recipe is not None for item in menu.items) == 2
+    assert len(menu.unfilled()) == 4
+    menu = MenuPlanner(db).generate(3, ["a", "b"], MenuConstraints(max_shared_ingredients=0, seed=1))
+    assert [item.recipe is None for item in menu.items] == [False, True] * 3
+
+
+def test_menu_constraints_from_dict():
+    c = MenuConstraints.from_dict({"slot_tags": {"обед": "Суп, горячее"}, "exclude_tags": ["Острое"], "seed": 3})
+    assert c.slot_tags == {"обед": ["суп", "горячее"]} and c.exclude_tags == ["острое"]
+    with pytest.raises(RecipeError):
+        MenuConstraints.from_dict({"max_ingredient_uses": 0})
+    with pytest.raises(RecipeError):
+        MenuConstraints.from_dict({"colour": "red"})
+
+
+def test_menu_samples_candidates_uniformly(tmp_path):
+    # рецепты с тегом: три подряд и один после большого промежутка id
+    db = RecipeDB(str(tmp_path / "gap.db"))
+    ids = [db.add(Recipe(None, f"Р{i}", "", "", "x" if i in (0, 1, 2, 40) else "", Recipe.now_iso()))
+           for i in range(41)]
+    planner = MenuPlanner(db)
+    picks = Counter(planner.generate(1, ["a"], MenuConstraints(slot_tags={"a": ["x"]}, seed=seed)).items[0].recipe.id
+                    for seed in range(400))
+    db.close()
+    assert set(picks) == {ids[0], ids[1], ids[2], ids[40]}
+    assert all(60 <= n <= 140 for n in picks.values())
@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+from app.metrics import Histogram, QueryMetrics, RequestMetrics, normalize_statement, render_prometheus
+from app.models import RecipeDB, Recipe
+
+
+@pytest.fixture
+def metrics():
+    return QueryMetrics(slow_ms=None)
+
+
+@pytest.fixture
+def db(tmp_path, metrics):
+    db = RecipeDB(str(tmp_path / "metrics.db"), metrics=metrics)
+    yield db
+    db.close()
+
+
+def test_normalize_statement():
+    assert normalize_statement("SELECT *\n   FROM recipes\n WHERE id IN (?, ?,?)") == \
+        "SELECT * FROM recipes WHERE id IN (?, ...)"
+    assert len(normalize_statement("SELECT " + "x, " * 200)) == 200
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram((0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 1.0):
+        h.observe(value)
+    assert h.cumulative() == [("0.001", 2), ("0.01", 3), ("+Inf", 4)]
+    assert h.total == pytest.approx(1.0065)
+
+
+def test_queries_are_timed_with_row_counts(db, metrics):
+    for i in range(3):
+        db.add(Recipe(None, f"R{i}", "", "", "t", Recipe.now_iso()))
+    assert len(db.list_all()) == 3
+    db.get(1)
+    stats = metrics.snapshot()
+    list_key = next(k for k in stats if k.startswith("SELECT id, title") and "ORDER BY" in k)
+    assert stats[list_key]["count"] == 1 and stats[list_key]["rows"] == 3
+    insert = next(k for k in stats if k.startswith("INSERT INTO recipes("))
+    assert stats[insert]["count"] == 3 and stats[insert]["rows"] == 3
+    assert all(s["total_ms"] >= 0 for s in stats.values())
+
+
+def test_slow_query_log(tmp_path, caplog):
+    metrics = QueryMetrics(slow_ms=0)
+    db = RecipeDB(str(tmp_path / "slow.db"), metrics=metrics)
+    try:
+        with caplog.at_level(logging.WARNING, logger="recipes.sql"):
+            db.count_by_date()
+        assert any("Медленный запрос" in r.getMessage() and "daily_activity" in r.getMessage()
+                   for r in caplog.records)
+        assert metrics.slow_queries()
+    finally:
+        db.close()
+
+
+def test_slow_query_log_hides_params_by_default(tmp_path, caplog):
+    for log_params in (False, True):
+        db = RecipeDB(str(tmp_path / f"params{log_params}.db"), metrics=QueryMetrics(slow_ms=0, log_params=log_params))
+        try:
+            with caplog.at_level(logging.WARNING, logger="recipes.sql"):
+                caplog.clear()
+                db.add(Recipe(None, "Секретный борщ", "", "", "", Recipe.now_iso()))
+            logged = any("Секретный борщ" in r.getMessage() for r in caplog.records)
+            assert logged is log_params
+        finally:
+            db.close()
+
+
+def test_render_prometheus(db, metrics):
+    db.count_by_date()
+    requests = RequestMetrics()
+    requests.record("GET", "/api/recipes", 200, 0.003)
+    text = render_prometheus(metrics, requests)
+    assert "# TYPE recipes_sql_duration_seconds histogram" in text
+    assert "recipes_sql_slow_queries_total 0" in text
+    assert ('recipes_http_request_duration_seconds_bucket{method="GET",route="/api/recipes",'
+            'status="200",le="0.005"} 1') in text
+    assert 'statement="SELECT day, count FROM daily_activity' in text
@@ -73,3 +73,407 @@ def test_count_by_date(temp_db):
     stats = temp_db.count_by_date()
     assert stats["2025-11-04"] == 2
     assert stats["2025-11-03"] == 1
+
+
+def test_find_by_tag_exact_match(temp_db):
+    temp_db.seed([
+        Recipe(None, "Щи", "капуста", "варить", "суп, обед", Recipe.now_iso()),
+        Recipe(None, "Торт", "мука", "печь", "супер", Recipe.now_iso()),
+    ])
+    found = temp_db.find_by_tag("Суп")
+    assert [r.title for r in found] == ["Щи"]
+
+
+def test_tag_index_follows_update_and_delete(temp_db):
+    rid = temp_db.add(Recipe(None, "Омлет", "яйца", "жарить", "завтрак", Recipe.now_iso()))
+    temp_db.update(rid, "Омлет", "яйца", "жарить", "ужин")
+    assert temp_db.find_by_tag("завтрак") == []
+    assert len(temp_db.find_by_tag("ужин")) == 1
+    temp_db.delete(rid)
+    assert temp_db.find_by_tag("ужин") == []
+
+
+def test_tag_index_backfilled_for_existing_db(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE recipes (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "ingredients TEXT, steps TEXT, tags TEXT, created_at TEXT)")
+    conn.execute("INSERT INTO recipes(title, ingredients, steps, tags, created_at) "
+                 "VALUES ('Блины', 'мука', 'жарить', 'завтрак,десерт', '2025-11-04T10:00:00')")
+    conn.commit()
+    conn.close()
+    db = RecipeDB(path)
+    assert [r.title for r in db.find_by_tag("десерт")] == ["Блины"]
+    db.close()
+
+
+def test_search_ranks_and_highlights(temp_db):
+    temp_db.seed([
+        Recipe(None, "Борщ", "свекла, капуста", "варить свеклу", "обед", Recipe.now_iso()),
+        Recipe(None, "Салат", "капуста, морковь", "нарезать", "закуска", Recipe.now_iso()),
+        Recipe(None, "Пирог", "мука", "печь", "десерт", Recipe.now_iso()),
+    ])
+    hits = temp_db.search("капуста")
+    assert {h.recipe.title for h in hits} == {"Борщ", "Салат"}
+    assert "<mark>капуста</mark>" in hits[0].snippet_html()
+    assert temp_db.search("борщ")[0].recipe.title == "Борщ"
+    assert temp_db.search('"(') == []
+
+
+def test_search_follows_update_and_delete(temp_db):
+    rid = temp_db.add(Recipe(None, "Каша", "пшено", "варить", "", Recipe.now_iso()))
+    temp_db.update(rid, "Каша", "рис", "варить", "")
+    assert temp_db.search("пшено") == []
+    assert len(temp_db.search("рис")) == 1
+    temp_db.delete(rid)
+    assert temp_db.search("рис") == []
+
+
+def test_random_recipe_skips_deleted_ids(temp_db):
+    ids = [temp_db.add(Recipe(None, f"R{i}", "", "", "чёт" if i % 2 == 0 else "", Recipe.now_iso()))
+           for i in range(10)]
+    for rid in ids[1:-1]:
+        temp_db.delete(rid)
+    seen = {temp_db.random_recipe().id for _ in range(50)}
+    assert seen == {ids[0], ids[-1]}
+    assert temp_db.random_recipe("чёт").id == ids[0]
+    assert temp_db.random_recipe("нет такого") is None
+
+
+def test_random_recipe_offset_fallback(temp_db):
+    ids = [temp_db.add(Recipe(None, f"R{i}", "", "", "", Recipe.now_iso())) for i in range(3)]
+    temp_db.delete(ids[1])
+    # ни одной пробы — сразу выбор через COUNT + OFFSET
+    assert temp_db.random_recipe(attempts=0).id in {ids[0], ids[2]}
+
+
+def test_random_recipe_empty_db(temp_db):
+    assert temp_db.random_recipe() is None
+
+
+def test_list_page_walks_all_rows_with_cursor(temp_db):
+    temp_db.seed([
+        Recipe(None, f"R{i}", "", "", "", f"2025-11-0{1 + i % 3}T10:00:00") for i in range(7)
+    ])
+    expected = [r.id for r in temp_db.list_all()]
+    seen, cursor = [], None
+    while True:
+        page = temp_db.list_page(cursor=cursor, page_size=3)
+        seen.extend(r.id for r in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == expected
+    assert len(temp_db.list_page(page_size=10).items) == 7
+
+
+def test_list_page_keeps_rows_without_created_at(temp_db):
+    ids = [temp_db.add(Recipe(None, f"R{i}", "", "", "", "2025-11-04T10:00:00")) for i in range(3)]
+    for title in ("без даты 1", "без даты 2"):
+        temp_db.conn.execute("INSERT INTO recipes(title, created_at) VALUES (?, NULL)", (title,))
+    temp_db.conn.commit()
+    seen, cursor = [], None
+    while True:
+        page = temp_db.list_page(cursor=cursor, page_size=2)
+        seen += [r.title for r in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == ["R2", "R1", "R0", "без даты 2", "без даты 1"]
+    # данные не переписываются: NULL остаётся NULL
+    assert temp_db.conn.execute("SELECT COUNT(*) FROM recipes WHERE created_at IS NULL").fetchone()[0] == 2
+    plan = " ".join(r[3] for r in temp_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM recipes WHERE (COALESCE(created_at, ''), id) < (?, ?) "
+        "ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT 3", ("2025", ids[0])))
+    assert "idx_recipes_created_key" in plan and "TEMP B-TREE" not in plan
+
+
+def test_list_page_rejects_garbage_cursor(temp_db):
+    with pytest.raises(RecipeError):
+        temp_db.list_page(cursor="не-курсор")
+
+
+def test_migrations_set_user_version(temp_db):
+    from app.migrations import latest_version, migrate, schema_version
+    assert schema_version(temp_db.conn) == latest_version()
+    # повторный запуск ничего не делает
+    assert migrate(temp_db.conn) == latest_version()
+    names = {r[0] for r in temp_db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_recipes_created_key" in names
+    assert not {"idx_recipes_created_id", "idx_recipes_day"} & names
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    import sqlite3
+    from app import migrations
+
+    def broken(cur):
+        cur.execute("CREATE TABLE half_done (x INTEGER)")
+        cur.execute("SELECT * FROM no_such_table")
+
+    version = migrations.latest_version() + 1
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [(version, "broken", broken)])
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    with pytest.raises(migrations.MigrationError):
+        migrations.migrate(conn)
+    assert migrations.schema_version(conn) == version - 1
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
+
+
+def test_connections_are_per_thread_and_wal(temp_db):
+    import threading
+    temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+    assert temp_db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    result = {}
+
+    def worker():
+        result["conn"] = temp_db.conn
+        result["titles"] = [r.title for r in temp_db.list_all()]
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert result["conn"] is not temp_db.conn
+    assert result["titles"] == ["A"]
+
+
+def test_synchronous_defaults_to_full(tmp_path):
+    db = RecipeDB(str(tmp_path / "sync.db"))
+    # 2 = FULL, 1 = NORMAL
+    assert db.conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+    db.close()
+    db = RecipeDB(str(tmp_path / "sync.db"), synchronous="normal")
+    assert db.conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    db.close()
+    with pytest.raises(RecipeError):
+        RecipeDB(str(tmp_path / "sync.db"), synchronous="sometimes")
+
+
+def test_thread_connections_are_closed_when_thread_exits(temp_db):
+    import gc
+    import sqlite3
+    import threading
+    temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+    before = len(temp_db._connections)
+    opened = []
+
+    def worker():
+        opened.extend([temp_db.conn, temp_db.read_conn])
+        temp_db.list_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+        t.join()
+    gc.collect()
+    assert len(temp_db._connections) == before
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+
+def test_readers_do_not_block_on_open_write_transaction(temp_db):
+    import threading
+    temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+    writer = temp_db.conn
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO recipes(title, created_at) VALUES ('B', '2025-01-01T00:00:00')")
+    # своя незавершённая транзакция видна в текущем потоке
+    assert len(temp_db.list_all()) == 2
+    result = {}
+    t = threading.Thread(target=lambda: result.setdefault("n", len(temp_db.list_all())))
+    t.start()
+    t.join(timeout=2)
+    writer.commit()
+    assert result["n"] == 1
+
+
+def test_in_memory_db_uses_single_connection():
+    db = RecipeDB(":memory:")
+    db.add(Recipe(None, "A", "", "", "t", Recipe.now_iso()))
+    assert db.read_conn is db.conn
+    assert [r.title for r in db.find_by_tag("t")] == ["A"]
+    db.close()
+
+
+def test_daily_activity_follows_writes(temp_db):
+    rid = temp_db.add(Recipe(None, "A", "", "", "", "2025-11-04T10:00:00"))
+    temp_db.add(Recipe(None, "B", "", "", "", "2025-11-04T12:00:00"))
+    assert temp_db.count_by_date() == {"2025-11-04": 2}
+    temp_db.conn.execute("UPDATE recipes SET created_at = '2025-11-05T08:00:00' WHERE id = ?", (rid,))
+    temp_db.conn.commit()
+    assert temp_db.count_by_date() == {"2025-11-04": 1, "2025-11-05": 1}
+    temp_db.delete(rid)
+    assert temp_db.count_by_date() == {"2025-11-04": 1}
+
+
+def test_rebuild_daily_activity_cli(temp_db):
+    from app.cli import main
+    temp_db.add(Recipe(None, "A", "", "", "", "2025-11-04T10:00:00"))
+    temp_db.conn.execute("DELETE FROM daily_activity")
+    temp_db.conn.commit()
+    assert temp_db.count_by_date() == {}
+    assert main(["--db", temp_db.db_path, "rebuild-stats"]) == 0
+    assert temp_db.count_by_date() == {"2025-11-04": 1}
+
+
+def test_data_version_bumps_on_every_write(temp_db):
+    v0 = temp_db.data_version().version
+    rid = temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+    v1 = temp_db.data_version().version
+    temp_db.update(rid, "B", "", "", "")
+    v2 = temp_db.data_version().version
+    temp_db.delete(rid)
+    v3 = temp_db.data_version().version
+    assert v0 < v1 < v2 < v3
+    assert temp_db.data_version().last_modified
+
+
+def test_batch_mutations_report_per_item(temp_db):
+    results = temp_db.add_many([
+        Recipe(None, "A", "", "", "x", Recipe.now_iso()),
+        Recipe(None, " ", "", "", "", Recipe.now_iso()),
+        Recipe(None, "B", "", "", "x", Recipe.now_iso()),
+    ])
+    assert [r.ok for r in results] == [True, False, True]
+    a_id, b_id = results[0].id, results[2].id
+    updated = temp_db.update_many([(a_id, "A2", "", "", "y"), (9999, "Z", "", "", "")])
+    assert [r.ok for r in updated] == [True, False]
+    assert [r.title for r in temp_db.find_by_tag("y")] == ["A2"]
+    deleted = temp_db.delete_many([b_id, b_id])
+    assert [r.ok for r in deleted] == [True, False]
+    assert [r.title for r in temp_db.list_all()] == ["A2"]
+    assert not temp_db.conn.in_transaction
+
+
+def test_update_missing_does_not_leave_transaction_open(temp_db):
+    with pytest.raises(RecipeNotFoundError):
+        temp_db.update(12345, "X", "", "", "")
+    assert not temp_db.conn.in_transaction
+
+
+def test_transaction_commits_once_and_rolls_back_whole_unit(temp_db):
+    with temp_db.transaction():
+        temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+        temp_db.add(Recipe(None, "B", "", "", "", Recipe.now_iso()))
+        assert temp_db.conn.in_transaction
+    assert not temp_db.conn.in_transaction
+    assert len(temp_db.list_all()) == 2
+
+    with pytest.raises(RuntimeError):
+        with temp_db.transaction():
+            temp_db.add(Recipe(None, "C", "", "", "", Recipe.now_iso()))
+            raise RuntimeError("отмена")
+    assert len(temp_db.list_all()) == 2
+
+
+def test_nested_transaction_is_a_savepoint(temp_db):
+    with temp_db.transaction():
+        temp_db.add(Recipe(None, "A", "", "", "", Recipe.now_iso()))
+        # неудачная операция внутри внешней транзакции откатывает только себя
+        with pytest.raises(RecipeNotFoundError):
+            temp_db.delete(9999)
+        try:
+            with temp_db.transaction():
+                temp_db.add(Recipe(None, "B", "", "", "", Recipe.now_iso()))
+                raise ValueError
+        except ValueError:
+            pass
+    assert [r.title for r in temp_db.list_all()] == ["A"]
+
+
+def test_group_commit_from_many_threads(tmp_path):
+    import threading
+    db = RecipeDB(str(tmp_path / "group.db"), group_commit_ms=5)
+    errors = []
+
+    def writer(n):
+        try:
+            db.add(Recipe(None, f"R{n}", "", "", "t", Recipe.now_iso()))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with pytest.raises(RecipeNotFoundError):
+        db.delete(12345)
+    assert errors == []
+    assert len(db.find_by_tag("t")) == 20
+    db.close()
+
+
+def test_group_commit_close_fails_pending_writes(tmp_path):
+    import threading
+    from app.models import GroupCommitter
+    db = RecipeDB(str(tmp_path / "closing.db"))
+    committer = GroupCommitter(db, window_ms=50)
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "готово"
+
+    def submit(fn):
+        try:
+            results.append(committer.submit(fn))
+        except RecipeError as e:
+            results.append(e)
+
+    first = threading.Thread(target=submit, args=(slow,))
+    first.start()
+    started.wait(5)
+    # операция, которая встала в очередь позади маркера остановки, получает ошибку, а не зависает
+    committer._queue.put(None)
+    late = threading.Thread(target=submit, args=(lambda: "поздно",))
+    late.start()
+    closer = threading.Thread(target=committer.close)
+    closer.start()
+    release.set()
+    for t in (first, late, closer):
+        t.join(5)
+        assert not t.is_alive()
+    assert "готово" in results
+    assert any(isinstance(r, RecipeError) for r in results)
+    with pytest.raises(RecipeError):
+        committer.submit(lambda: None)
+    committer.close()
+    db.close()
+
+
+def test_summaries_skip_bodies(temp_db):
+    from app.models import RecipeSummary
+    rid = temp_db.add(Recipe(None, "Плов", "рис" * 1000, "долго" * 1000, "ужин", "2025-11-04T10:00:00"))
+    summaries = temp_db.list_summaries()
+    assert summaries == [RecipeSummary(rid, "Плов", "ужин", "2025-11-04T10:00:00")]
+    assert not hasattr(summaries[0], "__dict__")
+    page = temp_db.list_page(page_size=5, summary=True)
+    assert isinstance(page.items[0], RecipeSummary)
+    assert temp_db.get(rid).steps.startswith("долго")
+
+
+def test_json_serialized_by_sqlite(temp_db):
+    import json
+    from app.models import parse_fields
+    ids = [temp_db.add(Recipe(None, f"Р{i}", "", "шаг", "t", f"2025-11-0{i + 1}T10:00:00")) for i in range(3)]
+    assert json.loads(temp_db.get_json(ids[0])) == {
+        "id": ids[0], "title": "Р0", "ingredients": "", "steps": "шаг", "tags": "t",
+        "created_at": "2025-11-01T10:00:00",
+    }
+    assert json.loads(temp_db.get_json(ids[0], parse_fields("title, id,title"))) == {"title": "Р0", "id": ids[0]}
+    with pytest.raises(RecipeError):
+        parse_fields("title,password")
+    with pytest.raises(RecipeNotFoundError):
+        temp_db.get_json(9999)
+
+    items, cursor = temp_db.list_page_json(page_size=2, fields=("id",))
+    assert [json.loads(i)["id"] for i in items] == [ids[2], ids[1]]
+    items, cursor = temp_db.list_page_json(cursor=cursor, page_size=2, fields=("id",))
+    assert [json.loads(i)["id"] for i in items] == [ids[0]] and cursor is None
+    batches = list(temp_db.iter_json_batches(("id",), batch_size=2))
+    assert [[json.loads(i)["id"] for i in b] for b in batches] == [ids[:2], ids[2:]]
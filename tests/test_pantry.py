@@ -0,0 +1,89 @@
+import pytest
+from app import bitmaps
+from app.controllers import RecipeController
+from app.models import RecipeDB, parse_ingredients
+from app.pantry import parse_pantry
+
+
+@pytest.fixture
+def controller(tmp_path):
+    db = RecipeDB(str(tmp_path / "pantry.db"))
+    yield RecipeController(db=db)
+    db.close()
+
+
+def test_parse_ingredients_normalizes_and_dedups():
+    assert parse_ingredients("Мука, яйца;\nмолоко, мука,  ") == ["мука", "яйца", "молоко"]
+
+
+def test_parse_ingredients_real_rows():
+    text = "Яйцо - 2 шт\nМайонез или йогурт - 2 ст. ложки\nТунец консервированный - 1 банка\nЯйца"
+    assert parse_ingredients(text) == ["яйцо", "майонез", "йогурт", "тунец консервированный"]
+    assert parse_pantry("Яйца, яйцо, майонез") == ["яйца", "майонез"]
+
+
+def test_makeable_matches_word_forms(controller):
+    rid = controller.add_recipe("Салат с тунцом", "Яйцо - 2 шт\nМайонез или йогурт\nТунец консервированный - 1 банка", "", "")
+    found = controller.recipes_makeable_with("яйца, йогурт, майонез, тунец консервированный")
+    assert [m.recipe.id for m in found] == [rid] and found[0].matched == 4
+    near = controller.recipes_makeable_with("яйца, тунец консервированный", max_missing=2)
+    assert sorted(near[0].missing) == ["йогурт", "майонез"]
+
+
+def test_bitmap_counters():
+    planes = []
+    for ids in ([1, 2, 3], [2, 3], [3]):
+        bitmaps.add_to_counter(planes, bitmaps.bitmap_from_ids(ids))
+    universe = bitmaps.bitmap_from_ids(range(5))
+    assert bitmaps.ids_of(bitmaps.counter_equals(planes, 2, universe)) == [2]
+    assert bitmaps.ids_of(bitmaps.counter_equals(planes, 0, universe)) == [0, 4]
+    total = [bitmaps.bitmap_from_ids([1, 2, 3])] * 2  # у всех по 3
+    diff = bitmaps.subtract_counters(total, planes)
+    assert bitmaps.ids_of(bitmaps.counter_equals(diff, 0, bitmaps.bitmap_from_ids([1, 2, 3]))) == [3]
+    assert list(bitmaps.iter_ids_desc(bitmaps.bitmap_from_ids([7, 1, 4]))) == [7, 4, 1]
+
+
+def test_recipes_makeable_with(controller):
+    omelet = controller.add_recipe("Омлет", "яйца, молоко, соль", "", "")
+    pancakes = controller.add_recipe("Блины", "мука, яйца, молоко, сахар", "", "")
+    controller.add_recipe("Салат", "огурцы, помидоры", "", "")
+
+    exact = controller.recipes_makeable_with("Яйца, молоко, соль, хлеб")
+    assert [m.recipe.id for m in exact] == [omelet]
+    assert exact[0].matched == 3 and exact[0].missing == []
+
+    near = controller.recipes_makeable_with(["яйца", "молоко", "соль"], max_missing=2)
+    assert [m.recipe.id for m in near] == [omelet, pancakes]
+    assert sorted(near[1].missing) == ["мука", "сахар"]
+    assert controller.recipes_makeable_with("бананы", max_missing=3) == []
+
+
+def test_makeable_index_follows_changes(controller):
+    rid = controller.add_recipe("Тост", "хлеб, масло", "", "")
+    assert [m.recipe.id for m in controller.recipes_makeable_with("хлеб, масло")] == [rid]
+
+    controller.edit_recipe(rid, "Тост", "хлеб, масло, сыр", "", "")
+    assert controller.recipes_makeable_with("хлеб, масло") == []
+    assert controller.recipes_makeable_with("хлеб, масло", max_missing=1)[0].missing == ["сыр"]
+
+    other = controller.add_recipe("Бутерброд", "хлеб, сыр", "", "")
+    assert [m.recipe.id for m in controller.recipes_makeable_with("хлеб, сыр, масло")] == [rid, other]
+
+    controller.delete_recipe(rid)
+    assert [m.recipe.id for m in controller.recipes_makeable_with("хлеб, сыр, масло")] == [other]
+
+
+def test_long_id_and_name_lists_are_chunked(controller):
+    import sqlite3
+    db = controller.db
+    rid = controller.add_recipe("Омлет", "яйца, молоко", "", "")
+    # лимит параметров в запросе как у сборок SQLite по умолчанию до 3.32 — списки длиннее него
+    for conn in (db.conn, db.read_conn):
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    many = list(range(1, 3001))
+    assert [s.id for s in db.get_summaries(many)] == [rid]
+    assert db.ingredients_of(many)[rid]
+    names = [f"продукт {i}" for i in range(3000)] + ["яйца"]
+    assert list(db.ingredient_ids(names)) == ["яйца"]
+    assert list(db.ingredient_names(many).values()) == ["яйца", "молоко"]
+    assert controller.recipes_makeable_with(",".join(names) + ",молоко")[0].recipe.id == rid
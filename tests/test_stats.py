@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+from app import stats
+from app.controllers import RecipeController
+from app.models import RecipeDB, Recipe, RecipeError
+
+
+@pytest.fixture
+def controller(tmp_path):
+    db = RecipeDB(str(tmp_path / "stats.db"))
+    days = ["2025-01-06", "2025-01-06", "2025-01-08", "2025-01-20", "2025-02-03", "2024-12-31"]
+    db.insert_many([Recipe(None, f"R{i}", "", "", "", f"{d}T12:00:00") for i, d in enumerate(days)])
+    yield RecipeController(db=db)
+    db.close()
+
+
+def test_resolve_range_aligns_to_buckets():
+    today = datetime.date(2025, 2, 5)
+    assert stats.resolve_range("2025-01-08", "2025-01-21", "week", today) == \
+        (datetime.date(2025, 1, 6), datetime.date(2025, 1, 26))
+    assert stats.resolve_range(None, None, "month", today) == \
+        (datetime.date(2024, 3, 1), datetime.date(2025, 2, 28))
+    with pytest.raises(RecipeError):
+        stats.resolve_range("2025-02-01", "2025-01-01", "day", today)
+    with pytest.raises(RecipeError):
+        stats.resolve_range("вчера", None, "day", today)
+    with pytest.raises(RecipeError):
+        stats.resolve_range(None, None, "year", today)
+
+
+def test_activity_stats_by_day_fills_gaps(controller):
+    result = controller.activity_stats("2025-01-05", "2025-01-09")
+    assert result == {"2025-01-05": 0, "2025-01-06": 2, "2025-01-07": 0, "2025-01-08": 1, "2025-01-09": 0}
+
+
+def test_activity_stats_by_week_and_month(controller):
+    weeks = controller.activity_stats("2025-01-01", "2025-01-31", bucket="week")
+    assert weeks == {"2024-12-30": 1, "2025-01-06": 3, "2025-01-13": 0, "2025-01-20": 1, "2025-01-27": 0}
+    months = controller.activity_stats("2024-12-01", "2025-02-28", bucket="month")
+    assert months == {"2024-12-01": 1, "2025-01-01": 4, "2025-02-01": 1}
+
+
+def test_default_window_ends_at_last_activity(controller):
+    result = controller.activity_stats()
+    assert len(result) == stats.DEFAULT_WINDOW["day"]
+    assert list(result)[0] == "2025-01-05" and list(result)[-1] == "2025-02-03"
+    assert sum(result.values()) == 5  # 2024-12-31 вне окна
+
+
+def test_fill_without_numpy_matches(controller, monkeypatch):
+    expected = controller.activity_stats("2024-12-01", "2025-02-28", bucket="week")
+    monkeypatch.setattr(stats, "np", None)
+    assert controller.activity_stats("2024-12-01", "2025-02-28", bucket="week") == expected
+    with pytest.raises(RecipeError):
+        controller.activity_stats("1900-01-01", "2025-01-01")
+
+
+def test_fill_skips_keys_that_are_not_days(monkeypatch):
+    rows = [("2025-01-06", 2), ("20250106T1", 5), ("", 1)]
+    first, last = datetime.date(2025, 1, 5), datetime.date(2025, 1, 7)
+    expected = {"2025-01-05": 0, "2025-01-06": 2, "2025-01-07": 0}
+    assert stats.fill_buckets(rows, first, last, "day") == expected
+    monkeypatch.setattr(stats, "np", None)
+    assert stats.fill_buckets(rows, first, last, "day") == expected
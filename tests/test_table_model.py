@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication, Qt
+from app.controllers import RecipeController
+from app.models import RecipeDB, Recipe
+from app.table_model import RecipeTableModel
+
+
+@pytest.fixture
+def model(tmp_path):
+    QCoreApplication.instance() or QCoreApplication([])
+    db = RecipeDB(str(tmp_path / "model.db"))
+    ctrl = RecipeController(db=db)
+    db.insert_many([Recipe(None, f"R{i}", "", "", "t", f"2025-01-{i + 1:02d}T10:00:00") for i in range(7)])
+    yield RecipeTableModel(ctrl, page_size=3)
+    db.close()
+
+
+def titles(model):
+    return [model.data(model.index(row, 1)) for row in range(model.rowCount())]
+
+
+def test_fetches_pages_lazily(model):
+    assert model.rowCount() == 0 and model.canFetchMore()
+    model.fetchMore()
+    assert titles(model) == ["R6", "R5", "R4"]
+    while model.canFetchMore():
+        model.fetchMore()
+    assert model.rowCount() == 7
+    assert model.headerData(1, Qt.Orientation.Horizontal) == "Название"
+
+
+def test_mutations_touch_single_rows(model):
+    model.fetchMore()
+    ctrl = model.controller
+    changed = []
+    model.dataChanged.connect(lambda top, bottom: changed.append((top.row(), bottom.row())))
+
+    rid = ctrl.add_recipe("Новый", "", "", "t")
+    model.recipe_added(rid)
+    assert titles(model)[0] == "Новый"
+
+    target = model.recipe_id(2)
+    ctrl.edit_recipe(target, "Изменён", "", "", "t")
+    model.recipe_updated(target)
+    assert changed == [(2, 2)] and titles(model)[2] == "Изменён"
+
+    ctrl.delete_recipe(target)
+    model.recipe_deleted(target)
+    assert "Изменён" not in titles(model)
+    assert model.row_of(model.recipe_id(2)) == 2
+
+    # рецепт старше загруженной части придёт со следующей страницей, а не вставится сейчас
+    old = ctrl.db.add(Recipe(None, "Старый", "", "", "t", "2024-01-01T00:00:00"))
+    model.recipe_added(old)
+    assert "Старый" not in titles(model)
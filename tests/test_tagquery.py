@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from app import bitmaps
+from app.models import Recipe, RecipeDB, RecipeError
+from app.tagquery import TagIndex, format_query, parse_tag_query
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecipeDB(str(tmp_path / "tags.db"))
+    yield db
+    db.close()
+
+
+def _add(db, tags):
+    return db.add(Recipe(None, tags or "-", "", "", tags, Recipe.now_iso()))
+
+
+def test_parse_and_format():
+    node = parse_tag_query("Десерт and веган AND NOT орехи")
+    assert node == ("and", (("tag", "десерт"), ("tag", "веган"), ("not", ("tag", "орехи"))))
+    assert format_query(parse_tag_query("(завтрак | бранч), быстро")) == "(завтрак OR бранч) AND быстро"
+    assert format_query(parse_tag_query("без глютена И НЕ (рыба ИЛИ мясо)")) == "без глютена AND NOT (рыба OR мясо)"
+    assert parse_tag_query('"rock & roll" or x') == ("or", (("tag", "rock & roll"), ("tag", "x")))
+    for bad in ("", "a AND", "(a", "a)", "OR a", '"a'):
+        with pytest.raises(RecipeError):
+            parse_tag_query(bad)
+
+
+def test_bitmap_rank_and_top():
+    ids = [3, 8, 9, 700, 5000]
+    bm = bitmaps.bitmap_from_ids(ids)
+    assert [bitmaps.nth_id(bm, i) for i in range(len(ids))] == ids
+    with pytest.raises(IndexError):
+        bitmaps.nth_id(bm, len(ids))
+    assert bitmaps.top_ids(bm, 2) == [5000, 700]
+    assert bitmaps.nth_ids(bm, [len(ids) - 1, 0, 0]) == [ids[0], ids[0], ids[-1]]
+    assert bitmaps.top_ids(bm) == ids[::-1]
+
+
+def test_index_queries_and_updates(db):
+    dessert_vegan = _add(db, "десерт,веган")
+    dessert_nuts = _add(db, "десерт,веган,орехи")
+    breakfast = _add(db, "завтрак")
+    plain = _add(db, "")
+    index = TagIndex(db)
+    assert index.ids("десерт AND веган AND NOT орехи") == [dessert_vegan]
+    assert index.ids("(завтрак OR бранч)") == [breakfast]
+    assert index.ids("NOT десерт") == [plain, breakfast]
+    assert index.count("десерт OR завтрак") == 3
+    assert index.random_id("нет такого") is None
+
+    brunch = _add(db, "бранч")
+    db.update(dessert_nuts, "-", "", "", "десерт,веган")
+    db.delete(breakfast)
+    assert index.ids("(завтрак OR бранч)") == [brunch]
+    assert index.ids("десерт AND веган AND NOT орехи") == [dessert_nuts, dessert_vegan]
+    assert index.search("NOT десерт") == (2, [brunch, plain])
+    assert index.tag_counts() == {"бранч": 1, "веган": 2, "десерт": 2}
+
+    rng = random.Random(1)
+    seen = {index.random_id("десерт", rng) for _ in range(50)}
+    assert seen == {dessert_vegan, dessert_nuts}
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication
+from app.tasks import TaskRunner
+
+
+@pytest.fixture
+def runner():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    runner = TaskRunner()
+    yield runner, app
+    runner.shutdown()
+
+
+def wait_for(app, condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_result_is_delivered_in_gui_thread(runner):
+    runner, app = runner
+    got = []
+    runner.submit(None, lambda: threading.current_thread(), on_done=lambda t: got.append((t, threading.current_thread())))
+    assert wait_for(app, lambda: got)
+    worker, receiver = got[0]
+    assert worker is not threading.main_thread() and receiver is threading.main_thread()
+
+
+def test_superseded_task_result_is_ignored(runner):
+    runner, app = runner
+    release = threading.Event()
+    got, errors = [], []
+    runner.submit("refresh", lambda: release.wait(2) and "старый", on_done=got.append)
+    runner.submit("refresh", lambda: "новый", on_done=got.append)
+    runner.submit(None, lambda: 1 / 0, on_error=errors.append)
+    release.set()
+    assert wait_for(app, lambda: got and errors)
+    app.processEvents()
+    assert got == ["новый"]
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_schedule_coalesces_bursts(runner):
+    runner, app = runner
+    calls, got = [], []
+    for n in range(10):
+        runner.schedule("chart", lambda n=n: calls.append(n) or n, delay_ms=20, on_done=got.append)
+    assert wait_for(app, lambda: got)
+    assert calls == [9] and got == [9]
@@ -0,0 +1,136 @@
+# web/api_v1.py
+"""
+Версионированный JSON API: /api/v1/recipes, /api/v1/menu, /api/v1/tags.
+
+- GET    /api/v1/recipes           — страница (курсор, page_size, fields) или весь каталог в NDJSON
+                                     (?format=ndjson или Accept: application/x-ndjson);
+- GET    /api/v1/recipes/{id}      — один рецепт (fields), 404 если нет;
+- POST   /api/v1/recipes           — 201 + Location, 422 при ошибке данных;
+- PUT    /api/v1/recipes/{id}      — полная замена; PATCH — только переданные поля;
+- DELETE /api/v1/recipes/{id}      — 204 или 404;
+- POST   /api/v1/menu              — меню на несколько дней с ограничениями (app.menu);
+- GET    /api/v1/tags/query?q=...  — рецепты по запросу к тегам («десерт AND NOT орехи», app.tagquery).
+
+JSON собирает SQLite (json_object), поэтому ответ не проходит через Recipe -> dict -> json.dumps.
+"""
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.models import RecipeError, RecipeNotFoundError, DEFAULT_PAGE_SIZE
+from app.controllers import AsyncRecipeController, QueryTimeoutError
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+EDITABLE_FIELDS = ("title", "ingredients", "steps", "tags")
+
+
+def _fields_from_body(payload: Any, partial: bool) -> Dict[str, str]:
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail="Ожидается JSON-объект")
+    unknown = set(payload) - set(EDITABLE_FIELDS) - {"id"}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    values = {}
+    for name in EDITABLE_FIELDS:
+        if name not in payload:
+            continue
+        value = payload[name]
+        if value is not None and not isinstance(value, str):
+            raise HTTPException(status_code=422, detail=f"Поле {name!r} должно быть строкой")
+        values[name] = value or ""
+    if not partial and not values.get("title", "").strip():
+        raise HTTPException(status_code=422, detail="Название не может быть пустым")
+    return values
+
+
+async def _run(call, error_status: int = 422):
+    """Ошибки контроллера -> HTTP: нет рецепта — 404, некорректные данные — error_status."""
+    try:
+        return await call
+    except QueryTimeoutError:
+        raise
+    except RecipeNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RecipeError as e:
+        raise HTTPException(status_code=error_status, detail=str(e))
+
+
+def build_router(actrl: AsyncRecipeController) -> APIRouter:
+    router = APIRouter(prefix="/api/v1", tags=["recipes v1"])
+    controller = actrl.controller
+
+    @router.get("/recipes")
+    async def list_recipes(request: Request, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                           fields: Optional[str] = None, format: Optional[str] = None):
+        """Страница рецептов (keyset-пагинация) или весь каталог потоком NDJSON"""
+        if format == "ndjson" or (format is None and NDJSON in request.headers.get("accept", "")):
+            try:
+                chunks = controller.iter_recipes_ndjson(fields)
+            except RecipeError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return StreamingResponse(chunks, media_type=NDJSON)
+        if format not in (None, "json"):
+            raise HTTPException(status_code=400, detail=f"Неизвестный формат {format!r}, ожидается json или ndjson")
+        body = await _run(actrl.list_recipes_json(cursor, page_size, fields), error_status=400)
+        return Response(content=body, media_type=JSON)
+
+    @router.get("/recipes/{recipe_id}")
+    async def get_recipe(recipe_id: int, fields: Optional[str] = None):
+        body = await _run(actrl.recipe_json(recipe_id, fields), error_status=400)
+        return Response(content=body, media_type=JSON)
+
+    @router.post("/recipes", status_code=201)
+    async def create_recipe(request: Request, payload: Any = Body(...)):
+        values = _fields_from_body(payload, partial=False)
+        rid = await _run(actrl.add_recipe(values["title"], values.get("ingredients", ""),
+                                          values.get("steps", ""), values.get("tags", "")))
+        body = await _run(actrl.recipe_json(rid))
+        location = request.url_for("get_recipe", recipe_id=rid).path
+        return Response(content=body, status_code=201, media_type=JSON, headers={"Location": location})
+
+    @router.put("/recipes/{recipe_id}")
+    async def replace_recipe(recipe_id: int, payload: Any = Body(...)):
+        values = _fields_from_body(payload, partial=False)
+        await _run(actrl.edit_recipe(recipe_id, values["title"].strip(), values.get("ingredients", ""),
+                                     values.get("steps", ""), values.get("tags", "")))
+        return Response(content=await _run(actrl.recipe_json(recipe_id)), media_type=JSON)
+
+    @router.patch("/recipes/{recipe_id}")
+    async def update_recipe(recipe_id: int, payload: Any = Body(...)):
+        values = _fields_from_body(payload, partial=True)
+        await _run(actrl.patch_recipe(recipe_id, values))
+        return Response(content=await _run(actrl.recipe_json(recipe_id)), media_type=JSON)
+
+    @router.delete("/recipes/{recipe_id}", status_code=204)
+    async def delete_recipe(recipe_id: int):
+        await _run(actrl.delete_recipe(recipe_id))
+        return Response(status_code=204)
+
+    @router.post("/menu")
+    async def generate_menu(payload: Any = Body(...)):
+        """
+        {"days": 7, "slots": ["завтрак", "обед", "ужин"], "slot_tags": {"обед": ["суп"]},
+         "exclude_tags": [...], "max_shared_ingredients": 1, "max_ingredient_uses": 3, "seed": 42}
+        """
+        if not isinstance(payload, dict):
+            raise HTTPException(status_code=422, detail="Ожидается JSON-объект")
+        options = dict(payload)
+        days = options.pop("days", 7)
+        slots = options.pop("slots", None)
+        if isinstance(slots, str):
+            slots = slots.split(",")
+        if isinstance(days, bool) or not isinstance(days, int) or (slots is not None and not isinstance(slots, list)):
+            raise HTTPException(status_code=422, detail="days — целое число, slots — список приёмов пищи")
+        menu = await _run(actrl.generate_menu(days, slots, options))
+        return menu.to_dict()
+
+    @router.get("/tags/query")
+    async def query_tags(q: str, limit: int = 50):
+        """Число рецептов, подходящих под запрос, и первые limit из них (новые сначала)"""
+        result = await _run(actrl.find_by_tags(q, limit), error_status=400)
+        return {"query": result.query, "count": result.count, "items": [s.to_dict() for s in result.items]}
+
+    return router
@@ -0,0 +1,71 @@
+# web/cache.py
+"""
+Кэш ответов веб-версии, привязанный к версии данных.
+Записи живут, пока не изменится версия данных (DataVersion.version):
+любая запись в recipes повышает версию, и все старые записи сбрасываются разом.
+"""
+
+import datetime
+import threading
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Hashable, Optional
+
+from app.models import DataVersion
+
+
+class VersionedCache:
+    """LRU-кэш на maxsize записей, действительный для одной версии данных."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._version: Optional[int] = None
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        with self._lock:
+            if version != self._version:
+                return None
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, version: int, value: Any) -> None:
+        with self._lock:
+            if version != self._version:
+                self._items.clear()
+                self._version = version
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+def make_etag(version: DataVersion, *parts: Any) -> str:
+    suffix = "-".join(str(p) for p in parts if p is not None)
+    return f'W/"{version.version}{"-" + suffix if suffix else ""}"'
+
+
+def http_date(version: DataVersion) -> Optional[str]:
+    try:
+        moment = datetime.datetime.fromisoformat(version.last_modified)
+    except ValueError:
+        return None
+    return format_datetime(moment.replace(tzinfo=datetime.timezone.utc), usegmt=True)
+
+
+def not_modified(headers, etag: str, last_modified: Optional[str]) -> bool:
+    """Проверка условного GET: If-None-Match важнее If-Modified-Since (RFC 9110)."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -1,30 +1,145 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException, UploadFile, File, Body, Query
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from app.models import RecipeDB
-from app.controllers import RecipeController
+from app.models import RecipeDB, RecipeError, DEFAULT_PAGE_SIZE
+from app import bulk
+from app.controllers import RecipeController, AsyncRecipeController, QueryTimeoutError
+from app.metrics import QueryMetrics, RequestMetrics, render_prometheus
+from app.logger_config import setup_logging, shutdown_logging
+from web.cache import VersionedCache, make_etag, http_date, not_modified
+from web.api_v1 import build_router
+import asyncio
+import io
 import json
+import logging
 import os
+import time
+import uuid
+import zlib
+from dataclasses import asdict
+
+# Журнал через очередь: обработчики не ждут вывода; RECIPES_LOG_FILE включает файл с ротацией
+setup_logging(level=logging.INFO, log_file=os.environ.get("RECIPES_LOG_FILE"))
+logger = logging.getLogger("recipes.web")
 
 app = FastAPI()
 templates = Jinja2Templates(directory="web/templates")
 
-# Создаём глобальные объекты (БД и контроллер)
-db_path = os.path.join(os.path.dirname(__file__), "..", "recipes.db")
-db = RecipeDB(db_path)
-controller = RecipeController(db=db)
+# Создаём глобальные объекты (БД и контроллер).
+# RecipeDB потокобезопасен: каждый поток получает свои соединения (WAL, read-only для чтения)
+# Путь можно переопределить переменной окружения RECIPES_DB (например, для замеров на большом каталоге)
+db_path = os.environ.get("RECIPES_DB") or os.path.join(os.path.dirname(__file__), "..", "recipes.db")
+# Замеры SQL-выражений и запросов для /metrics; порог журнала медленных запросов — RECIPES_SLOW_QUERY_MS,
+# параметры запросов пишутся в этот журнал только при RECIPES_SLOW_QUERY_PARAMS=1
+query_metrics = QueryMetrics(slow_ms=float(os.environ.get("RECIPES_SLOW_QUERY_MS", "100")),
+                             log_params=os.environ.get("RECIPES_SLOW_QUERY_PARAMS") == "1")
+request_metrics = RequestMetrics()
+# Групповой commit: конкурентные /add и пакетные запросы делят один commit в окне 2 мс
+db = RecipeDB(db_path, group_commit_ms=2, metrics=query_metrics)
+controller = RecipeController(db=db, logger=logging.getLogger("recipes.controller"))
+# Обработчики работают через асинхронный фасад: запросы к SQLite идут в пуле потоков
+actrl = AsyncRecipeController(controller)
+# Кэш страниц списка, статистики и готового HTML; сбрасывается при изменении версии данных
+cache = VersionedCache(maxsize=128)
+# Cookie сессии для колод /random?deck=1: у каждого посетителя свой порядок без повторов
+SESSION_COOKIE = "recipes_session"
+SESSION_MAX_AGE = 30 * 24 * 3600
+# Версионированный JSON API (/api/v1/recipes): CRUD с кодами статуса, fields, NDJSON
+app.include_router(build_router(actrl))
 
-@app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
-    """Главная страница с таблицей и графиком"""
-    recipes = controller.list_recipes()
-    stats = controller.activity_stats() or {}
-    return templates.TemplateResponse("index.html", {
+
+@app.exception_handler(QueryTimeoutError)
+async def _query_timeout(request: Request, exc: QueryTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.middleware("http")
+async def _timing(request: Request, call_next):
+    """Время обработки по шаблону маршрута (/api/recipes, а не конкретный URL); для потоковых — до заголовков"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        request_metrics.record(request.method, getattr(route, "path", "unmatched"), status,
+                               time.perf_counter() - start)
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    actrl.shutdown(wait=False)
+    db.close()
+    shutdown_logging()
+
+
+async def _recipe_page(cursor=None, page_size=DEFAULT_PAGE_SIZE, summary=False):
+    try:
+        if summary:
+            return await actrl.list_summaries(cursor=cursor, page_size=page_size)
+        return await actrl.list_recipes(cursor=cursor, page_size=page_size)
+    except QueryTimeoutError:
+        raise
+    except RecipeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _index_data(cursor, version):
+    """Страница рецептов из кэша (или из БД при промахе); график страница запрашивает сама через /api/stats"""
+    key = ("index-data", cursor)
+    page = cache.get(key, version.version)
+    if page is None:
+        # таблица на главной показывает 4 колонки — читаем облегчённые RecipeSummary
+        page = await _recipe_page(cursor, summary=True)
+        cache.put(key, version.version, page)
+    return page
+
+
+async def _render_index(request: Request, cursor=None, version=None, **extra):
+    """Рендер главной страницы: одна страница рецептов + статистика"""
+    version = version or await actrl.data_version()
+    page = await _index_data(cursor, version)
+    context = {
         "request": request,
-        "recipes": recipes,
+        "recipes": page.items,
+        "next_cursor": page.next_cursor,
         "random_recipe": None,
-        "stats_json": json.dumps(stats)
-    })
+    }
+    context.update(extra)
+    return templates.TemplateResponse("index.html", context)
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request, cursor: str = None):
+    """Главная страница с таблицей и графиком (кэш + ETag / Last-Modified)"""
+    version = await actrl.data_version()
+    # курсор — пользовательский ввод (кавычки, не-ASCII), в заголовок идёт только его хэш
+    etag = make_etag(version, zlib.crc32(cursor.encode("utf-8", "surrogatepass")) if cursor else None)
+    last_modified = http_date(version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    key = ("index-html", cursor)
+    body = cache.get(key, version.version)
+    if body is None:
+        body = (await _render_index(request, cursor=cursor, version=version)).body
+        cache.put(key, version.version, body)
+    return HTMLResponse(content=body, headers=headers)
+
+
+@app.get("/api/recipes")
+async def api_recipes(cursor: str = None, page_size: int = DEFAULT_PAGE_SIZE):
+    """Страница рецептов в JSON (keyset-пагинация по курсору); новый клиентский код — /api/v1/recipes"""
+    page = await _recipe_page(cursor, page_size)
+    return {
+        "items": [asdict(r) for r in page.items],
+        "next_cursor": page.next_cursor
+    }
 
 @app.post("/add", response_class=HTMLResponse)
 async def add_recipe(
@@ -36,33 +151,130 @@ async def add_recipe(
 ):
     """Добавление нового рецепта"""
     try:
-        controller.add_recipe(title, ingredients, steps, tags)
+        await actrl.add_recipe(title, ingredients, steps, tags)
     except Exception as e:
-        print(f"Ошибка добавления рецепта: {e}")
+        logger.warning("Ошибка добавления рецепта: %s", e)
 
-    recipes = controller.list_recipes()
-    stats = controller.activity_stats() or {}
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "recipes": recipes,
-        "random_recipe": None,
-        "stats_json": json.dumps(stats)
-    })
+    return await _render_index(request)
 
 @app.get("/random", response_class=HTMLResponse)
-async def random_recipe(request: Request, tag: str = None):
-    """Генерация случайного рецепта"""
+async def random_recipe(request: Request, tag: str = None, deck: bool = False):
+    """Генерация случайного рецепта; deck=1 — без повторов в пределах сессии (колода по cookie)"""
     recipe = None
+    session = request.cookies.get(SESSION_COOKIE) if deck else None
+    # без cookie (первый запрос, curl, API-клиенты) — общая колода запроса: своя колода
+    # собирается только со второго запроса сессии, когда cookie уже пришла
+    new_session = uuid.uuid4().hex if deck and not session else None
     try:
-        recipe = controller.random_recipe(tag)
+        if deck:
+            recipe = await actrl.draw_recipe(tag, session=session)
+        else:
+            recipe = await actrl.random_recipe(tag)
     except Exception as e:
-        print(f"Ошибка генерации: {e}")
+        logger.warning("Ошибка генерации: %s", e)
 
-    recipes = controller.list_recipes()
-    stats = controller.activity_stats() or {}
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "recipes": recipes,
-        "random_recipe": recipe,
-        "stats_json": json.dumps(stats)
-    })
+    response = await _render_index(request, random_recipe=recipe, deck=deck)
+    if new_session:
+        response.set_cookie(SESSION_COOKIE, new_session, max_age=SESSION_MAX_AGE, httponly=True, samesite="lax")
+    return response
+
+@app.get("/search", response_class=HTMLResponse)
+async def search(request: Request, q: str = "", limit: int = 20, offset: int = 0):
+    """Полнотекстовый поиск по рецептам"""
+    hits = await actrl.search_recipes(q, limit=limit, offset=offset)
+    return await _render_index(request, query=q, search_results=hits)
+
+@app.post("/import")
+async def import_recipes(file: UploadFile = File(...), format: str = None,
+                         batch_size: int = bulk.DEFAULT_BATCH_SIZE):
+    """Потоковый импорт JSONL/CSV пачками; возвращает отчёт с отклонёнными строками"""
+    try:
+        fmt = format or bulk.detect_format(file.filename)
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        report = await actrl.call(bulk.import_recipes, db, stream, fmt, batch_size=batch_size,
+                                  interruptible=False)
+    except RecipeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body = {
+        "imported": report.imported,
+        "batches": report.batches,
+        "rejected_count": report.rejected_count,
+        "rejected": [{"line": line, "reason": reason} for line, reason in report.rejected]
+    }
+    if report.aborted:
+        # часть пачек уже записана: отчёт возвращается вместе с ошибкой
+        raise HTTPException(status_code=400, detail={"error": report.aborted, **body})
+    return body
+
+@app.get("/export")
+async def export_recipes(format: str = "jsonl"):
+    """Потоковый экспорт всего каталога (постоянная память)"""
+    if format not in bulk.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат {format!r}")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="recipes.{format}"'}
+    return StreamingResponse(bulk.export_recipes(db, format), media_type=media_type, headers=headers)
+
+@app.post("/api/recipes/batch")
+async def batch_recipes(payload: dict = Body(...)):
+    """
+    Пакетные изменения: {"add": [{...}], "update": [{"id": 1, ...}], "delete": [1, 2]}.
+    Каждая операция — одна транзакция; в ответе результат по каждому элементу.
+    """
+    response = {}
+    for op, run in (("add", actrl.add_many), ("update", actrl.update_many), ("delete", actrl.delete_many)):
+        items = payload.get(op)
+        if items is None:
+            continue
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail=f"Поле {op!r} должно быть списком")
+        response[op] = [asdict(r) for r in await run(items)]
+    return response
+
+@app.get("/api/pantry")
+async def pantry(items: str, max_missing: int = 0, limit: int = 20):
+    """Что можно приготовить: items — продукты через запятую, max_missing — сколько может не хватать"""
+    matches = await actrl.recipes_makeable_with(items, max_missing=max_missing, limit=limit)
+    return [
+        {"recipe": m.recipe.to_dict(), "matched": m.matched, "missing": m.missing}
+        for m in matches
+    ]
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики SQL-выражений и HTTP-запросов в текстовом формате Prometheus"""
+    return PlainTextResponse(render_prometheus(query_metrics, request_metrics),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/stats")
+async def api_stats(request: Request, start: str = Query(None, alias="from"), end: str = Query(None, alias="to"),
+                    bucket: str = "day"):
+    """
+    Активность по корзинам day / week / month за период from..to (ГГГГ-ММ-ДД, включительно);
+    пустые корзины — с нулём. Без параметров — последние 30 дней с активностью.
+    """
+    version = await actrl.data_version()
+    # параметры пользователя в ETag попадают только в виде контрольной суммы
+    etag = make_etag(version, "stats", zlib.crc32(repr((start, end, bucket)).encode()))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request.headers, etag, None):
+        return Response(status_code=304, headers=headers)
+    key = ("stats", start, end, bucket)
+    body = cache.get(key, version.version)
+    if body is None:
+        try:
+            buckets = await actrl.activity_stats(start, end, bucket)
+        except QueryTimeoutError:
+            raise
+        except RecipeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        labels = list(buckets)
+        body = json.dumps({
+            "bucket": bucket,
+            "from": labels[0] if labels else None,
+            "to": labels[-1] if labels else None,
+            "labels": labels,
+            "counts": list(buckets.values()),
+        }, ensure_ascii=False)
+        cache.put(key, version.version, body)
+    return Response(content=body, media_type="application/json", headers=headers)